@@ -0,0 +1,43 @@
+# Benchmark comparing the style profile engine (class fdf_styleengine of fdf_annotations.py) 
+# with the method-by-method formatting of Example_use.py (methods stylecolormap and styleannotation).
+# Usage: python Benchmark_styleprofile.py [INPUTFDF] [REPEAT]
+
+
+import sys
+import time
+import fdf_annotations as fdfa
+
+inputfdfpath=sys.argv[1] if len(sys.argv) > 1 else "DUMMY_aCRF_PHUSE_EU_CONNECT_2025_unformatted.fdf"
+repeat=int(sys.argv[2]) if len(sys.argv) > 2 else 5
+styleprofile=fdfa.msgv2styleprofile
+
+
+def formatmethodchain(annots):
+    #Example_use.py: getters and setters called one by one for each annotation
+    color_dict=annots.stylecolormap(styleprofile)
+    for annot in annots:
+        if annots.hascontent(annot):
+            annots.styleannotation(annot, styleprofile, color_dict)
+
+def formatengine(annots):
+    #profile compiled once, each annotation parsed and serialised once
+    fdfa.fdf_styleengine(styleprofile).apply(annots)
+
+
+results={}
+outputs={}
+for name, formatfunction in (("method chain", formatmethodchain), ("style engine", formatengine)):
+    timings=[]
+    for i in range(repeat):
+        annots=fdfa.fdf_annotations(inputfdfpath)
+        starttime=time.perf_counter()
+        formatfunction(annots)
+        timings.append(time.perf_counter()-starttime)
+    outputs[name]="".join(annots.exportpieces(["header", annots.ordered_fdf_key[1]]+annots.ordered_fdf_key[2:-1]+["trailer"]))
+    results[name]=min(timings)
+
+print(f"{inputfdfpath}: {len(annots.ordered_fdf_key)} objects, best of {repeat} runs")
+for name, seconds in results.items():
+    print(f"{name:<14}{seconds*1000:10.1f} ms")
+print(f"speedup       {results['method chain']/results['style engine']:10.2f} x")
+print(f"identical output: {outputs['method chain']==outputs['style engine']}")
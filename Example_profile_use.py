@@ -0,0 +1,31 @@
+# Example use of a declarative style profile (class fdf_styleengine of fdf_annotations.py)
+# Applies the same formatting as Example_use.py: the standards are defined in SDTM_MSG_V2_styleprofile.toml instead of code,
+# and are compiled once into a single transform per annotation.
+
+
+import fdf_annotations as fdfa       
+
+# The fdf file provided in inputfdfpath can be extracted 
+# from the DUMMY_aCRF_PHUSE_EU_CONNECT_2025_unformatted.pdf
+# using Adobe Reader (Comments Pane > Export all to file > save as fdf )
+# It is also provided on this github page
+# Please provide the proper filepath of the fdf file below
+
+inputfdfpath=r"C:\Users\dbaele\Downloads\CRF playground\DUMMY_aCRF_PHUSE_EU_CONNECT_2025_unformatted.fdf"
+
+#Please provide the filepath where the updated fdf is to be saved
+outputfdfpath=r"C:\Users\dbaele\Downloads\CRF playground\DUMMY_aCRF_PHUSE_EU_CONNECT_2025_formatted.fdf"
+
+#Please provide the filepath of the style profile (json or toml) to be applied
+styleprofilepath=r"C:\Users\dbaele\Downloads\CRF playground\SDTM_MSG_V2_styleprofile.toml"
+
+
+###########################################
+# Process annotations
+###########################################
+
+styleengine=fdfa.fdf_styleengine(fdfa.fdf_annotations.loadstyleprofile(styleprofilepath))
+
+annots=fdfa.fdf_annotations(inputfdfpath)
+styleengine.apply(annots)
+annots.exportfdf(outputfdfpath, "N", "Y", "Y")
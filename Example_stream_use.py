@@ -0,0 +1,72 @@
+# Example use of the streaming pipeline of the fdf_annotations.py class (method streamfdf)
+# Applies the same formatting as Example_use.py, but each annotation is transformed and written as soon as it's read,
+# so the full fdf file is never held in memory (intended for very large fdf files).
+
+
+import fdf_annotations as fdfa       
+from collections import defaultdict
+
+# The fdf file provided in inputfdfpath can be extracted 
+# from the DUMMY_aCRF_PHUSE_EU_CONNECT_2025_unformatted.pdf
+# using Adobe Reader (Comments Pane > Export all to file > save as fdf )
+# It is also provided on this github page
+# Please provide the proper filepath of the fdf file below
+
+inputfdfpath=r"C:\Users\dbaele\Downloads\CRF playground\DUMMY_aCRF_PHUSE_EU_CONNECT_2025_unformatted.fdf"
+
+#Please provide the filepath where the updated fdf is to be saved
+outputfdfpath=r"C:\Users\dbaele\Downloads\CRF playground\DUMMY_aCRF_PHUSE_EU_CONNECT_2025_formatted.fdf"
+
+###########################################
+# Standards (see Example_use.py)
+###########################################
+
+backgroundcolororder=['191 255 255', '255 255 150', '150 255 150', '255 190 155', '0 146 146', '182 109 255', '219 109 0', '255 109 182', '0 109 219', '36 255 36', '255 182 219', '109 182 255']
+standardrcstyle={'font-size':'12.0pt', 'text-align':'left', 'color':'#000000', 'font-weight': 'normal', 'font-style': 'normal', 'font-family':'Arial', 'font-stretch':'normal'}
+rcopenboldspan='<span style="font-weight:bold">'
+rccloseboldspan='</span>'
+nonboldds='font: Arial,sans-serif 12.0pt; text-align:left; color:#000000 '        #DS defines font color
+boldds='font: bold Arial,sans-serif 12.0pt; text-align:left; color:#000000 '      #DS defines font color
+nonboldda='0 0 0 rg /Arial 12 Tf'              #DA defines border color
+boldda='0 0 0 rg /Arial,Bold 12 Tf'            #DA defines border color
+
+
+###########################################
+# Transforms: called as transform(annots, annot) for each object, in the order provided
+###########################################
+
+def setfonts(annots, annot):
+    #set /DA, /DS, /RC
+    if annots.hascontent(annot):
+        rcstring=annots.getrccontent(annot)
+        rcstring=annots.removercreturns(rcstring)
+        rcstring=annots.rc_dropspans(rcstring)
+        rcstyles=annots.getrcstyles(rcstring)
+        rcstyles=annots.rcstyles_setmasterstyle(rcstyles, standardrcstyle)
+        rcstring=annots.rcstyles_to_rccontentstring(rcstyles)
+        if annots.qualifyasheaderMSGV2(annot):
+            rcstring=annots.rc_insertspan(rcstring, rcopenboldspan, rccloseboldspan)
+            annots.updaterccontent(annot, rcstring)
+            annots.updatedacontent(annot, boldda)
+            annots.updatedscontent(annot, boldds)   
+        else:
+            annots.updaterccontent(annot, rcstring)
+            annots.updatedacontent(annot, nonboldda)
+            annots.updatedscontent(annot, nonboldds)
+
+#background colors are assigned per page in the order encountered, so the color_dict can be populated while streaming
+color_dict=defaultdict(dict)
+def setbackgroundcolor(annots, annot):
+    if annots.hascontent(annot):
+        pagecolors=color_dict[annots.getpagenum(annot)]
+        keycolor=annots.rgb_fractoint(annots.getc(annot))
+        if keycolor not in pagecolors:
+            pagecolors[keycolor]=backgroundcolororder[len(pagecolors)]
+        annots.setc(annot, annots.rgb_c_inttofrac(pagecolors[keycolor]))
+
+
+###########################################
+# Process annotations
+###########################################
+
+fdfa.fdf_annotations.streamfdf(inputfdfpath, outputfdfpath, [setfonts, setbackgroundcolor])
@@ -1,5 +1,491 @@
 import re
 import io
+import os
+import sys
+import json
+import time
+import mmap
+import array
+import types
+import pickle
+import hashlib
+import inspect
+import weakref
+import heapq
+import unicodedata
+import tomllib
+import argparse
+import functools
+import contextlib
+import tracemalloc
+import concurrent.futures
+from collections import defaultdict, Counter
+from collections.abc import MutableMapping
+try:
+    import numpy            #optional: only required by the columnar annotation table (see class fdf_annotationtable)
+except ImportError:
+    numpy=None
+
+#patterns used to split the fdf file into objects (compiled once, applied with offsets on the full file content)
+headerendpattern=re.compile(r"\n(?=\d+ \d+ obj\n)")          #header: everything until first object identifier (in lookahead)
+objectidpattern=re.compile(r"\d+ \d+ obj(?=\n)")
+objectendpattern=re.compile(r"endobj(?=\n)")
+inventorypattern=re.compile(r"/Annots\[((\d+ \d+ R )*(\d+ \d+ R))\]")
+individualrefpattern=re.compile(r"\d+ \d+ R")
+referencepattern=re.compile(r"(?<!\\)(/BS|/Popup|/Parent|/[^/]+?) (\d+ \d+ R)")     #subobject reference within an annotation object
+objectkeypattern=re.compile(r"^(\d+ \d+ )(R|obj)$")                 #object identifier ("\d+ \d+ obj") or reference ("\d+ \d+ R") spelling, parsed without pattern by class fdf_objectkey
+objectkeylinepattern=re.compile(r"^(\d+ \d+ )(?:R|obj)$", re.M)      #idem, applied on object identifiers joined by new lines
+
+#patterns used to locate the attribute values within an annotation object (see class fdf_annotationrecord)
+contentstartpattern=re.compile(r"(?<!\\)/Contents\(")
+rcstartpattern=re.compile(r"(?<!\\)/RC\(")
+dsstartpattern=re.compile(r"(?<!\\)/DS\(")
+dastartpattern=re.compile(r"(?<!\\)/DA\(")
+parenthesisendpattern=re.compile(r"(?<!\\)\)")                  #first non-escaped closing parenthesis
+cpattern=re.compile(r"(?<!\\)/C(\[.*?\])")
+hascpattern=re.compile(r"(?<!\\)/C\[")
+capattern=re.compile(r"(?<!\\)(/CA\s+([0-9.]+)\s*)/")
+hascapattern=re.compile(r"(?<!\\)/CA")
+rectpattern=re.compile(r"(?<!\\)/Rect(\[.*?\])")
+pagepattern=re.compile(r"/Page (\d+)(?=/)")
+
+#patterns used to locate the attributes indexed by method buildindexes (lookbehind placed after the attribute name, so the search can skip to its occurrences)
+subtypepattern=re.compile(r"/Subtype/(?<!\\/Subtype/)([^/\s>\[\(]+)")
+authorstartpattern=re.compile(r"/T\((?<!\\/T\()")
+nmstartpattern=re.compile(r"/NM\((?<!\\/NM\()")
+mstartpattern=re.compile(r"/M\((?<!\\/M\()")                 #modification date, only used by method applystyleprofileincremental
+
+#patterns used to qualify the /Contents value of an annotation as domain header (see methods qualifyasheaderMSGV1 and qualifyasheaderMSGV2)
+headerV1pattern=re.compile(r"^([A-Z]{2,4}|RELREC)\s*\=[a-zA-Z_\-\s]+$")
+headerV2pattern=re.compile(r"^[A-Z]{2,4}\s*\\\([a-zA-Z_\s\-]+\\\)\s*$")
+
+#patterns used to rewrite the trailer object (see method updatetrailer)
+trailerpattern=re.compile(r"^trailer\s*\n?\r?<</Root (\d+ \d+ )R>>\s*\n?\r?\s*%%EOF")
+catalogpattern=re.compile(r"^(\d+ \d+ )(R|obj)")
+
+#patterns used to validate and convert color values (see methods rgb_inttohex, rgb_hextoint, rgb_fractoint, rgb_c_inttofrac and rgb_da_inttofrac)
+intrgbpattern=re.compile(r"^\[?\s*(\d{1,3})\s+(\d{1,3})\s+(\d{1,3})\s*\]?$")       #optional square brackets followed by optional space(s), each rgb component can max consist of 3 digits, separated by at least 1 space.
+hexrgbpattern=re.compile(r"^#([0-9A-F]{2})([0-9A-F]{2})([0-9A-F]{2})$")          #hashtag followed by 6 hexadecimal chars
+fracrgbpattern=re.compile(r"^\[([01](\.\d{1,6}){0,1})\s+([01](\.\d{1,6}){0,1})\s+([01](\.\d{1,6}){0,1})\]$")      #0 or 1 followed by decimal separator (.) and followed by at least one and up to 6 decimals for each component
+
+#patterns used to process the /RC value of an annotation (see class fdf_styleengine)
+htmlbodytagpattern=re.compile(r"<html:body .*?>")
+htmltagpattern=re.compile(r"</?html:")
+rcreturnpattern=re.compile(r"\\[\r\n]")
+rcstylepattern=re.compile(r"(style(?<!\wstyle)\s*=\s*\")([^\"]*?)\"")         #equivalent to \bstyle, with the word boundary checked after the literal so the search can skip to its occurrences
+spanopentagpattern=re.compile(r"(\<\s*?span\s+?.*?\>)")
+spanclosetagpattern=re.compile(r"(\<\s*?/span\>)")
+spantagpattern=re.compile(r"\<\s*?(?:span\s+?.*?|/span)\>")
+popentagpattern=re.compile(r"(\<\s*p\s+?.*?\>)")
+pclosetagpattern=re.compile(r"(\</p\>)")
+rctextpattern=re.compile(r">([^<>]+)<")                 #text between 2 tags, replaced by a placeholder to obtain the /RC template (see class fdf_styleengine)
+rctextunsafepattern=re.compile(r"[\"\n\x00]|style")      #text that could be read as part of a style attribute or tag by the /RC methods
+rctemplateunsafepattern=re.compile(r"\x00(?:\<\s*?(?:span\s+?.*?|/span)\>)+(?!\<|$)|(?:^|[^>])(?:\<\s*?(?:span\s+?.*?|/span)\>)+\x00")       #text that becomes adjacent to other text than a tag once the span tags are dropped
+
+
+#style profile applying the SDTM-MSG V2.0 formatting of Example_use.py (see class fdf_styleengine). Style profiles can be stored as json or toml files (see method loadstyleprofile).
+#only first 4 background colors defined in SDTM-MSG MSG V2.0, extra color order defined when needed
+msgv2styleprofile={
+    "headerrule": "MSGV2",          #method used to qualify an annotation as domain header: "MSGV1" (qualifyasheaderMSGV1) or "MSGV2" (qualifyasheaderMSGV2)
+    "rcstyle": {'font-size':'12.0pt', 'text-align':'left', 'color':'#000000', 'font-weight': 'normal', 'font-style': 'normal', 'font-family':'Arial', 'font-stretch':'normal'},
+    "header": {
+        "rcspan": ['<span style="font-weight:bold">', '</span>'],       #opening and closing span tag added on top of rcstyle (empty list: no span added)
+        "ds": 'font: bold Arial,sans-serif 12.0pt; text-align:left; color:#000000 ',
+        "da": '0 0 0 rg /Arial,Bold 12 Tf',
+    },
+    "variable": {
+        "rcspan": [],
+        "ds": 'font: Arial,sans-serif 12.0pt; text-align:left; color:#000000 ',
+        "da": '0 0 0 rg /Arial 12 Tf',
+    },
+    "backgroundcolororder": ['191 255 255', '255 255 150', '150 255 150', '255 190 155', '0 146 146', '182 109 255', '219 109 0', '255 109 182', '0 109 219', '36 255 36', '255 182 219', '109 182 255'],
+    "opacity": "keep",              #/CA policy: "keep" (unchanged), "drop" (tag removed, as method dropca) or a value assigned to existing /CA tags, e.g. "1"
+}
+
+#patterns used to measure the text of an annotation (see method fitrects)
+dafontpattern=re.compile(r"/([^\s/]+)\s+([0-9.]+)\s+Tf")              #font name and size within the /DA value, e.g. "/Arial,Bold 12 Tf"
+boldfontpattern=re.compile(r"(?:Bold(?:Italic|Oblique)?(?:PS)?(?:MT)?|^HeBo)$")      #bold font name: Bold suffix (Arial,Bold, Helvetica-Bold, Arial-BoldMT, Arial-BoldItalicMT, ...) or the Acrobat resource name HeBo
+pdfescapepattern=re.compile(r"\\(\r\n|[\r\n]|[0-7]{1,3}|.)", re.S)     #escape sequence within a string value enclosed in parentheses
+
+#advance widths (1/1000 em) of the printable ASCII characters (32-126) of Helvetica and Helvetica-Bold (Adobe core font metrics).
+#Arial has the same advance widths as Helvetica, so the tables apply to both. Other characters are measured as their unaccented base character (see function fontwidthtable).
+fontwidths_dict={
+    "regular": (278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+                1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+                333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556, 556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584),
+    "bold": (278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+             975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+             333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611, 611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def fontwidthtable(weight: str) -> tuple:
+    """
+    Function that returns the advance widths (1/1000 em) of the provided font weight for all 256 windows-1252 byte values, so the width of an encoded text is the sum of the table values of its bytes.
+    Characters outside printable ASCII are given the width of their unaccented base character (e.g. é as e), or the width of the digits (556) if there is none.
+
+    Input: weight (str): "regular" or "bold" (see fontwidths_dict).
+    Return: (tuple) 256 advance widths.
+    """
+    asciiwidths=fontwidths_dict[weight]
+    table=[]
+    for bytevalue in range(256):
+        character=bytes([bytevalue]).decode('windows-1252', errors='replace')
+        base=unicodedata.normalize("NFKD", character)[:1] or character
+        table.append(asciiwidths[ord(base)-32] if 32<=ord(base)<=126 else (0 if bytevalue<32 else 556))
+    return tuple(table)
+
+
+@functools.lru_cache(maxsize=None)
+def bytespattern(pattern: re.Pattern) -> re.Pattern:
+    """
+    Function that returns the bytes equivalent of one of the compiled patterns above, used to search the memory-mapped file content directly (use_mmap="Y").
+    A new line (\\n) within the pattern matches any of the new line sequences \\r\\n, \\r or \\n, as they're all read as \\n when loading the file as text.
+
+    Input: pattern (re.Pattern): compiled str pattern.
+    Return: (re.Pattern) compiled bytes pattern.
+    """
+    return re.compile(pattern.pattern.replace(r"\n", r"(?:\r\n|\r|\n)").encode('windows-1252'))
+
+
+@functools.lru_cache(maxsize=65536)
+def stylemappingevents(stylevalue: str) -> tuple:
+    """
+    Function that returns the read-only style attribute mapping of the provided style attribute value (see function stylemapping), 
+    together with the messages reported by method fdf_annotations.string_to_dict while parsing it (see method fdf_diagnostics.capture).
+
+    Input: stylevalue (str): value of a style attribute.
+    Return: (tuple) (types.MappingProxyType) read-only {key: value} mapping, tuple of (event type, message) reported.
+    """
+    return diagnostics.capture(lambda: types.MappingProxyType(fdf_annotations.string_to_dict(stylevalue, ':', ';')))
+
+
+def stylemapping(stylevalue: str) -> types.MappingProxyType:
+    """
+    Function that returns the style attribute dictionary of the provided style attribute value (see method fdf_annotations.string_to_dict) as a read-only mapping,
+    shared by all style attributes with the same value (e.g. the master style of every annotation exported by the same tool), instead of a new dictionary per occurrence.
+    The shared mappings are only used internally (method normalizerc), public methods (e.g. getrcstyles) return a copy as dictionary.
+    The parsing is cached, the messages of string_to_dict are kept with the mapping and reported again each time the style attribute value is encountered.
+
+    Input: stylevalue (str): value of a style attribute, e.g. "font-size:12.0pt;color:#000000".
+    Return: (types.MappingProxyType) read-only {key: value} mapping.
+    """
+    mapping, events=stylemappingevents(stylevalue)
+    diagnostics.replay(events)
+    return mapping
+
+
+def internvalue(value):
+    """
+    Function that returns the interned (sys.intern) version of the provided attribute value, so repeated values kept by the indexes (e.g. /Subtype or /T) share a single string.
+
+    Input: value (str or other): attribute value.
+    Return: the interned string, or the provided value if it's not a string.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+class fdf_diagnostics:
+    """
+    Class that collects the messages reported by the functions and methods of this module (e.g. an attribute requested by a getter that is missing within the annotation) as typed events:
+
+    * counter_dict (Counter) contains the number of events reported per event type,
+    * sample_dict contains the first samplesize messages reported per event type.
+
+    Messages are printed when reported, unless quiet mode is set (quiet="Y"): batch runs on large files then only keep the counters and samples, which method summary reports at the end.
+    Cached computations (e.g. function stylemapping) keep the events reported while computing their value (see method capture) and replay them on every cache hit (see method replay),
+    so the counters count every occurrence and don't depend on what the process has processed before.
+    All functions and methods of this module report to the module-level instance diagnostics. Event types used:
+
+    * missingobject: the provided object identifier (or session key) is not found.
+    * missingattribute: the attribute requested or to be updated is not present within the object.
+    * malformedvalue: an attribute value or tag is not properly opened, closed or structured (e.g. a /RC closing parenthesis or <p> tag missing).
+    * unexpectedsubobject: an annotation references a subobject other than /BS, /Popup or /Parent.
+    * missingdependency: an optional package (NumPy) required by the method is not installed.
+    * notice: informative message (e.g. subobjects removed together with an annotation).
+    """
+
+    def __init__(self, quiet: str ="N", samplesize: int =5) -> None:
+        """
+        Method that creates an empty diagnostics sink.
+
+        Input:
+            quiet = "Y"|"N": optional parameter to record the messages without printing them. Default is set to "N".
+            samplesize (int): maximum number of messages kept per event type. Default is 5.
+        Return: None.
+        """
+        self.quiet=quiet
+        self.samplesize=samplesize
+        self.counter_dict=Counter()
+        self.sample_dict=defaultdict(list)
+        self.capture_list=[]        #stack of event lists collecting the events reported within method capture
+
+    def report(self, eventtype: str, message: str) -> None:
+        """
+        Method that records the provided message under the provided event type, and prints it unless quiet mode is set.
+
+        Input:
+            eventtype (str): type of the event (see class docstring), e.g. "missingattribute".
+            message (str): message describing the event.
+        Return: None.
+        """
+        if self.capture_list:
+            self.capture_list[-1].append((eventtype, message))
+            return
+        self.counter_dict[eventtype]+=1
+        samples=self.sample_dict[eventtype]
+        if len(samples)<self.samplesize:
+            samples.append(message)
+        if self.quiet!="Y":
+            print(message)
+
+    def capture(self, function, *args) -> tuple:
+        """
+        Method that calls the provided function and returns its result together with the events reported during the call, instead of recording them.
+        The events are to be recorded by method replay, each time the (cached) result is used.
+
+        Input:
+            function: function to be called.
+            args: arguments of the function.
+        Return: (tuple) result of the function, tuple of (event type, message) reported during the call.
+        """
+        events=[]
+        self.capture_list.append(events)
+        try:
+            result=function(*args)
+        finally:
+            self.capture_list.pop()
+        return result, tuple(events)
+
+    def replay(self, events: tuple) -> None:
+        """
+        Method that records the provided events, as returned by method capture.
+
+        Input: events (tuple): (event type, message) per event.
+        Return: None.
+        """
+        for eventtype, message in events:
+            self.report(eventtype, message)
+
+    def counts(self) -> Counter:
+        """
+        Method that returns a copy of the number of events per event type, e.g. to determine the events reported by a single file (see function formatfdffile).
+
+        Input: None.
+        Return: (Counter) number of events per event type.
+        """
+        return Counter(self.counter_dict)
+
+    def merge(self, counts: dict) -> None:
+        """
+        Method that adds the provided number of events per event type, as reported within another process (e.g. a worker process of applystyleprofile).
+
+        Input: counts (dict): number of events per event type.
+        Return: None.
+        """
+        self.counter_dict.update(counts)
+
+    def reset(self) -> None:
+        """
+        Method that clears all counters and samples (quiet mode is kept).
+
+        Input: None.
+        Return: None.
+        """
+        self.counter_dict.clear()
+        self.sample_dict.clear()
+
+    def summary(self) -> str:
+        """
+        Method that returns the summary report of the events recorded: the number of events per event type, followed by the sampled messages.
+
+        Input: None.
+        Return: (str) summary report, one line per event type and sampled message.
+        """
+        lines=[f"{sum(self.counter_dict.values())} diagnostic events reported."]
+        for eventtype, count in self.counter_dict.most_common():
+            lines.append(f"{eventtype:<20} {count}")
+            lines.extend(f"    {message}" for message in self.sample_dict.get(eventtype, []))
+        return "\n".join(lines)
+
+
+diagnostics=fdf_diagnostics()       #diagnostics sink used by all functions and methods of this module
+snapshotversion=1                   #format version of the snapshots written by fdf_annotations.savesnapshot: snapshots of another version are rebuilt
+manifestversion=1                   #format version of the manifests returned by fdf_annotations.applystyleprofileincremental: manifests of another version are ignored
+
+
+class fdf_profiler:
+    """
+    Class that records the wall time, the number of calls and (optionally) the peak memory allocated per phase and per public method of an fdf_annotations object.
+    Instrumentation is opt-in: an fdf_annotations object only measures its phases and methods when a profiler is provided (parameter profiler), otherwise method phase returns a context manager doing nothing.
+
+    * phase_dict contains the measurements per phase: load (tokenizing the file), index (building the attribute and spatial indexes), transform (applystyleprofile), colormap (background color replacements), rebuild (root catalog and trailer) and write (exporting the file).
+    * method_dict contains the measurements per public method of fdf_annotations called on the instrumented object. For generator methods (e.g. exportpieces) the measurement covers the whole iteration.
+
+    Each measurement is a dictionary {"calls": int, "seconds": float, "peakbytes": int}. Peak memory is measured with tracemalloc when memory="Y" (peakbytes is the peak allocated on top of the memory held at the start of the call, nested calls included), otherwise peakbytes stays 0.
+    Callbacks added by method addcallback are called at the start and end of each phase and method call, e.g. to forward the events to an external profiler: callback(event, kind, name, measurement) with event "start"|"end", kind "phase"|"method" and measurement the dictionary {"seconds": float, "peakbytes": int} of the call at the end event (None at the start event).
+    """
+
+    def __init__(self, memory: str ="N", methods: str ="Y") -> None:
+        """
+        Method that creates an empty profiler.
+
+        Input:
+            memory = "Y"|"N": optional parameter to measure the peak memory with tracemalloc (which slows down the measured code). Default is set to "N".
+            methods = "Y"|"N": optional parameter to measure the public methods in addition to the phases. Default is set to "Y".
+        Return: None.
+        """
+        self.memory=memory
+        self.methods=methods
+        self.phase_dict={}
+        self.method_dict={}
+        self.callbacks=[]
+        self.stack=[]                   #[memory at start, peak memory] per running measurement (memory="Y" only)
+        self.started="N"                #"Y" if tracemalloc was started by the profiler (see method close)
+        self.instrumented=weakref.WeakSet()     #fdf_annotations objects instrumented by the profiler (see method uninstrument)
+
+    def addcallback(self, callback) -> None:
+        """
+        Method that adds a callback called at the start and end of each measured phase and method (see class docstring).
+
+        Input: callback (callable): function accepting the parameters event, kind, name and measurement.
+        Return: None.
+        """
+        self.callbacks.append(callback)
+
+    @contextlib.contextmanager
+    def measure(self, kind: str, name: str):
+        """
+        Method (context manager) that measures the code run within the with statement as a call of the provided phase or method.
+
+        Input:
+            kind = "phase"|"method": type of the measured code.
+            name (str): name of the phase or method.
+        Return: context manager.
+        """
+        for callback in self.callbacks:
+            callback("start", kind, name, None)
+        if self.memory=="Y":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started="Y"
+            current, peak=tracemalloc.get_traced_memory()
+            if self.stack:
+                self.stack[-1][1]=max(self.stack[-1][1], peak)      #keep the peak of the enclosing measurement before resetting it
+            tracemalloc.reset_peak()
+            frame=[current, current]
+            self.stack.append(frame)
+        start=time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds=time.perf_counter()-start
+            peakbytes=0
+            if self.memory=="Y" and tracemalloc.is_tracing():
+                startcurrent, peak=frame
+                self.stack.remove(frame)        #removed by identity: a generator method may be left unfinished while other measurements end
+                peak=max(peak, tracemalloc.get_traced_memory()[1])
+                peakbytes=peak-startcurrent
+                if self.stack:
+                    self.stack[-1][1]=max(self.stack[-1][1], peak)
+                tracemalloc.reset_peak()
+            measurement_dict=(self.phase_dict if kind=="phase" else self.method_dict).setdefault(name, {"calls": 0, "seconds": 0.0, "peakbytes": 0})
+            measurement_dict["calls"]+=1
+            measurement_dict["seconds"]+=seconds
+            measurement_dict["peakbytes"]=max(measurement_dict["peakbytes"], peakbytes)
+            for callback in self.callbacks:
+                callback("end", kind, name, {"seconds": seconds, "peakbytes": peakbytes})
+
+    def instrument(self, annots) -> None:
+        """
+        Method that replaces the public methods of the provided fdf_annotations object by wrappers measuring each call (as instance attributes, the class itself is not modified).
+        The wrappers only keep a weak reference to the object, so no reference cycle is created; they're removed by method uninstrument (called by method close).
+        Nothing is done when methods="N".
+
+        Input: annots (fdf_annotations): object to be instrumented.
+        Return: None.
+        """
+        if self.methods!="Y":
+            return
+        annotsref=weakref.ref(annots)
+        for name, value in vars(fdf_annotations).items():
+            if name.startswith("_") or name=="phase" or not isinstance(value, (types.FunctionType, staticmethod)):
+                continue
+            if isinstance(value, staticmethod):
+                setattr(annots, name, self.wrapmethod(name, value.__func__))
+            else:
+                setattr(annots, name, self.wrapmethod(name, value, annotsref))
+        self.instrumented.add(annots)
+
+    def uninstrument(self, annots) -> None:
+        """
+        Method that removes the wrappers added by method instrument from the provided fdf_annotations object.
+
+        Input: annots (fdf_annotations): instrumented object.
+        Return: None.
+        """
+        for name, value in list(vars(annots).items()):
+            if getattr(value, "__wrapped__", None) is not None and name in vars(fdf_annotations):
+                delattr(annots, name)
+        self.instrumented.discard(annots)
+
+    def wrapmethod(self, name: str, function, annotsref=None):
+        """
+        Method that returns a wrapper measuring each call of the provided function. For generator functions the wrapper is a generator as well, measuring the whole iteration.
+
+        Input:
+            name (str): name under which the calls are recorded.
+            function (callable): function to be wrapped, as defined within the class.
+            annotsref (weakref.ref): weak reference to the object passed as self, or None for a static method.
+        Return: (callable) wrapper.
+        """
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.measure("method", name):
+                    yield from function(*((annotsref(),)+args if annotsref is not None else args), **kwargs)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.measure("method", name):
+                    return function(*((annotsref(),)+args if annotsref is not None else args), **kwargs)
+        return wrapper
+
+    def report(self) -> dict:
+        """
+        Method that returns the measurements recorded so far, methods sorted by descending time.
+
+        Input: None.
+        Return: (dict) {"phases": {phase: measurement}, "methods": {method: measurement}, "memory": "Y"|"N"}.
+        """
+        return {"phases": {name: dict(measurement) for name, measurement in self.phase_dict.items()},
+                "methods": {name: dict(measurement) for name, measurement in sorted(self.method_dict.items(), key=lambda item: -item[1]["seconds"])},
+                "memory": self.memory}
+
+    def dumpreport(self, outputpath: str) -> None:
+        """
+        Method that writes the report (see method report) to the provided JSON file, e.g. one report per run.
+
+        Input: outputpath (str): path of the JSON file.
+        Return: None.
+        """
+        with open(outputpath, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def close(self) -> None:
+        """
+        Method that removes the wrappers from the instrumented objects (see method uninstrument) and stops tracemalloc if it was started by the profiler.
+
+        Input: None.
+        Return: None.
+        """
+        for annots in list(self.instrumented):
+            self.uninstrument(annots)
+        if self.started=="Y":
+            tracemalloc.stop()
+            self.started="N"
+        self.stack.clear()
+
 
 class fdf_annotations:
     """
@@ -19,241 +505,623 @@ class fdf_annotations:
     The class is designed to be extended by additional methods easily. It only consists of a handful of lists and dictionaries within an object that contain the information contained within the FDF file:
     
     * ordered_fdf_key is a list containing the chronologically encountered object identifier (header, ..., trailer).
-    * root_key is a list containing the object references included in the root object. This should be seen as an annotations inventory embedded within the FDF file.
+    * root_key is a list (fdf_rootkey) containing the object references included in the root object. This should be seen as an annotations inventory embedded within the FDF file.
     * fdf_dict is the central dictionary containing the object identifier of each annotation object as key, and the value the full FDF string contained within that object.
     * bs_subobject dict is a dictionary containing all annotation objects that have their border style defined in another object referenced from it. The latter object is not included in the root_key list.
     * popup_subobject_dict and parent_subobject_dict contain references towards each other. Typically the information to define a line, arrow, ... is spread around these 2 objects Both objects are typically referenced from within the root_key list.
+    * record_dict is a dictionary containing an fdf_annotationrecord per annotation object (created upon first access), holding the location of the main attribute values within the object.
+    * dirty_keys is a set containing the object identifiers modified since loading. Upon export of a memory-mapped file (use_mmap="Y") all other objects are copied as such from the mapping.
      
     The majority of the methods provided use regular expressions to obtain/update the required parameters of interest.
     Additional methods of interest can easily be added accordingly to obtain and manipulate the desired information contained in the dictionaries and lists.      
     
     """
-    root_key=[]                #list containing all objects referenced from the root catalog object
-    ordered_fdf_key=[]
-    fdf_dict={}
-    bs_subobject_dict={}       #border style subobject references - referenced objects not included in root_key
-    popup_subobject_dict={}    #popup style subobject references - referenced objects included in root_key
-    parent_subobject_dict={}   #parent style subobject references - referenced objects included in root_key
-    interobjectcounter=0
     
-    def __init__(self, inputfdfpath: str) -> None:
+    def __init__(self, inputfdfpath: str =None, use_mmap: str ="N", profiler=None, snapshotpath: str =None) -> None:
         """
         Method to load an FDF file into the fdf_annotations class. The FDF file is assumed to be obtained by exporting comments from an existing SDTM acrf.pdf in Adobe Reader 2025.x.y.
+        All lists and dictionaries are owned by the created object, so multiple FDF files can be loaded side by side within the same process (see also class fdf_session).
+
+        By default the file is read into memory as a single string. For very large files use_mmap="Y" can be provided instead: the file is then memory-mapped and 
+        fdf_dict only keeps the location of each object within the mapping. Object values and attribute values are only decoded when requested (e.g. by a getter), 
+        while modified objects are kept as strings. The file remains opened until method release is called and should not be modified in the meantime.
+        If no inputfdfpath is provided an empty object is created (as used by method streamfdf).
+
+        When a snapshotpath is provided the parsed object table (see method savesnapshot) is restored from that snapshot file instead of splitting the file into objects again, 
+        provided the snapshot was written for the same file content and use_mmap mode. A missing or stale snapshot is (re)written after parsing the file.
 
-        Input: inputfdfpath (str): string containing the path to an fdf file that is to be loaded.
+        Input: 
+            inputfdfpath (str): string containing the path to an fdf file that is to be loaded.
+            use_mmap = "Y"|"N": optional parameter to memory-map the file instead of reading it into memory. Default is set to "N".
+            profiler (fdf_profiler): optional profiler recording the phases (load, index, transform, colormap, rebuild, write) and public method calls of the object.
+            snapshotpath (str): optional path of the snapshot file to be restored from or written to (see method savesnapshot).
         Output: fdf_annotations object containing the provided FDF file contents.
         Return: None.         
         """
 
-        #load input fdf        
-        with open(inputfdfpath, "r", encoding='windows-1252') as file:
-            input_fdf_content=file.read()
-        
-        #obtain header from input fdf   [header: everything until first object identifier (in lookahead)]
-        headerendtag=r"\n(?=\d+ \d+ obj\n)"
-        headerend=re.search(headerendtag, input_fdf_content)    
-        headertext=input_fdf_content[0:headerend.span()[0]]    
-        self.fdf_dict["header"]=headertext
-        self.ordered_fdf_key.append("header")    
-        toprocess=input_fdf_content[headerend.span()[1]:]    
-        #obtain individual objects - loop per object
-        objectidtag=r"\d+ \d+ obj(?=\n)"
-        objectendtag=r"endobj(?=\n)"
-        objectid=re.search(objectidtag, toprocess)    
-        while objectid!=None:        
-            objectidstart=objectid.span()[0]
-            if objectidstart !=0:
-                self.fdf_dict[f"interobj{str(self.interobjectcounter)}"]=toprocess[0:objectidstart]
-                self.ordered_fdf_key.append(f"interobj{str(self.interobjectcounter)}")
-                self.interobjectcounter+=1
-            objectend=re.search(objectendtag, toprocess)
-        
-            objectkey=toprocess[objectidstart:objectid.span()[1]]        
-            self.fdf_dict[objectkey]=toprocess[objectid.span()[1]+1:objectend.span()[1]]        
+        self.inputfdfpath=inputfdfpath
+        self.root_key=fdf_rootkey()     #list containing all objects referenced from the root catalog object
+        self.rootvalue_serialised=None  #(root_key version, root catalog value) as last serialised by updaterootvalue
+        self.ordered_fdf_key=[]
+        self.fdf_dict={}
+        self.bs_subobject_dict={}       #border style subobject references - referenced objects not included in root_key
+        self.popup_subobject_dict={}    #popup style subobject references - referenced objects included in root_key
+        self.parent_subobject_dict={}   #parent style subobject references - referenced objects included in root_key
+        self.referencedby_dict={}       #reverse subobject references: referenced object identifier -> set of object identifiers referencing it (via /BS, /Popup or /Parent)
+        self.position_dict={}           #position of each object identifier within ordered_fdf_key (see method indexof)
+        self.positionshift=0            #number of objects removed from ordered_fdf_key since position_dict was built, i.e. maximum shift of the positions stored
+        self.record_dict={}             #parsed fdf_annotationrecord per object identifier, created upon first access
+        self.index_dict=None            #secondary indexes: attribute -> {value: set of object identifiers}, built upon first use (see method buildindexes)
+        self.indexentry_dict={}         #indexed values per object identifier: {attribute: value}
+        self.staleindex_keys=set()      #object identifiers modified since they were indexed
+        self.spatialindex=None          #fdf_spatialindex of the /Rect values per page, built upon first use (see method getspatialindex)
+        self.source_buffer=None         #memory-mapped content of the loaded fdf file (use_mmap="Y"): unmodified objects are copied from it upon export
+        self.source_file=None
+        self.source_span={}             #(start, end, loaded value) of the text written for each object identifier within source_buffer
+        self.dirty_keys=set()           #object identifiers whose value was modified since loading
+        self.interobjectcounter=0
+        self.source_stat=None           #(size, mtime_ns) of the loaded fdf file
+        self.snapshotpath=None          #snapshot file of the loaded fdf file (see method savesnapshot)
+        self.snapshot_spans=None        #offsets of each object within the loaded fdf file, as stored within the snapshot
+        self.profiler=profiler          #optional fdf_profiler (instrumentation is opt-in, see method phase)
+        if profiler is not None:
+            profiler.instrument(self)
+        if inputfdfpath is None:
+            return
+
+        with self.phase("load"):
+            #load input fdf        
+            sourcestat=os.stat(inputfdfpath)
+            self.source_stat=(sourcestat.st_size, sourcestat.st_mtime_ns)
+            if use_mmap=="Y":
+                self.source_file=open(inputfdfpath, "rb")
+                self.source_buffer=mmap.mmap(self.source_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.fdf_dict=fdf_mappeddict(self.source_buffer)
+                input_fdf_content=self.source_buffer
+            else:
+                with open(inputfdfpath, "r", encoding='windows-1252') as file:
+                    input_fdf_content=file.read()     #only kept as the values sliced into fdf_dict, exportfdf writes these values together with the object identifiers
+
+            snapshot_dict=self.readsnapshot(snapshotpath, use_mmap) if snapshotpath is not None else None
+            if snapshot_dict is not None:
+                self.restoresnapshot(snapshot_dict, input_fdf_content)
+            else:
+                spans=self.parsefdf(input_fdf_content)
+        if snapshotpath is not None:
+            self.snapshotpath=snapshotpath
+            self.snapshot_spans=snapshot_dict["spans"] if snapshot_dict is not None else spans
+            if snapshot_dict is None or snapshot_dict["mtime_ns"]!=self.source_stat[1]:     #new, stale or touched (same content) source file
+                self.savesnapshot()
+
+
+    def parsefdf(self, input_fdf_content) -> array.array:
+        """
+        Method that splits the provided content of the loaded fdf file into objects (see method tokenizefdf) and populates ordered_fdf_key, fdf_dict, root_key and the subobject dictionaries, as done by the __init__ method.
+
+        Input: input_fdf_content (str or mmap): full content of the loaded fdf file (mmap if loaded with use_mmap="Y").
+        Return: (array) offsets chunkstart, valuestart, valueend and chunkend of each object (see method tokenizefdf) in ordered_fdf_key order, as stored within a snapshot (see method savesnapshot).
+        """
+
+        #split input fdf into header, objects, interobject text and trailer in a single pass over the string
+        spans=array.array("q")
+        for objectkey, chunkstart, valuestart, valueend, chunkend in fdf_annotations.tokenizefdf(input_fdf_content):
+            spans.extend((chunkstart, valuestart, valueend, chunkend))
+            if self.source_buffer is not None:
+                self.fdf_dict.setraw(objectkey, (valuestart, valueend))
+            else:
+                self.fdf_dict[objectkey]=input_fdf_content[valuestart:valueend]
+            self.position_dict[objectkey]=len(self.ordered_fdf_key)
             self.ordered_fdf_key.append(objectkey)
-            # prepare for next iteration
-            toprocess=toprocess[objectend.span()[1]+1:]
-            objectid=re.search(objectidtag, toprocess)    
-        #obtain trailer = everything left below last annotation object
-        self.fdf_dict["trailer"]=toprocess
-        self.ordered_fdf_key.append("trailer")
-        toprocess=""
+            if self.source_buffer is not None:
+                self.source_span[objectkey]=(chunkstart, chunkend, self.getrawannotation(objectkey))
+            if objectkey.startswith("interobj"):
+                self.interobjectcounter+=1
 
         #populate root_key list with referenced annotations object IDs:  (inventory object = 2nd item in ordered_fdf_key)
         inventoryobjtext=self.fdf_dict[self.ordered_fdf_key[1]]
-        inventorytag=r"/Annots\[((\d+ \d+ R )*(\d+ \d+ R))\]"
-        inventorymatch=re.search(inventorytag, inventoryobjtext)
+        inventorymatch=inventorypattern.search(inventoryobjtext)
         if inventorymatch:
-            inventory_toprocess=inventorymatch.group(1)
-            individualreftag=r"\d+ \d+ R"
-            while inventory_toprocess:                
-                individualrefmatch=re.search(individualreftag, inventory_toprocess)
-                if individualrefmatch:
-                    self.root_key.append(inventory_toprocess[individualrefmatch.span()[0]:individualrefmatch.span()[1]])
-                    inventory_toprocess=inventory_toprocess[individualrefmatch.span()[1]+1:].strip()
-                else:
-                    print(f"Unanticipated residual string encountered within root object provided: {inventory_toprocess}")
-                    self.root_key.append(inventory_toprocess)
-                    inventory_toprocess=""            
+            self.root_key.extend(individualrefpattern.findall(inventorymatch.group(1)))
+            self.rootvalue_serialised=(self.root_key.version, inventoryobjtext)
         else:
-            print(f"No referenced annotation blocks found within the inventory root object within the privded fdf file {inputfdfpath}.")
+            diagnostics.report("missingattribute", f"No referenced annotation blocks found within the inventory root object within the privded fdf file {self.inputfdfpath}.")
             
         #populate subobject_dicts i.e. objects referenced from a parent object (excluding the inventory root object)
-        referencetag=r"(?<!\\)(/BS|/Popup|/Parent|/[^/]+?) (\d+ \d+ R)"
         for item in self.ordered_fdf_key[2:]:         #actively excluding header and catalog object   
-            annotcontent=self.fdf_dict[item]            
-            referencematch=re.search(referencetag, annotcontent)        
+            if self.source_buffer is not None:          #search the memory-mapped object without decoding it
+                valuestart, valueend=self.fdf_dict.getraw(item)
+                if self.source_buffer.find(b" R", valuestart, valueend)==-1:
+                    continue
+                referencematch=bytespattern(referencepattern).search(self.source_buffer, valuestart, valueend)
+                referencegroups=[group.decode('windows-1252') for group in referencematch.groups()] if referencematch else None
+            else:
+                annotcontent=self.fdf_dict[item]            
+                if " R" not in annotcontent:        #a reference always ends with " R": skip the (costly) pattern search for objects without any
+                    continue
+                referencematch=referencepattern.search(annotcontent)        
+                referencegroups=referencematch.groups() if referencematch else None
             if referencematch and item !="trailer":      #actively excluding trailer object
-                if referencematch.group(1)=="/BS":
-                    self.bs_subobject_dict[item]=referencematch.group(2)
-                elif referencematch.group(1)=="/Popup":
-                    self.popup_subobject_dict[item]=referencematch.group(2)
-                elif referencematch.group(1)=="/Parent":
-                    self.parent_subobject_dict[item]=referencematch.group(2)
+                if referencegroups[0]=="/BS":
+                    self.bs_subobject_dict[item]=referencegroups[1]
+                elif referencegroups[0]=="/Popup":
+                    self.popup_subobject_dict[item]=referencegroups[1]
+                elif referencegroups[0]=="/Parent":
+                    self.parent_subobject_dict[item]=referencegroups[1]
+                if referencegroups[0] in ("/BS", "/Popup", "/Parent"):
+                    self.referencedby_dict.setdefault(referencegroups[1][:-1]+"obj", set()).add(item)
                 else:
-                    print(f"Unanticipated subobject reference detected in content of annotation object (ID={item}): Deleting dependent objects might cause undesired results.")
+                    diagnostics.report("unexpectedsubobject", f"Unanticipated subobject reference detected in content of annotation object (ID={item}): Deleting dependent objects might cause undesired results.")
+        return spans
 
-
-    def __iter__(self):
-        """"
-        Iterate over elements present in ordered_fdf_key, i.e. the object IDs included in an fdf_annotation object.
-        """
-        return iter(self.ordered_fdf_key)
-    
-    
-    def getannotation(self, objectid) -> str:
+    def sourcehash(self) -> str:
         """
-        Method that returns the annotation value for the provided annotation id. Note that annotation value refers to the full object.
-        If the provided object id value is not existing in the fdf_dict it will return None.
+        Method that returns the SHA-256 hash of the content of the loaded fdf file, used to detect a stale snapshot (see method savesnapshot).
 
-        Input: objectid (str): String value containing the object identifier for the annotation.
-        Return: string value containing the value of the annotation stored in the fdf_dict for the provided objectid key.
+        Input: None.
+        Return: (str) hexadecimal hash.
         """
 
-        if objectid in self.fdf_dict:
-            return self.fdf_dict[objectid]
-        else: 
-            return None
+        if self.source_buffer is not None:
+            return hashlib.sha256(self.source_buffer).hexdigest()
+        with open(self.inputfdfpath, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
 
-    def __getitem__(self, objectid: str):
+    def savesnapshot(self, snapshotpath: str =None) -> bool:
         """
-        Method that calls the getannotation method.
+        Method that writes the object table of the loaded fdf file to a binary snapshot file, so the file can be loaded again without splitting it into objects (see __init__ parameter snapshotpath):
+        ordered_fdf_key, the offsets of each object within the file, root_key, the subobject dictionaries and, if built, the secondary indexes (see method buildindexes).
+        The snapshot starts with the key of the loaded file (snapshot format version, use_mmap mode, size, modification time and SHA-256 hash of the content), which is checked by method readsnapshot.
+        The snapshot describes the file as loaded, so it's only written as long as no object was modified (e.g. call this method after select to add the indexes to the snapshot).
+        Snapshots are pickled and must therefore only be loaded from trusted locations.
+
+        Input: snapshotpath (str): path of the snapshot file to be written. Default (None) is the snapshotpath provided to the __init__ method.
+        Return: (bool) True if the snapshot was written.
         """
-        return self.getannotation(self, objectid)
-    
 
-    def getcontent(self, objectid: str) -> str:
+        snapshotpath=snapshotpath or self.snapshotpath
+        if self.snapshot_spans is None or snapshotpath is None:
+            diagnostics.report("notice", "No snapshot written: the fdf file was not loaded with a snapshotpath.")
+            return False
+        sourcestat=os.stat(self.inputfdfpath)
+        modified=self.dirty_keys or self.positionshift or len(self.ordered_fdf_key)*4!=len(self.snapshot_spans) or (self.rootvalue_serialised is not None and self.rootvalue_serialised[0]!=self.root_key.version)
+        if modified or self.source_stat!=(sourcestat.st_size, sourcestat.st_mtime_ns):
+            diagnostics.report("notice", f"No snapshot written to {snapshotpath}: objects were modified since loading {self.inputfdfpath}, or the file itself was.")
+            return False
+
+        header_dict={"version": snapshotversion, "use_mmap": "Y" if self.source_buffer is not None else "N", "size": self.source_stat[0], "mtime_ns": self.source_stat[1], "sha256": self.sourcehash()}
+        indexed=self.index_dict is not None and not self.staleindex_keys
+        snapshot_dict={"ordered_fdf_key": self.ordered_fdf_key, "spans": self.snapshot_spans, "interobjectcounter": self.interobjectcounter, 
+                       "root_key": list(self.root_key), "inventory": "Y" if self.rootvalue_serialised is not None else "N",
+                       "bs_subobject_dict": self.bs_subobject_dict, "popup_subobject_dict": self.popup_subobject_dict, "parent_subobject_dict": self.parent_subobject_dict, "referencedby_dict": self.referencedby_dict,
+                       "index_dict": self.index_dict if indexed else None, "indexentry_dict": self.indexentry_dict if indexed else None}
+        os.makedirs(os.path.dirname(snapshotpath) or ".", exist_ok=True)
+        with open(snapshotpath+".tmp", "wb") as file:         #replaced at once, so a snapshot being read is never partially written
+            pickle.dump(header_dict, file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(snapshot_dict, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(snapshotpath+".tmp", snapshotpath)
+        return True
+
+    def readsnapshot(self, snapshotpath: str, use_mmap: str ="N") -> dict:
         """
-        Method that returns the value of the /Contents tag for the provided annotation id (objectid).
+        Method that reads the provided snapshot file (see method savesnapshot) if it was written for the loaded fdf file, i.e. for the same snapshot format version, use_mmap mode, size and
+        modification time. If only the modification time differs (e.g. the file was copied or touched) the SHA-256 hash of the content is compared instead.
 
-        Input: objectid (str): String value containing the object identifier for the annotation.
-        Return: (str) String containing the value of the /Contents attribute.
-                None is returned in case the provided objectid is not included in fdf_dict, or if the /Contents tag is not properly opened or closed.
+        Input: 
+            snapshotpath (str): path of the snapshot file.
+            use_mmap = "Y"|"N": mode the fdf file is loaded in (offsets within a memory-mapped file are byte offsets, otherwise offsets within the decoded text).
+        Return: (dict) content of the snapshot, with the modification time of the file it was written for (mtime_ns), or None if the snapshot is missing or stale.
         """
 
-        if objectid not in self.fdf_dict:
+        try:
+            with open(snapshotpath, "rb") as file:
+                header_dict=pickle.load(file)
+                if (header_dict.get("version"), header_dict.get("use_mmap"), header_dict.get("size"))!=(snapshotversion, use_mmap, self.source_stat[0]):
+                    return None
+                if header_dict["mtime_ns"]!=self.source_stat[1] and header_dict["sha256"]!=self.sourcehash():
+                    return None
+                snapshot_dict=pickle.load(file)
+        except FileNotFoundError:
             return None
-        if objectid in self.fdf_dict:
-            annotstring=self.fdf_dict[objectid]
-            contenttagstart=r"(?<!\\)(/Contents\()"
-            contenttagend=r"(?<!\\)(\))"
-            contentstartmatch=re.search(contenttagstart, annotstring)
-            if contentstartmatch:
-                toprocess=annotstring[contentstartmatch.end(1):]
-                contentendmatch=re.search(contenttagend, toprocess)
-                if contentendmatch:
-                    return toprocess[:contentendmatch.start(1)]
-
-            print(f"No proper opening and closing of /Contents tag found in provided object {objectid}.")
+        except (OSError, EOFError, AttributeError, TypeError, KeyError, pickle.UnpicklingError) as error:
+            diagnostics.report("notice", f"Snapshot {snapshotpath} could not be read ({type(error).__name__}) and is rebuilt.")
             return None
+        snapshot_dict["mtime_ns"]=header_dict["mtime_ns"]
+        return snapshot_dict
 
+    def restoresnapshot(self, snapshot_dict: dict, input_fdf_content) -> None:
+        """
+        Method that populates ordered_fdf_key, fdf_dict, root_key, the subobject dictionaries and (if included) the secondary indexes from the provided snapshot content (see method readsnapshot),
+        i.e. the equivalent of method parsefdf without searching the file content: object values are sliced at the stored offsets, or only their offsets are stored for a memory-mapped file.
 
-    def getrccontent(self, objectid) -> str:
+        Input: 
+            snapshot_dict (dict): content of the snapshot.
+            input_fdf_content (str or mmap): full content of the loaded fdf file.
+        Return: None.
         """
-        Method that returns the /RC attribute value for the provided annotation id.
-        If the provided object id value is not existing in the fdf_dict it will return None.
-        
-        Input: objectid (str): String value containing the object identifier for the annotation.
-        Return: (str) String containing the value of the /RC tag.
-                None is returned in case the provided objectid is not included in fdf_dict, or if the /RC tag is not properly opened or closed.
-        """   
 
-        if objectid not in self.fdf_dict:
-            return None
-        if objectid in self.fdf_dict:
-            annotstring=self.fdf_dict[objectid]
-            rcstarttag=r"(?<!\\)/RC\("
-            rcstartmatch=re.search(rcstarttag, annotstring)
-            if rcstartmatch:                
-                toprocess=annotstring[rcstartmatch.end():]
-                rcendtag=r"(?<!\\)\)"
-                rcendmatch=re.search(rcendtag, toprocess)
-                if rcendmatch:
-                    return toprocess[0:rcendmatch.start()]
-                else:
-                    print(f"No /RC closing parenthesis found for provided object {objectid}.")
-                    return None
-            else:
-                print(f"No /RC opening tag found in provided object {objectid}.")
-                return None
+        spans=snapshot_dict["spans"]
+        self.ordered_fdf_key=snapshot_dict["ordered_fdf_key"]
+        self.position_dict={objectkey: position for position, objectkey in enumerate(self.ordered_fdf_key)}
+        if self.source_buffer is not None:
+            for position, objectkey in enumerate(self.ordered_fdf_key):
+                rawvalue=(spans[4*position+1], spans[4*position+2])
+                self.fdf_dict.setraw(objectkey, rawvalue)
+                self.source_span[objectkey]=(spans[4*position], spans[4*position+3], rawvalue)
+        else:
+            self.fdf_dict={objectkey: input_fdf_content[spans[4*position+1]:spans[4*position+2]] for position, objectkey in enumerate(self.ordered_fdf_key)}
+        self.interobjectcounter=snapshot_dict["interobjectcounter"]
 
-    def getdscontent(self, objectid) -> str:
+        self.root_key.extend(snapshot_dict["root_key"])
+        if snapshot_dict["inventory"]=="Y":
+            self.rootvalue_serialised=(self.root_key.version, self.fdf_dict[self.ordered_fdf_key[1]])
+        else:
+            diagnostics.report("missingattribute", f"No referenced annotation blocks found within the inventory root object within the privded fdf file {self.inputfdfpath}.")
+        self.bs_subobject_dict=snapshot_dict["bs_subobject_dict"]
+        self.popup_subobject_dict=snapshot_dict["popup_subobject_dict"]
+        self.parent_subobject_dict=snapshot_dict["parent_subobject_dict"]
+        self.referencedby_dict=snapshot_dict["referencedby_dict"]
+        if snapshot_dict["index_dict"] is not None:
+            self.index_dict=snapshot_dict["index_dict"]
+            self.indexentry_dict=snapshot_dict["indexentry_dict"]
+
+    def phase(self, name: str):
         """
-        Method that returns the /DS attibute value for the provided annotation id.
-        If the provided object id value is not existing in the fdf_dict it will return None.
-        
-        Input: objectid (str): String value containing the object identifier for the annotation.
-        Return: (str) String containing the value of the /DS tag. 
-                None is returned in case the provided objectid is not included in fdf_dict, or if the /DS tag is not properly opened or closed.          
+        Method that returns the context manager measuring the provided phase with the profiler of the object (see class fdf_profiler), or a context manager doing nothing if no profiler was provided.
+
+        Input: name (str): name of the phase, e.g. "load".
+        Return: context manager.
         """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.measure("phase", name)
 
-        if objectid not in self.fdf_dict:
-            return None
-        if objectid in self.fdf_dict:            
-            annotstring=self.fdf_dict[objectid]
-            dsstarttag=r"(?<!\\)/DS\("
-            dsstartmatch=re.search(dsstarttag, annotstring)
-            if dsstartmatch:                
-                toprocess=annotstring[dsstartmatch.end():]
-                dsendtag=r"(?<!\\)\)"
-                dsendmatch=re.search(dsendtag, toprocess)
-                if dsendmatch:
-                    return toprocess[0:dsendmatch.start()]
-                else:
-                    print(f"No /DS closing parenthesis found for provided object {objectid}.")
-                    return None
-            else:
-                print(f"No /DS opening tag found in provided object {objectid}.")
-                return None
-    
-    def getdacontent(self, objectid) -> str:
+    @staticmethod
+    def tokenizefdf(fdftext):
+        r"""
+        Generator that splits the provided FDF text into its header, objects, interobject text and trailer by walking the string once.
+        Each element is located by searching from the current offset onwards, so no intermediate copies of the remaining text are created and the
+        processing time is linear in the size of the provided text.
+        The provided text can also be the undecoded (e.g. memory-mapped) file content, in which case the offsets are byte offsets.
+
+        Input: fdftext (str, bytes or mmap): full content of an fdf file (as read by the __init__ method).
+        Output: Generator yielding a tuple (key, chunkstart, valuestart, valueend, chunkend) for each element in the order encountered, where
+            key is the value to be used in ordered_fdf_key ("header", "\d+ \d+ obj", "interobjN" or "trailer"), 
+            fdftext[valuestart:valueend] is the value to be stored in fdf_dict, and 
+            fdftext[chunkstart:chunkend] is the text exportfdf writes for the element (i.e. including the object identifier and surrounding new lines).
         """
-        Method that returns the /DA attibute value for the provided annotation id.
-        If the provided object id value is not existing in the fdf_dict it will return None.
+
+        if isinstance(fdftext, str):
+            headerendtag, objectidtag, objectendtag=headerendpattern, objectidpattern, objectendpattern
+            newlinelength=lambda position: 1
+        else:
+            headerendtag, objectidtag, objectendtag=bytespattern(headerendpattern), bytespattern(objectidpattern), bytespattern(objectendpattern)
+            newlinelength=lambda position: 2 if fdftext[position:position+2]==b"\r\n" else 1
+
+        headerend=headerendtag.search(fdftext)
+        yield ("header", 0, 0, headerend.start(), headerend.end())
+        position=headerend.end()
+        interobjectcounter=0
+        objectid=objectidtag.search(fdftext, position)
+        while objectid!=None:
+            if objectid.start()!=position:      #text in between two objects
+                yield (f"interobj{str(interobjectcounter)}", position, position, objectid.start(), objectid.start())
+                interobjectcounter+=1
+            objectend=objectendtag.search(fdftext, position)
+            objectkey=objectid.group()
+            if not isinstance(objectkey, str):
+                objectkey=objectkey.decode('windows-1252')
+            # prepare for next iteration: objects usually follow each other directly, so try an anchored match before scanning ahead
+            chunkend=objectend.end()+newlinelength(objectend.end())
+            yield (objectkey, objectid.start(), objectid.end()+newlinelength(objectid.end()), objectend.end(), chunkend)
+            position=chunkend
+            objectid=objectidtag.match(fdftext, position) or objectidtag.search(fdftext, position)
+        #trailer = everything left below last annotation object
+        yield ("trailer", position, position, len(fdftext), len(fdftext))
+
+    @staticmethod
+    def iterfdf(inputfdfpath: str, blocksize: int =1048576):
+        r"""
+        Generator that reads the provided FDF file block by block and yields its header, objects, interobject text and trailer as soon as they're completely read.
+        The elements are located the same way as tokenizefdf does for the full file content, but only the text of the elements not yet yielded is held in memory.
         
-        Input: objectid (str): String value containing the object identifier for the annotation.
-        Return: (str) String containing the value of the /DA tag. 
-                None is returned in case the provided objectid is not included in fdf_dict, or if the /DA tag is not properly opened or closed.        
+        Input: 
+            inputfdfpath (str): string containing the path to an fdf file that is to be read.
+            blocksize (int): number of characters read at once. Default is 1048576 (1 MB).
+        Output: Generator yielding a tuple (key, value) for each element in the order encountered, where key is the value that would be used in ordered_fdf_key 
+            ("header", "\d+ \d+ obj", "interobjN" or "trailer") and value the value that would be stored in fdf_dict when loading the file using the __init__ method.
         """
 
-        if objectid not in self.fdf_dict:
-            return None
-        if objectid in self.fdf_dict:
-            annotstring=self.fdf_dict[objectid]
-            dastarttag=r"(?<!\\)/DA\("
-            dastartmatch=re.search(dastarttag, annotstring)
-            if dastartmatch:                
-                toprocess=annotstring[dastartmatch.end():]
-                daendtag=r"(?<!\\)\)"
-                daendmatch=re.search(daendtag, toprocess)
-                if daendmatch:
-                    return toprocess[0:daendmatch.start()]                    
-                else:
-                    print(f"No /DA closing parenthesis found for provided object {objectid}.")
-                    return None
-            else:
-                print(f"No /DA opening tag found in provided object {objectid}.")
-                return None
+        with open(inputfdfpath, "r", encoding='windows-1252') as file:
+            buffer=""
+            position=0        #start of the text not yet yielded within buffer
+            endoffile=False
+
+            def readblock():
+                nonlocal buffer, position, endoffile
+                block=file.read(blocksize)
+                endoffile=(block=="")
+                buffer=buffer[position:]+block      #drop the text already yielded
+                position=0
+
+            #header: a match is only accepted once the text it depends on (incl. lookahead) has been read
+            readblock()
+            headerend=headerendpattern.search(buffer)
+            while headerend is None and not endoffile:
+                readblock()
+                headerend=headerendpattern.search(buffer)
+            yield ("header", buffer[0:headerend.start()])
+            position=headerend.end()
+            interobjectcounter=0
+            while True:
+                objectid=objectidpattern.match(buffer, position) or objectidpattern.search(buffer, position)
+                objectend=objectendpattern.search(buffer, position) if objectid else None
+                if objectid is None or objectend is None:
+                    if endoffile:
+                        break
+                    readblock()
+                    continue
+                if objectid.start()!=position:      #text in between two objects
+                    yield (f"interobj{str(interobjectcounter)}", buffer[position:objectid.start()])
+                    interobjectcounter+=1
+                yield (objectid.group(), buffer[objectid.end()+1:objectend.end()])
+                position=objectend.end()+1
+            #trailer = everything left below last annotation object
+            yield ("trailer", buffer[position:])
+
+    @staticmethod
+    def decodesource(buffer, start: int, end: int) -> str:
+        """
+        Method that decodes the provided part of the undecoded (e.g. memory-mapped) file content into a string, the same way the file is read as text by the __init__ method:
+        windows-1252 encoding, with the new line sequences \\r\\n and \\r translated into \\n.
+
+        Input: 
+            buffer (bytes or mmap): undecoded file content.
+            start (int), end (int): byte offsets of the part to decode.
+        Return: (str) decoded text.
+        """
+
+        return str(buffer[start:end], 'windows-1252').replace("\r\n", "\n").replace("\r", "\n")
+
+    def getrawannotation(self, objectid: str):
+        """
+        Method that returns the value stored for the provided annotation id without decoding it: 
+        when the file was loaded with use_mmap="Y" this is a tuple (start, end) of byte offsets within the memory-mapped file for unmodified objects, or the string value otherwise.
+        If the provided object id value is not existing in the fdf_dict it will return None.
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: (str or tuple) stored value.
+        """
+
+        if self.source_buffer is not None:
+            return self.fdf_dict.getraw(objectid)
+        return self.fdf_dict.get(objectid)
+
+    def sourcepieces(self, start: int, end: int):
+        """
+        Generator that yields the text of the provided part of the memory-mapped file content (use_mmap="Y"), as copied by exportfdf for unmodified objects.
+        The part is decoded in blocks of 1 MB, so copying does not require the full text to be held in memory.
+
+        Input: start (int), end (int): byte offsets within the memory-mapped file content.
+        Output: Generator yielding strings.
+        """
+
+        blocksize=1048576
+        while start<end:
+            stop=min(start+blocksize, end)
+            if stop<end and self.source_buffer[stop-1]==13:     #do not split a \r\n sequence over 2 blocks
+                stop+=1
+            yield fdf_annotations.decodesource(self.source_buffer, start, stop)
+            start=stop
+
+
+    def release(self) -> None:
+        """
+        Method that empties all lists and dictionaries of the object, so the memory held by the loaded FDF contents is freed immediately, 
+        even if references to the object itself are still kept elsewhere (e.g. by a long-running batch process).
+        The object should not be used anymore after calling this method.
+
+        Input: None.
+        Return: None.
+        """
+
+        self.root_key.clear()
+        self.rootvalue_serialised=None
+        self.ordered_fdf_key.clear()
+        self.fdf_dict.clear()
+        self.bs_subobject_dict.clear()
+        self.popup_subobject_dict.clear()
+        self.parent_subobject_dict.clear()
+        self.referencedby_dict.clear()
+        self.position_dict.clear()
+        self.positionshift=0
+        self.record_dict.clear()
+        self.index_dict=None
+        self.spatialindex=None
+        self.indexentry_dict.clear()
+        self.staleindex_keys.clear()
+        if self.source_buffer is not None:
+            self.source_buffer.close()
+            self.source_file.close()
+            self.source_buffer=None
+            self.source_file=None
+        self.source_span.clear()
+        self.dirty_keys.clear()
+        self.interobjectcounter=0
+        self.snapshot_spans=None
+
+    def __enter__(self):
+        """
+        Method that allows to use the object as context manager: the loaded contents are released when leaving the with block.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Method that calls the release method when leaving the with block.
+        """
+        self.release()
+
+
+    def __iter__(self):
+        """"
+        Iterate over elements present in ordered_fdf_key, i.e. the object IDs included in an fdf_annotation object.
+        """
+        return iter(self.ordered_fdf_key)
+    
+    
+    def getannotation(self, objectid) -> str:
+        """
+        Method that returns the annotation value for the provided annotation id. Note that annotation value refers to the full object.
+        If the provided object id value is not existing in the fdf_dict it will return None.
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: string value containing the value of the annotation stored in the fdf_dict for the provided objectid key.
+        """
+
+        if objectid in self.fdf_dict:
+            return self.fdf_dict[objectid]
+        else: 
+            return None
+
+    def getrecord(self, objectid: str):
+        """
+        Method that returns the fdf_annotationrecord of the provided annotation id, i.e. the annotation value together with the location of its main attribute values.
+        The record is created upon first access and reused by all getters and setters afterwards, so the annotation value is only scanned once.
+        In case the value within fdf_dict was replaced directly (i.e. without using the setters of this class) a new record is created.
+        If the provided object id value is not existing in the fdf_dict it will return None.
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: fdf_annotationrecord object for the provided objectid.
+        """
+
+        if objectid not in self.fdf_dict:
+            return None
+        annotstring=self.getrawannotation(objectid)
+        record=self.record_dict.get(objectid)
+        if record is None or record.text is not annotstring:
+            if record is not None:         #value was replaced directly in fdf_dict
+                self.dirty_keys.add(objectid)
+            record=fdf_annotationrecord(annotstring, self.source_buffer if isinstance(annotstring, tuple) else None)
+            self.record_dict[objectid]=record
+        return record
+
+    def setannotation(self, objectid: str, annotstring: str) -> None:
+        """
+        Method that sets the annotation value for the provided annotation id and marks the object as modified, so it's rewritten by exportfdf.
+        All setters of this class use this method. Values assigned to fdf_dict directly are detected as modified upon export as well.
+
+        Input:
+            objectid (str): String value containing the object identifier for the annotation.
+            annotstring (str): String containing the full value of the annotation object.
+        Return: None.
+        """
+
+        self.fdf_dict[objectid]=annotstring
+        self.dirty_keys.add(objectid)
+        if self.index_dict is not None:
+            self.staleindex_keys.add(objectid)
+
+    def markdirty(self, objectid: str) -> None:
+        """
+        Method that marks the provided annotation id as modified, so its value is written from fdf_dict by exportfdf instead of being copied from the loaded file.
+        The object is indexed again upon the next use of the secondary indexes (see method select).
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: None.
+        """
+
+        self.dirty_keys.add(objectid)
+        if self.index_dict is not None:
+            self.staleindex_keys.add(objectid)
+
+    def __getitem__(self, objectid: str):
+        """
+        Method that calls the getannotation method.
+        """
+        return self.getannotation(self, objectid)
+    
+
+    def getcontent(self, objectid: str) -> str:
+        """
+        Method that returns the value of the /Contents tag for the provided annotation id (objectid).
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: (str) String containing the value of the /Contents attribute.
+                None is returned in case the provided objectid is not included in fdf_dict, or if the /Contents tag is not properly opened or closed.
+        """
+
+        if objectid not in self.fdf_dict:
+            return None
+        record=self.getrecord(objectid)
+        if record.contents is not None and record.contents[1] is not None:
+            return record.getvalue("contents")
+
+        diagnostics.report("malformedvalue", f"No proper opening and closing of /Contents tag found in provided object {objectid}.")
+        return None
+
+
+    def getrccontent(self, objectid) -> str:
+        """
+        Method that returns the /RC attribute value for the provided annotation id.
+        If the provided object id value is not existing in the fdf_dict it will return None.
+        
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: (str) String containing the value of the /RC tag.
+                None is returned in case the provided objectid is not included in fdf_dict, or if the /RC tag is not properly opened or closed.
+        """   
+
+        if objectid not in self.fdf_dict:
+            return None
+        record=self.getrecord(objectid)
+        if record.rc is None:
+            diagnostics.report("missingattribute", f"No /RC opening tag found in provided object {objectid}.")
+            return None
+        if record.rc[1] is None:
+            diagnostics.report("malformedvalue", f"No /RC closing parenthesis found for provided object {objectid}.")
+            return None
+        return record.getvalue("rc")
+
+    def getdscontent(self, objectid) -> str:
+        """
+        Method that returns the /DS attibute value for the provided annotation id.
+        If the provided object id value is not existing in the fdf_dict it will return None.
+        
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: (str) String containing the value of the /DS tag. 
+                None is returned in case the provided objectid is not included in fdf_dict, or if the /DS tag is not properly opened or closed.          
+        """
+
+        if objectid not in self.fdf_dict:
+            return None
+        record=self.getrecord(objectid)
+        if record.ds is None:
+            diagnostics.report("missingattribute", f"No /DS opening tag found in provided object {objectid}.")
+            return None
+        if record.ds[1] is None:
+            diagnostics.report("malformedvalue", f"No /DS closing parenthesis found for provided object {objectid}.")
+            return None
+        return record.getvalue("ds")
+    
+    def getdacontent(self, objectid) -> str:
+        """
+        Method that returns the /DA attibute value for the provided annotation id.
+        If the provided object id value is not existing in the fdf_dict it will return None.
+        
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: (str) String containing the value of the /DA tag. 
+                None is returned in case the provided objectid is not included in fdf_dict, or if the /DA tag is not properly opened or closed.        
+        """
+
+        if objectid not in self.fdf_dict:
+            return None
+        record=self.getrecord(objectid)
+        if record.da is None:
+            diagnostics.report("missingattribute", f"No /DA opening tag found in provided object {objectid}.")
+            return None
+        if record.da[1] is None:
+            diagnostics.report("malformedvalue", f"No /DA closing parenthesis found for provided object {objectid}.")
+            return None
+        return record.getvalue("da")
 
     
 
@@ -272,25 +1140,15 @@ class fdf_annotations:
 
         
         if objectid in self.fdf_dict:
-            rclist=[]
-            annotstring=self.fdf_dict[objectid]
-            rcstarttag=r"(?<!\\)/RC\("
-            rcstartmatch=re.search(rcstarttag, annotstring)
-            if rcstartmatch:          #/RC start found      
-                rclist.append(annotstring[0:rcstartmatch.end()])     #add contents prior to /RC contents to list (not to be touched by this method)
-                toprocess=annotstring[rcstartmatch.end():]
-                rcendtag=r"(?<!\\)\)"
-                rcendmatch=re.search(rcendtag, toprocess)
-                if rcendmatch:  #/RC end found
-                    rclist.append(fdf_annotations.addrcreturns(updatedrcstring))              #part to be replaced by the updated rc string that contains carriage returns as per FDF requirements
-                    rclist.append(toprocess[rcendmatch.start():])               #part following the /RC contents (not to be touched by this method)
-                    self.fdf_dict[objectid]=rclist[0]+rclist[1]+rclist[2]       #update annotation value in fdf_dict
-
-                else:
-                    print(f"No /RC closing parenthesis found for provided object {objectid}.")
-                
+            record=self.getrecord(objectid)
+            if record.rc is None:
+                diagnostics.report("missingattribute", f"No /RC opening tag found in provided object {objectid}.")
+            elif record.rc[1] is None:
+                diagnostics.report("malformedvalue", f"No /RC closing parenthesis found for provided object {objectid}.")
             else:
-                print(f"No /RC opening tag found in provided object {objectid}.")
+                #the updated rc string is split in chunks as per FDF requirements
+                record.setvalue("rc", fdf_annotations.addrcreturns(updatedrcstring))     #only the /RC contents are replaced, the remainder of the annotation is not touched
+                self.setannotation(objectid, record.text)       #update annotation value in fdf_dict
                
     def updatedscontent(self, objectid: str, updateddsstring: str) -> None:
         """
@@ -306,25 +1164,14 @@ class fdf_annotations:
 
         
         if objectid in self.fdf_dict:
-            dslist=[]
-            annotstring=self.fdf_dict[objectid]
-            dsstarttag=r"(?<!\\)/DS\("
-            dsstartmatch=re.search(dsstarttag, annotstring)
-            if dsstartmatch:          #/DS start found      
-                dslist.append(annotstring[0:dsstartmatch.end()])     #add contents prior to /DS contents to list (not to be touched by this method)
-                toprocess=annotstring[dsstartmatch.end():]
-                dsendtag=r"(?<!\\)\)"
-                dsendmatch=re.search(dsendtag, toprocess)
-                if dsendmatch:  #/DS end found
-                    dslist.append(updateddsstring)              #part to be replaced by the updated DS string that contains carriage returns as per FDF requirements
-                    dslist.append(toprocess[dsendmatch.start():])               #part following the /DS contents (not to be touched by this method)
-                    self.fdf_dict[objectid]=dslist[0]+dslist[1]+dslist[2]       #update annotation value in fdf_dict
-
-                else:
-                    print(f"No /DS closing parenthesis found for provided object {objectid}.")
-                
+            record=self.getrecord(objectid)
+            if record.ds is None:
+                diagnostics.report("missingattribute", f"No /DS opening tag found in provided object {objectid}.")
+            elif record.ds[1] is None:
+                diagnostics.report("malformedvalue", f"No /DS closing parenthesis found for provided object {objectid}.")
             else:
-                print(f"No /DS opening tag found in provided object {objectid}.")
+                record.setvalue("ds", updateddsstring)     #only the /DS contents are replaced, the remainder of the annotation is not touched
+                self.setannotation(objectid, record.text)       #update annotation value in fdf_dict
 
     def updatedacontent(self, objectid: str, updateddastring: str) -> None:
         """
@@ -340,25 +1187,14 @@ class fdf_annotations:
 
         
         if objectid in self.fdf_dict:
-            dalist=[]
-            annotstring=self.fdf_dict[objectid]
-            dastarttag=r"(?<!\\)/DA\("
-            dastartmatch=re.search(dastarttag, annotstring)
-            if dastartmatch:          #/DA start found      
-                dalist.append(annotstring[0:dastartmatch.end()])     #add contents prior to /DA contents to list (not to be touched by this method)
-                toprocess=annotstring[dastartmatch.end():]
-                daendtag=r"(?<!\\)\)"
-                daendmatch=re.search(daendtag, toprocess)
-                if daendmatch:  #/DA end found
-                    dalist.append(updateddastring)              #part to be replaced by the updated DA string that contains carriage returns as per FDF requirements
-                    dalist.append(toprocess[daendmatch.start():])               #part following the /DA contents (not to be touched by this method)
-                    self.fdf_dict[objectid]=dalist[0]+dalist[1]+dalist[2]       #update annotation value in fdf_dict
-
-                else:
-                    print(f"No /DA closing parenthesis found for provided object {objectid}.")
-                
+            record=self.getrecord(objectid)
+            if record.da is None:
+                diagnostics.report("missingattribute", f"No /DA opening tag found in provided object {objectid}.")
+            elif record.da[1] is None:
+                diagnostics.report("malformedvalue", f"No /DA closing parenthesis found for provided object {objectid}.")
             else:
-                print(f"No /DA opening tag found in provided object {objectid}.")
+                record.setvalue("da", updateddastring)     #only the /DA contents are replaced, the remainder of the annotation is not touched
+                self.setannotation(objectid, record.text)       #update annotation value in fdf_dict
 
    
     def getpagenum(self, objectid: str) -> int:
@@ -372,13 +1208,12 @@ class fdf_annotations:
         
         """    
         if objectid in self.fdf_dict:
-            pagetag=r"/Page (\d+)(?=/)"
-            pagematch=re.search(pagetag, self.fdf_dict[objectid])            
-            if pagematch:
-                return int(pagematch.group(1))  
-            print(f"The provided object (ID= {objectid}) has no page attribute.")
+            record=self.getrecord(objectid)
+            if record.page is not None:
+                return int(record.getvalue("page"))
+            diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no page attribute.")
         else:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")            
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
         return None
     
         
@@ -392,17 +1227,14 @@ class fdf_annotations:
         Return: None.        
         """    
         if objectid in self.fdf_dict:
-            pagetag=r"/Page (\d+)(?=/)"
-            pagematch=re.search(pagetag, self.fdf_dict[objectid])            
-            if pagematch:
-                pretagtext=self.fdf_dict[objectid][0:pagematch.span()[0]]
-                tagtext=f"/Page {pagenum}"
-                posttagtext=self.fdf_dict[objectid][pagematch.span()[1]:]
-                self.fdf_dict[objectid]=pretagtext+tagtext+posttagtext
+            record=self.getrecord(objectid)
+            if record.page is not None:
+                record.setvalue("page", str(pagenum))
+                self.setannotation(objectid, record.text)
             else:
-                print(f"The provided object(ID= {objectid}) has no page attribute to set.")
+                diagnostics.report("missingattribute", f"The provided object(ID= {objectid}) has no page attribute to set.")
         else:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
 
     
     def getrect(self, objectid: str) -> str:
@@ -417,13 +1249,12 @@ class fdf_annotations:
         """
 
         if objectid not in self.fdf_dict:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")      
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
             return None       
-        recttag=r"(?<!\\)/Rect(\[.*?\])"
-        rectmatch=re.search(recttag, self.fdf_dict[objectid])
-        if rectmatch:                        
-            return str(rectmatch.group(1)) 
-        print(f"The provided object (ID= {objectid}) has no /Rect attribute.") 
+        record=self.getrecord(objectid)
+        if record.rect is not None:
+            return record.getvalue("rect")
+        diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /Rect attribute.")
         return None
 
 
@@ -440,17 +1271,14 @@ class fdf_annotations:
         """
 
         if objectid not in self.fdf_dict:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")      
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
             return None       
-        recttag=r"(?<!\\)/Rect(\[.*?\])"         
-        rectmatch=re.search(recttag, self.fdf_dict[objectid])
-        if rectmatch:
-            pretagtext=self.fdf_dict[objectid][0:rectmatch.span()[0]]
-            tagtext=f"/Rect{rectstring}"
-            posttagtext=self.fdf_dict[objectid][rectmatch.span()[1]:]
-            self.fdf_dict[objectid]=pretagtext+tagtext+posttagtext
+        record=self.getrecord(objectid)
+        if record.rect is not None:
+            record.setvalue("rect", rectstring)
+            self.setannotation(objectid, record.text)
             return None
-        print(f"The provided object (ID= {objectid}) has no /Rect attribute.") 
+        diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /Rect attribute.")
         return None
     
     def getc(self, objectid: str) -> str:
@@ -466,13 +1294,12 @@ class fdf_annotations:
         """
 
         if objectid not in self.fdf_dict:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")      
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
             return None       
-        ctag=r"(?<!\\)/C(\[.*?\])"
-        cmatch=re.search(ctag, self.fdf_dict[objectid])
-        if cmatch:                        
-            return str(cmatch.group(1)) 
-        print(f"The provided object (ID= {objectid}) has no /C attribute.") 
+        record=self.getrecord(objectid)
+        if record.c is not None:
+            return record.getvalue("c")
+        diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /C attribute.")
         return None
 
     def setc(self, objectid: str, cstring: str) -> None:
@@ -488,17 +1315,14 @@ class fdf_annotations:
         """
 
         if objectid not in self.fdf_dict:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")      
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
             return None       
-        ctag=r"(?<!\\)/C(\[.*?\])"         
-        cmatch=re.search(ctag, self.fdf_dict[objectid])
-        if cmatch:
-            pretagtext=self.fdf_dict[objectid][0:cmatch.span()[0]]
-            tagtext=f"/C{cstring}"
-            posttagtext=self.fdf_dict[objectid][cmatch.span()[1]:]
-            self.fdf_dict[objectid]=pretagtext+tagtext+posttagtext
+        record=self.getrecord(objectid)
+        if record.c is not None:
+            record.setvalue("c", cstring)
+            self.setannotation(objectid, record.text)
             return None                   
-        print(f"The provided object (ID= {objectid}) has no /C attribute.") 
+        diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /C attribute.")
         return None
     
     def getca(self, objectid:str) -> str:
@@ -513,13 +1337,12 @@ class fdf_annotations:
                 None is returned in case the provided objectid is not included in fdf_dict, or if the /CA tag is not existing.
         """
         if objectid not in self.fdf_dict:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")      
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
             return None       
-        catag=r"(?<!\\)/CA\s+([0-9.]+)\s*/"
-        camatch=re.search(catag, self.fdf_dict[objectid])
-        if camatch:                        
-            return str(camatch.group(1)) 
-        print(f"The provided object (ID= {objectid}) has no /CA attribute.") 
+        record=self.getrecord(objectid)
+        if record.ca is not None:
+            return record.getvalue("ca")
+        diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /CA attribute.")
         return None
     
     def dropca(self, objectid:str) -> None:
@@ -534,16 +1357,14 @@ class fdf_annotations:
         """
 
         if objectid not in self.fdf_dict:
-            print(f"The provided object (ID= {objectid}) could not be found within the fdf.")      
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
             return None       
-        catag=r"(?<!\\)(/CA\s+[0-9.]+\s*)/"
-        camatch=re.search(catag, self.fdf_dict[objectid])
-        if camatch: 
-            pretagtext=self.fdf_dict[objectid][0:camatch.span()[0]]
-            posttagtext=self.fdf_dict[objectid][camatch.span(1)[1]:]
-            self.fdf_dict[objectid]=pretagtext+posttagtext           
+        record=self.getrecord(objectid)
+        if record.catag is not None:
+            record.setvalue("catag", "")
+            self.setannotation(objectid, record.text)
             return None
-        print(f"The provided object (ID= {objectid}) has no /CA attribute.") 
+        diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /CA attribute.")
         return None
 
     def removefromroot(self, objectid: str) -> None:
@@ -553,14 +1374,11 @@ class fdf_annotations:
         Input: objectid (str): Object identifier:  "\d+ \d+ obj" or "\d+ \d+ R".
         Output: None.
         """ 
-        objecttag2=r"^(\d+ \d+ )obj$"    #needed to reroute "\d+ \d+ obj" objects towards "\d+ \d+ R" values present in the key        
-        objecttag2match=re.search(objecttag2, objectid)
-        if objecttag2match:             #reroute spelling of object referenced
-            objectid=objecttag2match.group(1)+"R"
+        objectid=self.toreference(objectid)     #reroute "\d+ \d+ obj" spelling towards "\d+ \d+ R" values present in the key
         if objectid in self.root_key:
-            self.root_key=[object for object in self.root_key if object != objectid]    #ensure all references are removed: list comprehension
+            self.root_key.removemany([objectid])    #ensure all references are removed
         else:
-            print(f"The provided object (ID= {objectid}) was not part of the root catalog object.")
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) was not part of the root catalog object.")
 
 
     def addtoroot(self, objectid: str, insertposition: int) -> None:         
@@ -579,19 +1397,15 @@ class fdf_annotations:
         
         
         #value of -1 ensures object is added as last element to the list (via append iso insert)
-        objecttag=r"^\d+ \d+ R$"
-        objecttag2=r"^(\d+ \d+ )obj$"
-        objecttagmatch=re.search(objecttag, objectid)
-        objecttag2match=re.search(objecttag2, objectid)
-        if objecttag2match:
-            objectid=objecttag2match.group(1)+"R"
-        if objecttagmatch or objecttag2match:
+        objectkey=fdf_objectkey.parse(objectid)
+        if objectkey is not None:
+            objectid=objectkey.reference
             if insertposition != -1:       #insert using position -1 yields element included at 2nd last place - not desired and hence bypassed by append method 
                 self.root_key.insert(insertposition, objectid)
             else:                        #ensuring -1 is truely last element added to the list
                 self.root_key.append(objectid)
         else:
-            print(f"The provided object (ID= {objectid}) was not added to the root catalog as it didn't meet formatting requirements.")
+            diagnostics.report("malformedvalue", f"The provided object (ID= {objectid}) was not added to the root catalog as it didn't meet formatting requirements.")
 
 
     def rebuildrootkey(self) -> None:
@@ -606,18 +1420,10 @@ class fdf_annotations:
         Return: None.
         """
         
-        self.root_key.clear()
-        objecttag=r"^(\d+ \d+ )(R|obj)$"
-        for objectid in self.ordered_fdf_key[2:len(self.ordered_fdf_key)]:
-            objectid_R=""
-            objectid_obj=""
-            subobjectvalues=self.bs_subobject_dict.values()    #create list of referenced values of the dictionary for ease of lookup - since we're not interested in the key
-            objecttagmatch=re.search(objecttag, objectid)
-            if objecttagmatch:                    
-                objectid_R=objecttagmatch.group(1)+"R"
-                objectid_obj=objecttagmatch.group(1)+"obj" 
-                if objectid_R not in subobjectvalues and objectid_obj not in subobjectvalues:
-                    self.root_key.append(objectid_R)
+        subobjectvalues={self.toreference(value) for value in self.bs_subobject_dict.values()}     #referenced values of the dictionary, since we're not interested in the key
+        #object identifiers are matched at once on the joined list instead of one by one
+        references=[objectnumber+"R" for objectnumber in objectkeylinepattern.findall("\n".join(self.ordered_fdf_key[2:]))]
+        self.root_key.replace([reference for reference in references if reference not in subobjectvalues] if subobjectvalues else references)
 
 
     def updaterootvalue(self) -> None:
@@ -625,26 +1431,30 @@ class fdf_annotations:
         Method that takes the root_key list and recreates the value of the root catalog object within the fdf_dict accordingly.
         This method allows for properly (re-)exporting an updated fdf_annotations object to an fdf file.
         The method considers the 2nd element in the ordered_fdf_key list as the root catalog object itself.
+        The root catalog object is only serialised if root_key was modified (see fdf_rootkey.version) or its value was replaced since it was loaded or last serialised.
 
         Input: None
         return: None        
         """
         rootcatalogID=self.ordered_fdf_key[1]    #obtain ID of root catalog object
         oldrootvalue=self.fdf_dict[rootcatalogID]        
+        if self.rootvalue_serialised is not None and self.rootvalue_serialised[0]==self.root_key.version and self.rootvalue_serialised[1] is oldrootvalue:
+            return
         newcatalogref=" ".join(self.root_key)    #transform root_key to single line string value with space as separator
 
-
-        inventorytag=r"/Annots\[((\d+ \d+ R )*(\d+ \d+ R))\]"
-        inventorymatch=re.search(inventorytag, oldrootvalue)
+        inventorymatch=inventorypattern.search(oldrootvalue)
         if inventorymatch:
             precatalogref=oldrootvalue[0:inventorymatch.span()[0]+8]            
             postcatalogref=oldrootvalue[inventorymatch.span()[1]-1:]           
-            self.fdf_dict[rootcatalogID]=precatalogref+newcatalogref+postcatalogref
+            newrootvalue=precatalogref+newcatalogref+postcatalogref
+            if newrootvalue!=oldrootvalue:     #root catalog object only marked as modified if its references changed
+                self.setannotation(rootcatalogID, newrootvalue)
+            self.rootvalue_serialised=(self.root_key.version, self.fdf_dict[rootcatalogID])
         else:
-            print("Existing root value could not be updated due to unexpected structure - creating a generic one instead")
+            diagnostics.report("malformedvalue", "Existing root value could not be updated due to unexpected structure - creating a generic one instead")
             precatalogref="<</FDF<</Annots["
             postcatalogref="]/F(/C/genericdoc.pdf)/UF(/C/generic.pdf)>>/Type/Catalog>>"
-            self.fdf_dict[rootcatalogID]=precatalogref+newcatalogref+postcatalogref
+            self.setannotation(rootcatalogID, precatalogref+newcatalogref+postcatalogref)
 
 
     def updatetrailer(self) -> None:
@@ -669,20 +1479,18 @@ class fdf_annotations:
         recreate_trailer="Y"   #preseed to Y, only set to N if value passes checks
         #check if current trailer matches with root catalog object
         if self.ordered_fdf_key[-1] =="trailer":       
-            trailertag=r"^trailer\s*\n?\r?<</Root (\d+ \d+ )R>>\s*\n?\r?\s*%%EOF"
-            trailermatch=re.search(trailertag, self.fdf_dict["trailer"])
+            trailermatch=trailerpattern.search(self.fdf_dict["trailer"])
             if trailermatch:                
                 if trailermatch.group(1)+"obj"==self.ordered_fdf_key[1]:
                     recreate_trailer="N"
         if recreate_trailer=="Y":
-            catalogtag=r"^(\d+ \d+ )(R|obj)"
-            catalogmatch=re.search(catalogtag, self.ordered_fdf_key[1])
+            catalogmatch=catalogpattern.search(self.ordered_fdf_key[1])
             if catalogmatch:
                 catalog_object_ref=catalogmatch.group(1)+"R"
-                self.fdf_dict["trailer"]= "trailer\n<<" + catalog_object_ref +">>\n"+ r"%%EOF"
+                self.setannotation("trailer", "trailer\n<<" + catalog_object_ref +">>\n"+ r"%%EOF")
             else:
-                print("No proper object catalog object ID found to allow for rebuilding trailer.")
-                self.fdf_dict["trailer"]=""     #seed with empty value to not make pgm crash upon export
+                diagnostics.report("malformedvalue", "No proper object catalog object ID found to allow for rebuilding trailer.")
+                self.setannotation("trailer", "")     #seed with empty value to not make pgm crash upon export
 
         
     def exportfdf(self, outputfdfpath: str, rebuild_key: str ="N", rebuild_value: str ="Y", rebuild_trailer: str="Y") -> None:
@@ -698,161 +1506,668 @@ class fdf_annotations:
                 Default Value is set to "Y"
         """
         
-        if rebuild_key=="Y":
-            self.rebuildrootkey()
-        if rebuild_value=="Y":
-            self.updaterootvalue()
-        if rebuild_trailer=="Y":
-            self.updatetrailer()
+        with self.phase("rebuild"):
+            if rebuild_key=="Y":
+                self.rebuildrootkey()
+            if rebuild_value=="Y":
+                self.updaterootvalue()
+            if rebuild_trailer=="Y":
+                self.updatetrailer()
 
         rootcatalogID=self.ordered_fdf_key[1]    #obtain ID of root catalog object
-                
+        #header, root, annotation objects and trailer object
+        exportkeys=["header", rootcatalogID]+self.ordered_fdf_key[2:-1]+["trailer"]
+
+        with self.phase("write"), open(outputfdfpath, 'w', encoding='windows-1252') as file:
+            file.writelines(self.exportpieces(exportkeys))
+
+    def exportpieces(self, exportkeys: list):
+        """
+        Generator that yields the text to be written by exportfdf for the provided object identifiers.
+        For a memory-mapped file (use_mmap="Y") unmodified objects that directly follow each other in the file are copied as a single slice, only modified objects are written from fdf_dict.
+        An object is unmodified if it's not marked as dirty and fdf_dict still holds the value loaded from file (i.e. not replaced directly).
+        Otherwise all objects are written from fdf_dict, which holds the loaded text of the unmodified objects.
+
+        Input: exportkeys (list): object identifiers to be written, in order.
+        Output: Generator yielding strings.
+        """
+
+        copystart=copyend=None
+        for item in exportkeys:
+            span=self.source_span.get(item)
+            if span is not None and item not in self.dirty_keys and self.getrawannotation(item) is span[2]:
+                if span[0]!=copyend:
+                    if copyend is not None:
+                        yield from self.sourcepieces(copystart, copyend)
+                    copystart=span[0]
+                copyend=span[1]
+                continue
+            if copyend is not None:
+                yield from self.sourcepieces(copystart, copyend)
+                copystart=copyend=None
+            if item=="header":
+                yield self.fdf_dict[item]+"\n"
+            elif item=="trailer" or item.startswith("interobj"):
+                yield self.fdf_dict[item]
+            else:
+                yield item+"\n"+self.fdf_dict[item]+"\n"
+        if copyend is not None:
+            yield from self.sourcepieces(copystart, copyend)
+
+    @staticmethod
+    def streamfdf(inputfdfpath: str, outputfdfpath: str, transforms: list, blocksize: int =1048576) -> int:
+        """
+        Method that reads the provided FDF file, applies the provided transforms to each object and writes it to the output FDF file immediately, without loading the full file.
+        The memory needed is therefore limited to the largest object (and the root catalog object), and writing starts before the full file is read.
+        
+        Each transform is a callable that is called as transform(annots, objectid) for each object following the root catalog object (i.e. as in the loops of Example_use.py), where
+        annots is an fdf_annotations object holding only the object being processed. All methods of the class that act on a single object can therefore be used within a transform
+        (e.g. getrccontent, updaterccontent, updatedacontent, updatedscontent, getpagenum, getc, setc). 
+        An object removed by a transform (i.e. using annots.removeannotation) is not written, and its reference is removed from the root catalog object. 
+        Objects it references via /BS, /Popup or /Parent are not written either, provided they follow the removed object within the file.
+        
+        As the root catalog object precedes the annotation objects, it's written as read and rewritten at the end in case objects were removed: 
+        the removed references are then replaced by spaces to keep its length unchanged. The trailer is updated as done by exportfdf (see method updatetrailer).
+
+        Input: 
+            inputfdfpath (str): string containing the path to an fdf file that is to be read.
+            outputfdfpath (str): output path of the target fdf file.
+            transforms (list): list of callables, applied in the order provided.
+            blocksize (int): number of characters read at once. Default is 1048576 (1 MB).
+        Return: (int) number of objects processed by the transforms.
+        """
+
+        annots=fdf_annotations()
+        rootcatalogID=None
+        rootposition=None
+        removed=set()      #object references ("\d+ \d+ R") removed by the transforms
+        toremove=set()     #object identifiers of referenced subobjects still to be encountered
+        processed=0
         with open(outputfdfpath, 'w', encoding='windows-1252') as file:
-            #header
-            file.write(self.fdf_dict["header"]+"\n")
-            #root
-            file.write(rootcatalogID+"\n")
-            file.write(self.fdf_dict[rootcatalogID]+"\n")
-            #annotation objects
-            for item in self.ordered_fdf_key[2:-1]:
-                file.write(item+"\n")
-                file.write(self.fdf_dict[item]+"\n")
-            #trailer object
-            file.write(self.fdf_dict["trailer"])
+            for objectkey, value in fdf_annotations.iterfdf(inputfdfpath, blocksize):
+                if objectkey=="header":
+                    file.write(value+"\n")
+                elif rootcatalogID is None:
+                    #root catalog object: written as read, kept in annots to be rewritten at the end if needed
+                    rootcatalogID=objectkey
+                    annots.ordered_fdf_key=["header", rootcatalogID, "trailer"]
+                    annots.fdf_dict[rootcatalogID]=value
+                    inventorymatch=inventorypattern.search(value)
+                    if inventorymatch:
+                        annots.root_key=fdf_rootkey(individualrefpattern.findall(inventorymatch.group(1)))
+                    file.write(rootcatalogID+"\n")
+                    rootposition=file.tell()
+                    file.write(value+"\n")
+                elif objectkey=="trailer":
+                    annots.fdf_dict["trailer"]=value
+                    annots.updatetrailer()
+                    file.write(annots.fdf_dict["trailer"])
+                elif objectkey.startswith("interobj"):
+                    file.write(value)
+                elif objectkey in toremove:
+                    toremove.discard(objectkey)
+                    removed.add(objectkey[:-3]+"R")
+                else:
+                    annots.fdf_dict[objectkey]=value
+                    annots.ordered_fdf_key.insert(2, objectkey)
+                    for transform in transforms:
+                        if objectkey not in annots.fdf_dict:
+                            break
+                        transform(annots, objectkey)
+                    processed+=1
+                    if objectkey in annots.fdf_dict:
+                        file.write(objectkey+"\n"+annots.fdf_dict.pop(objectkey)+"\n")
+                        annots.ordered_fdf_key.remove(objectkey)
+                    else:
+                        removed.add(objectkey[:-3]+"R")
+                        referencematch=referencepattern.search(value) if " R" in value else None
+                        if referencematch and referencematch.group(1) in ("/BS", "/Popup", "/Parent"):
+                            toremove.add(referencematch.group(2)[:-1]+"obj")
+                    annots.record_dict.pop(objectkey, None)
+                    annots.dirty_keys.discard(objectkey)
+
+            if removed and rootcatalogID is not None:
+                #rewrite root catalog object with the same length: references to removed objects are replaced by trailing spaces within the /Annots array
+                rootvalue=annots.fdf_dict[rootcatalogID]
+                inventorymatch=inventorypattern.search(rootvalue)
+                if inventorymatch:
+                    newcatalogref=" ".join([item for item in annots.root_key if item not in removed])
+                    file.seek(rootposition)
+                    file.write(rootvalue[:inventorymatch.start(1)]+newcatalogref.ljust(len(inventorymatch.group(1)))+rootvalue[inventorymatch.end(1):])
+                else:
+                    diagnostics.report("malformedvalue", f"Root catalog object could not be rewritten within {outputfdfpath}: references to removed objects are kept.")
+        return processed
+
+    @staticmethod
+    def toobjectid(objectid: str) -> str:
+        r"""
+        Method that returns the object identifier spelling ("\d+ \d+ obj", as used within ordered_fdf_key and fdf_dict) of the provided object identifier or reference ("\d+ \d+ R").
+        Other values (e.g. "header", "trailer") are returned as provided.
+
+        Input: objectid (str): object identifier or reference.
+        Return: (str) object identifier.
+        """
+        objectkey=fdf_objectkey.parse(objectid)
+        return objectid if objectkey is None else objectkey.objectid
+
+    @staticmethod
+    def toreference(objectid: str) -> str:
+        r"""
+        Method that returns the reference spelling ("\d+ \d+ R", as used within root_key and the subobject dictionaries) of the provided object identifier or reference.
+        Other values (e.g. "header", "trailer") are returned as provided.
+
+        Input: objectid (str): object identifier or reference.
+        Return: (str) object reference.
+        """
+        objectkey=fdf_objectkey.parse(objectid)
+        return objectid if objectkey is None else objectkey.reference
+
+    def indexof(self, objectid: str) -> int:
+        """
+        Method that returns the position of the provided object identifier (or reference) within ordered_fdf_key, using the position index built upon loading.
+        As removing objects shifts the objects following them, a stored position that is no longer valid is searched within the positionshift positions preceding it, 
+        and within the full list only if not found there (e.g. after objects were inserted). The index is rebuilt once the shift exceeds the square root of the number of objects.
+
+        Input: objectid (str): object identifier or reference.
+        Return: (int) position within ordered_fdf_key. None is returned if the object is not included in ordered_fdf_key.
+        """
+        objectid=self.toobjectid(objectid)
+        position=self.position_dict.get(objectid)
+        if position is not None and position < len(self.ordered_fdf_key) and self.ordered_fdf_key[position]==objectid:
+            return position
+        if self.positionshift**2 > len(self.ordered_fdf_key):
+            self.position_dict={item: position for position, item in enumerate(self.ordered_fdf_key)}
+            self.positionshift=0
+            return self.position_dict.get(objectid)
+        try:
+            if position is None:
+                raise ValueError
+            position=self.ordered_fdf_key.index(objectid, max(0, position-self.positionshift), position)
+        except ValueError:
+            try:
+                position=self.ordered_fdf_key.index(objectid)
+            except ValueError:
+                self.position_dict.pop(objectid, None)
+                return None
+        self.position_dict[objectid]=position
+        return position
+
+    def getreferencingobjects(self, objectid: str) -> list:
+        """
+        Method that returns the object identifiers of the objects referencing the provided object via /BS, /Popup or /Parent (reverse subobject references).
+
+        Input: objectid (str): object identifier or reference.
+        Return: (list) object identifiers, empty if the object is not referenced.
+        """
+        return sorted(self.referencedby_dict.get(self.toobjectid(objectid), ()), key=self.indexof)
+
+    def collectremovals(self, objectids) -> list:
+        r"""
+        Method that returns the object identifiers to be removed when removing the provided objects: each provided object is followed by the subobject it references 
+        via /BS, /Popup or /Parent (bs_subobject_dict, popup_subobject_dict, parent_subobject_dict), the subobject referenced by that subobject, etc.
+        The references are resolved iteratively (no recursion), each object is listed once and the forward and reverse references of the listed objects are removed 
+        from the subobject dictionaries and referencedby_dict, including references of remaining objects towards the listed objects.
+
+        Input: objectids (iterable): object identifiers or references.
+        Return: (list) object identifiers ("\d+ \d+ obj" spelling) to be removed, in order.
+        """
+        removals=[]
+        removalset=set()
+        for objectid in objectids:
+            todo=[objectid]
+            while todo:
+                providedid=todo.pop()
+                objectid=self.toobjectid(providedid)
+                if objectid in removalset:
+                    continue
+                removalset.add(objectid)
+                removals.append(objectid)
+                for subobject_dict in (self.bs_subobject_dict, self.popup_subobject_dict, self.parent_subobject_dict):
+                    if objectid in subobject_dict:
+                        toremove=subobject_dict.pop(objectid)
+                        referencingobjects=self.referencedby_dict.get(toremove[:-1]+"obj")
+                        if referencingobjects is not None:
+                            referencingobjects.discard(objectid)
+                        diagnostics.report("notice", f"Subobject removal triggered for provided object (ID={providedid}): {toremove}.")
+                        todo.append(toremove)
+                        break
+
+        #references of remaining objects towards removed objects
+        for objectid in removals:
+            for referencingobject in self.referencedby_dict.pop(objectid, ()):
+                for subobject_dict in (self.bs_subobject_dict, self.popup_subobject_dict, self.parent_subobject_dict):
+                    if subobject_dict.get(referencingobject, "")[:-1]+"obj"==objectid:
+                        del subobject_dict[referencingobject]
+        return removals
 
     def removeannotation(self, objectid: str) -> None:
         """
         Method that removes provided annotation object from ordered_fdf_key, fdf_dict, root_key and bs_subobject_dict, popup_subobject_dict and parent_subobject_dict
         if the annotation was referenced in the root catalog object - this reference is removed from root_key
-        if the annotation to be removed points to a subannotation within a subobject_dict this referenced sub annotation will also be explicitly removed (recursive deletion)
+        if the annotation to be removed points to a subannotation within a subobject_dict this referenced sub annotation will also be explicitly removed, as well as the subannotations it points to (see method collectremovals)
+        Objects are located using the position index (see method indexof), so no list is rebuilt. Use method remove_many to remove many objects at once.
 
         Input: objectid (str): String value containing the object identifier for the annotation.
         Return: None
         """
-        objectid_R=""
-        objectid_obj=""
-        objecttag=r"^(\d+ \d+ )(R|obj)$"
-        objecttagmatch=re.search(objecttag, objectid)
-        if objecttagmatch:            
-            objectid_R=objecttagmatch.group(1)+"R"
-            objectid_obj=objecttagmatch.group(1)+"obj"      
-
-        self.root_key=[item for item in self.root_key if item not in [objectid_obj, objectid_R, objectid]]
-        self.ordered_fdf_key=[item for item in self.ordered_fdf_key if item not in [objectid_obj, objectid_R, objectid]]
-        #remove occurrence from fdf_dict
-        if objectid_obj in self.fdf_dict:
-            del self.fdf_dict[objectid_obj]
-        elif objectid_R in self.fdf_dict:
-            del self.fdf_dict[objectid_R]
-        elif objectid in self.fdf_dict:
-            del self.fdf_dict[objectid]
+        for removal in self.collectremovals([objectid]):
+            position=self.indexof(removal)
+            if position is not None:        #object identifiers occur once within ordered_fdf_key
+                del self.ordered_fdf_key[position]
+                self.position_dict.pop(removal, None)
+                self.positionshift+=1
+            self.root_key.removemany([self.toreference(removal)])
+            self.dropvalue(removal)
 
-        #remove occurrence from subobject_dicts [BS, Parent and Popup subobject dicts] if occurring
-        toremove=""
-        if objectid_obj in self.bs_subobject_dict:
-            toremove=self.bs_subobject_dict.pop(objectid_obj)
-        elif objectid_R in self.bs_subobject_dict:
-            toremove=self.bs_subobject_dict.pop(objectid_R)
-        elif objectid in self.bs_subobject_dict:
-            toremove=self.bs_subobject_dict.pop(objectid)
-
-        elif objectid_obj in self.popup_subobject_dict:
-            toremove=self.popup_subobject_dict.pop(objectid_obj)
-        elif objectid_R in self.popup_subobject_dict:
-            toremove=self.popup_subobject_dict.pop(objectid_R)
-        elif objectid in self.popup_subobject_dict:
-            toremove=self.popup_subobject_dict.pop(objectid)
-
-        elif objectid_obj in self.parent_subobject_dict:
-            toremove=self.parent_subobject_dict.pop(objectid_obj)
-        elif objectid_R in self.parent_subobject_dict:
-            toremove=self.parent_subobject_dict.pop(objectid_R)
-        elif objectid in self.parent_subobject_dict:
-            toremove=self.parent_subobject_dict.pop(objectid)        
-
-        if toremove !="":
-            print(f"Subobject removal triggered for provided object (ID={objectid}): {toremove}.")
-            self.removeannotation(toremove)
+    def dropvalue(self, objectid: str) -> None:
+        """
+        Method that removes the value of the provided object identifier from fdf_dict (stored under its object identifier, or otherwise under its reference spelling) and its record from record_dict.
 
-    
-    def qualifyasheaderMSGV1(self, objectid: str) -> bool:
+        Input: objectid (str): object identifier ("\\d+ \\d+ obj" spelling).
+        Return: None.
         """
-        Method that checks if the value of the contents attribute qualifies as a domain header according to SDTM-MSG V1.
-        The method returns True if the value matches the XX=Label syntax where XX must be domain code in upper case and Label contains both up cased and low cased letters, with optional spaces, hyphens and underscores allowed.
+        reference=self.toreference(objectid)
+        if objectid in self.fdf_dict:
+            del self.fdf_dict[objectid]
+        elif reference in self.fdf_dict:
+            del self.fdf_dict[reference]
+        self.record_dict.pop(objectid, None)
+        self.record_dict.pop(reference, None)
+        if self.index_dict is not None:
+            self.unindexannotation(objectid)
 
-        Input: objectid (str): String value containing the object identifier for the annotation.
-        Output: bool: True is returned if the text contained in the content attribute matches the expected header annotation pattern XX=Label.
-                      False is returned if the text doesn't match the expected pattern, or if the provided objectid does not exist in fdf_key or has no contents attribute available.
+    def remove_many(self, objectids) -> int:
+        """
+        Method that removes all provided objects and the subobjects they reference (see method collectremovals) from ordered_fdf_key, fdf_dict, root_key 
+        and the subobject dictionaries, in a single pass over ordered_fdf_key and root_key.
+        This is equivalent to calling removeannotation for each provided object, but its duration does not depend on the number of objects removed.
 
+        Input: objectids (iterable): object identifiers or references of the objects to be removed.
+        Return: (int) number of objects removed from ordered_fdf_key (including subobjects).
         """
-        proceed=False
-        objecttag2=r"^(\d+ \d+ )R$"    #needed to reroute "\d+ \d+ R" objects towards "\d+ \d+ obj" values present in ordered_fdf_key       
-        objecttag2match=re.search(objecttag2, objectid)
-        if objecttag2match:             #reroute spelling of object referenced
-            objectid=objecttag2match.group(1)+"obj"
-        if objectid in self.fdf_dict:
-            proceed=True
-        if proceed==True:
-            proceed=self.hascontent(objectid)
-        if proceed==True:        
-            textcontent=self.getcontent(objectid)
-            headerV1tag=r"^([A-Z]{2,4}|RELREC)\s*\=[a-zA-Z_\-\s]+$"
-            headerV1tagmatch=re.search(headerV1tag, textcontent)
-            return True if headerV1tagmatch else False
-        else:
-            print(f"The provided object (ID= {objectid}) was not part of the fdf_dict list or didn't have a contents attribute.")
-            return False
+        removals=set(self.collectremovals(objectids))
+        references={self.toreference(removal) for removal in removals}
+        numberofkeys=len(self.ordered_fdf_key)
+        self.ordered_fdf_key=[item for item in self.ordered_fdf_key if item not in removals]
+        self.position_dict={item: position for position, item in enumerate(self.ordered_fdf_key)}
+        self.positionshift=0
+        self.root_key.removemany(references)
+        for removal in removals:
+            self.dropvalue(removal)
+        return numberofkeys-len(self.ordered_fdf_key)
 
-    def qualifyasheaderMSGV2(self, objectid: str) -> bool:
+
+    indexattributes=("page", "subtype", "author", "nm", "contents", "headerMSGV1", "headerMSGV2")      #attributes of the secondary indexes (see method buildindexes)
+    headerrules=("MSGV1", "MSGV2")      #rules used to qualify an annotation as domain header, indexed as header+rule (see method select)
+
+    def getindexentry(self, objectid: str) -> dict:
         """
-        Method that checks if the value of the contents attribute qualifies as a domain header according to SDTM-MSG V2.
-        The method returns True if the value matches the XX (Label) syntax where XX must be domain code in upper case and Label contains both upcased and low cased letters, with optional spaces, hyphens and underscores allowed.
+        Method that determines the values indexed for the provided annotation id (see method buildindexes), using its fdf_annotationrecord.
+        /Subtype, /T and /NM are searched outside the values of /Contents, /RC, /DS and /DA, so text within these values is never taken for an attribute.
 
         Input: objectid (str): String value containing the object identifier for the annotation.
-        Output: bool: True is returned if the text contained in the content attribute matches the expected header annotation pattern XX (Label).
-                      False is returned if the text doesn't match the expected pattern, or if the provided objectid does not exist in fdf_key or has no contents attribute available.
+        Return: (dict) {attribute: value} for each of indexattributes, and the /Rect value as a tuple of 4 floats (rect, used by the spatial index). 
+                The value is None for attributes not present within the annotation.
+        """
 
+        record=self.getrecord(objectid)
+        contents=record.getvalue("contents")
+        subtypematch=record.searchattribute(subtypepattern)
+        return {"page": int(record.getvalue("page")) if record.page is not None else None,
+                "subtype": internvalue(record.getmatchvalue(subtypematch, 1)) if subtypematch else None,
+                "author": internvalue(record.getattributevalue(authorstartpattern)),
+                "nm": record.getattributevalue(nmstartpattern),
+                "contents": record.contents is not None,
+                "headerMSGV1": contents is not None and headerV1pattern.search(contents) is not None,
+                "headerMSGV2": contents is not None and headerV2pattern.search(contents) is not None,
+                "rect": fdf_spatialindex.parserect(record.getvalue("rect"))}
 
+    def indexannotation(self, objectid: str) -> None:
         """
-        proceed=False
-        objecttag2=r"^(\d+ \d+ )R$"    #needed to reroute "\d+ \d+ R" objects towards "\d+ \d+ obj" values present in ordered_fdf_key       
-        objecttag2match=re.search(objecttag2, objectid)
-        if objecttag2match:             #reroute spelling of object referenced
-            objectid=objecttag2match.group(1)+"obj"
-        if objectid in self.fdf_dict:
-            proceed=True
-        if proceed==True:
-            proceed=self.hascontent(objectid)
-        if proceed==True:        
-            textcontent=self.getcontent(objectid)
-            headerV2tag=r"^[A-Z]{2,4}\s*\\\([a-zA-Z_\s\-]+\\\)\s*$"
-            headerV2tagmatch=re.search(headerV2tag, textcontent)
-            return True if headerV2tagmatch else False
-        else:
-            print(f"The provided object (ID= {objectid}) was not part of the fdf_dict list or didn't have a contents attribute.")
-            return False
-        
-    def hascontent(self, objectid: str) -> bool:
-        """
-        Method that returns True if the provided objectid has a /Contents attribute.
-        It returns False if the provided objectid doesn't contain such /Contents attribute.
-        
+        Method that (re)indexes the provided annotation id within the secondary indexes. Objects no longer included in fdf_dict are removed from the indexes.
+
         Input: objectid (str): String value containing the object identifier for the annotation.
-        Output: bool: True is returned if the /Contents attribute exists.
-                      False is returned if the /Contents attribute does not exist, or the provided objectid is not included in the fdf_dict.
+        Return: None.
         """
-        
-        objecttag2=r"^(\d+ \d+ )R$"    #needed to reroute "\d+ \d+ R" objects towards "\d+ \d+ obj" values present in fdf_dict       
-        objecttag2match=re.search(objecttag2, objectid)
-        if objecttag2match:             #reroute spelling of object referenced
-            objectid=objecttag2match.group(1)+"obj"
+
+        self.unindexannotation(objectid)
+        if objectid not in self.fdf_dict or not objectid.endswith(" obj"):
+            return
+        indexentry=self.getindexentry(objectid)
+        self.indexentry_dict[objectid]=indexentry
+        for attribute in fdf_annotations.indexattributes:
+            self.index_dict[attribute].setdefault(indexentry[attribute], set()).add(objectid)
+        if self.spatialindex is not None and indexentry["page"] is not None and indexentry["rect"] is not None:
+            self.spatialindex.insert(objectid, indexentry["page"], indexentry["rect"])
+
+    def unindexannotation(self, objectid: str) -> None:
+        """
+        Method that removes the provided annotation id from the secondary indexes.
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Return: None.
+        """
+
+        indexentry=self.indexentry_dict.pop(objectid, None)
+        self.staleindex_keys.discard(objectid)
+        if indexentry is None:
+            return
+        for attribute in fdf_annotations.indexattributes:
+            objectids=self.index_dict[attribute][indexentry[attribute]]
+            objectids.discard(objectid)
+            if not objectids:
+                del self.index_dict[attribute][indexentry[attribute]]
+        if self.spatialindex is not None:
+            self.spatialindex.remove(objectid)
+
+    def buildindexes(self) -> None:
+        """
+        Method that builds the secondary indexes of all annotation objects (i.e. all objects except header, root catalog, interobject text and trailer):
+        per attribute of indexattributes a dictionary {value: set of object identifiers}, with the attributes being
+        * page: zero-based page number (/Page),
+        * subtype: annotation subtype (/Subtype) without leading slash, e.g. "FreeText",
+        * author: author (/T),
+        * nm: unique annotation name (/NM),
+        * contents: True if the annotation has a /Contents attribute (see method hascontent),
+        * headerMSGV1 and headerMSGV2: True if the annotation qualifies as domain header (see methods qualifyasheaderMSGV1 and qualifyasheaderMSGV2).
+        The indexes are built upon first use by method select and kept up to date afterwards: objects modified by setannotation or markdirty are indexed again upon the next select,
+        removed objects are removed from the indexes immediately. Values assigned to fdf_dict directly should be followed by a call to markdirty.
+
+        Input: None.
+        Return: None.
+        """
+
+        with self.phase("index"):
+            self.index_dict={attribute: {} for attribute in fdf_annotations.indexattributes}
+            self.spatialindex=None
+            self.indexentry_dict={}
+            self.staleindex_keys=set()
+            for objectid in self.ordered_fdf_key[2:]:
+                self.indexannotation(objectid)
+
+    def refreshindexes(self) -> None:
+        """
+        Method that builds the secondary indexes if not built yet (see method buildindexes), or indexes the objects modified since they were indexed otherwise.
+
+        Input: None.
+        Return: None.
+        """
+
+        if self.index_dict is None:
+            self.buildindexes()
+        for objectid in list(self.staleindex_keys):
+            self.indexannotation(objectid)
+
+    def select(self, page: int =None, subtype: str =None, author: str =None, nm: str =None, contents: bool =None, header: bool =None, headerrule: str ="MSGV2") -> list:
+        """
+        Method that returns the annotation ids matching all provided criteria using the secondary indexes (see method buildindexes), without accessing the annotation values.
+        Criteria not provided (None) are not applied, e.g. annots.select(page=12, subtype="FreeText", header=True).
+
+        Input:
+            page (int): zero-based page number.
+            subtype (str): annotation subtype without leading slash, e.g. "FreeText".
+            author (str): author (/T).
+            nm (str): unique annotation name (/NM).
+            contents (bool): True for annotations with a /Contents attribute, False for those without.
+            header (bool): True for annotations qualifying as domain header, False for the other annotations.
+            headerrule = "MSGV1"|"MSGV2": rule used to qualify an annotation as domain header (see methods qualifyasheaderMSGV1 and qualifyasheaderMSGV2). Default is set to "MSGV2".
+        Return: (list) object identifiers of the matching annotations, in ordered_fdf_key order. A ValueError is raised if the provided headerrule is not one of headerrules.
+        """
+
+        if headerrule not in fdf_annotations.headerrules:
+            raise ValueError(f"Unknown headerrule {headerrule!r}, accepted rules are: {', '.join(fdf_annotations.headerrules)}.")
+        self.refreshindexes()
+        criteria={"page": page, "subtype": subtype, "author": author, "nm": nm, "contents": contents, "header"+headerrule: header}
+        matches=[self.index_dict[attribute].get(value, set()) for attribute, value in criteria.items() if value is not None]
+        if matches:
+            matches.sort(key=len)       #intersect starting from the smallest set
+            objectids=matches[0].intersection(*matches[1:])
+        else:
+            objectids=self.indexentry_dict.keys()
+        lastposition=len(self.ordered_fdf_key)
+        return sorted(objectids, key=lambda objectid: self.position_dict.get(objectid, lastposition))
+
+    def getspatialindex(self, cellsize: float =None):
+        """
+        Method that returns the spatial index (see class fdf_spatialindex) of the /Rect values of all annotations having a /Page and /Rect attribute.
+        The spatial index is built upon first use from the secondary indexes (see method buildindexes) and kept up to date in the same way afterwards.
+
+        Input: cellsize (float): optional size of the grid cells (in points). Default: determined from the median annotation size (see class fdf_spatialindex). 
+               Providing a cell size different from the one of the existing spatial index rebuilds it.
+        Return: fdf_spatialindex object.
+        """
+
+        self.refreshindexes()
+        if self.spatialindex is None or (cellsize is not None and cellsize!=self.spatialindex.cellsize):
+            with self.phase("index"):
+                rects=[(objectid, indexentry["page"], indexentry["rect"]) for objectid, indexentry in self.indexentry_dict.items() if indexentry["page"] is not None and indexentry["rect"] is not None]
+                self.spatialindex=fdf_spatialindex(cellsize if cellsize is not None else fdf_spatialindex.defaultcellsize([rect for objectid, page, rect in rects]))
+                for objectid, page, rect in rects:
+                    self.spatialindex.insert(objectid, page, rect)
+        return self.spatialindex
+
+    def find_overlaps(self, page: int =None, subtype: str ="FreeText", margin: float =0.0) -> list:
+        """
+        Method that reports the pairs of annotations whose /Rect boxes overlap on the same page, using the spatial index (see method getspatialindex) instead of comparing all pairs of annotations.
+        Boxes that only touch each other are not reported, unless a positive margin is provided.
+
+        Input:
+            page (int): optional zero-based page number to be checked. Default: all pages.
+            subtype (str): annotation subtype to be checked, e.g. "FreeText" (default), or None to check all annotations (including e.g. /Popup annotations).
+            margin (float): minimal distance (in points) required between boxes; boxes closer to each other than margin are reported as well. Default is 0.0.
+        Return: (list) tuples (page, objectid1, objectid2) ordered by page, with objectid1 preceding objectid2 in ordered_fdf_key, in ordered_fdf_key order.
+        """
+
+        spatialindex=self.getspatialindex()
+        included=set(self.select(subtype=subtype)) if subtype is not None else None
+        lastposition=len(self.ordered_fdf_key)
+        overlaps=[]
+        for overlappage, objectid1, objectid2 in spatialindex.find_overlaps(page, margin):
+            if included is not None and (objectid1 not in included or objectid2 not in included):
+                continue
+            position1=self.position_dict.get(objectid1, lastposition)
+            position2=self.position_dict.get(objectid2, lastposition)
+            overlaps.append((overlappage, position1, position2, objectid1, objectid2) if position1<=position2 else (overlappage, position2, position1, objectid2, objectid1))
+        overlaps.sort()
+        return [(overlappage, objectid1, objectid2) for overlappage, position1, position2, objectid1, objectid2 in overlaps]
+
+    def resolveoverlaps(self, page: int =None, subtype: str ="FreeText", pagebox: tuple =(0.0, 0.0, 612.0, 792.0), gap: float =2.0, maxdistance: float =300.0) -> dict:
+        """
+        Method that moves overlapping annotation boxes into free space on their page (see class fdf_layoutengine), writing the new positions back through method setrect.
+        Of each pair of overlapping annotations reported by method find_overlaps the annotation that comes last in ordered_fdf_key is moved, all other annotations keep their position.
+
+        Input:
+            page (int): optional zero-based page number to be processed. Default: all pages.
+            subtype (str): annotation subtype to be processed, e.g. "FreeText" (default), or None for all annotations.
+            pagebox (tuple): (x1, y1, x2, y2) page bounds in points the moved boxes are to be kept in. Default is a US letter page (0, 0, 612, 792), as the FDF file does not contain the page size.
+            gap (float): minimal distance in points between a moved box and the other boxes. Default is 2.0.
+            maxdistance (float): maximal distance in points a box is moved from its original position. Default is 300.0.
+        Return: (dict) {"moved": object identifiers moved, "unresolved": object identifiers for which no free position was found (left unchanged)}.
+        """
+
+        return fdf_layoutengine(pagebox, gap, maxdistance).apply(self, page, subtype)
+
+    @staticmethod
+    def unescapetext(text: str) -> str:
+        """
+        Method that translates the escape sequences of a string value enclosed in parentheses (e.g. /Contents) into the text as displayed:
+        \\( and \\) become parentheses, \\r and \\n new lines, octal codes the corresponding character, and a backslash followed by a new line is dropped (line continuation).
+
+        Input: text (str): value as stored within the annotation.
+        Return: (str) text as displayed, with new lines as \n.
+        """
+        def unescape(escapematch):
+            sequence=escapematch.group(1)
+            if sequence in ("\r\n", "\r", "\n", "b", "f"):
+                return ""
+            if sequence in ("r", "n"):
+                return "\n"
+            if sequence=="t":
+                return "\t"
+            if sequence.isdigit():
+                return chr(int(sequence, 8) & 0xFF)
+            return sequence
+        return pdfescapepattern.sub(unescape, text)
+
+    @staticmethod
+    def measuretext(text: str, weight: str ="regular", fontsize: float =12.0, maxwidth: float =None) -> tuple:
+        """
+        Method that measures the provided (unescaped) text using the advance widths of Arial/Helvetica (see function fontwidthtable).
+        Lines wider than the optional maxwidth are wrapped at spaces, as done when displaying a FreeText annotation.
+
+        Input:
+            text (str): text to be measured, new lines as \n.
+            weight = "regular"|"bold": font weight. Default is set to "regular".
+            fontsize (float): font size in points. Default is 12.0.
+            maxwidth (float): optional maximal line width in points.
+        Return: (tuple) (width of the widest line in points, number of lines).
+        """
+        widthtable=fontwidthtable(weight)
+        scale=fontsize/1000
+        width=0
+        lines=0
+        for line in text.split("\n"):
+            linewidth=sum(map(widthtable.__getitem__, line.encode('windows-1252', errors='replace')))*scale
+            if maxwidth is None or linewidth<=maxwidth:
+                width=max(width, linewidth)
+                lines+=1
+                continue
+            spacewidth=widthtable[32]*scale
+            linewidth=None
+            for word in line.split(" "):        #greedy wrapping at spaces: a word wider than maxwidth is kept on a line of its own
+                wordwidth=sum(map(widthtable.__getitem__, word.encode('windows-1252', errors='replace')))*scale
+                if linewidth is not None and linewidth+spacewidth+wordwidth<=maxwidth:
+                    linewidth+=spacewidth+wordwidth
+                    continue
+                if linewidth is not None:
+                    width=max(width, linewidth)
+                linewidth=wordwidth
+                lines+=1
+            width=max(width, linewidth)
+        return (width, lines)
+
+    def fitrects(self, objectids: list =None, hpadding: float =4.0, vpadding: float =0.5, lineheight: float =1.2, maxwidth: float =None, fontname: str =None, fontsize: float =None) -> int:
+        """
+        Method that resizes the /Rect of the provided annotations to the size of their /Contents text, e.g. after changing the font via updatedacontent, updatedscontent and updaterccontent.
+        The text is measured using the font name and size of the /DA value (e.g. "/Arial,Bold 12 Tf"), font names ending with a Bold suffix (Arial,Bold, Helvetica-Bold, Arial-BoldMT, ...) and HeBo being measured as bold.
+        The top left corner of each box is kept, the box is resized at once for all annotations using the columnar annotation table (see methods totable and writetable). Requires NumPy.
+
+        Input:
+            objectids (list): optional object identifiers of the annotations to be resized. Default: all annotations containing a /Contents attribute.
+            hpadding (float): space in points added left and right of the text. Default is 4.0.
+            vpadding (float): space in points added above and below the text. Default is 0.5.
+            lineheight (float): height of a line of text relative to the font size. Default is 1.2.
+            maxwidth (float): optional maximal box width in points. Longer lines are wrapped at spaces (see method measuretext).
+            fontname (str): optional font name used instead of the /DA font name, e.g. "Arial,Bold".
+            fontsize (float): optional font size used instead of the /DA font size.
+        Return: (int) number of annotations resized.
+        """
+
+        if objectids is None:
+            objectids=[objectid for objectid in self.ordered_fdf_key[2:] if objectid.endswith(" obj") and objectid in self.fdf_dict and self.getrecord(objectid).contents is not None]
+        table=self.totable(objectids)
+        if table is None:
+            return 0
+        textwidths=numpy.full(len(table), numpy.nan)
+        textheights=numpy.full(len(table), numpy.nan)
+        for row, objectid in enumerate(table.objectids):
+            record=self.getrecord(objectid)
+            if record is None:
+                continue
+            contents=record.getvalue("contents")
+            dafontmatch=dafontpattern.search(record.getvalue("da") or "")
+            if contents is None or (dafontmatch is None and (fontname is None or fontsize is None)):
+                diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /Contents or /DA font to be measured.")
+                continue
+            rowfontname=fontname if fontname is not None else dafontmatch.group(1)
+            rowfontsize=float(fontsize if fontsize is not None else dafontmatch.group(2))
+            width, lines=self.measuretext(self.unescapetext(contents), "bold" if boldfontpattern.search(rowfontname) else "regular", rowfontsize, 
+                                          None if maxwidth is None else maxwidth-2*hpadding)
+            textwidths[row]=width
+            textheights[row]=lines*rowfontsize*lineheight
+
+        #resize all measured boxes at once, keeping their top left corner (x1, y2)
+        fit=~numpy.isnan(textwidths) & ~numpy.isnan(table.rect[:, 0])
+        table.rect[fit, 2]=table.rect[fit, 0]+textwidths[fit]+2*hpadding
+        table.rect[fit, 1]=table.rect[fit, 3]-textheights[fit]-2*vpadding
+        return self.writetable(table, ("rect",))
+
+    def getindexvalues(self, attribute: str) -> list:
+        """
+        Method that returns the distinct values of the provided attribute within the secondary indexes (see method buildindexes), e.g. all pages containing annotations.
+
+        Input: attribute (str): one of indexattributes.
+        Return: (list) sorted distinct values (None excluded).
+        """
+
+        self.refreshindexes()
+        return sorted(value for value in self.index_dict[attribute] if value is not None)
+
+    
+    def qualifyasheaderMSGV1(self, objectid: str) -> bool:
+        """
+        Method that checks if the value of the contents attribute qualifies as a domain header according to SDTM-MSG V1.
+        The method returns True if the value matches the XX=Label syntax where XX must be domain code in upper case and Label contains both up cased and low cased letters, with optional spaces, hyphens and underscores allowed.
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Output: bool: True is returned if the text contained in the content attribute matches the expected header annotation pattern XX=Label.
+                      False is returned if the text doesn't match the expected pattern, or if the provided objectid does not exist in fdf_key or has no contents attribute available.
+
+        """
+        proceed=False
+        objectid=self.toobjectid(objectid)      #reroute "\d+ \d+ R" spelling towards "\d+ \d+ obj" values present in fdf_dict
+        if objectid in self.fdf_dict:
+            proceed=True
+        if proceed==True:
+            proceed=self.hascontent(objectid)
+        if proceed==True:        
+            textcontent=self.getcontent(objectid)
+            headerV1tagmatch=headerV1pattern.search(textcontent)
+            return True if headerV1tagmatch else False
+        else:
+            diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) was not part of the fdf_dict list or didn't have a contents attribute.")
+            return False
+
+    def qualifyasheaderMSGV2(self, objectid: str) -> bool:
+        """
+        Method that checks if the value of the contents attribute qualifies as a domain header according to SDTM-MSG V2.
+        The method returns True if the value matches the XX (Label) syntax where XX must be domain code in upper case and Label contains both upcased and low cased letters, with optional spaces, hyphens and underscores allowed.
+
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Output: bool: True is returned if the text contained in the content attribute matches the expected header annotation pattern XX (Label).
+                      False is returned if the text doesn't match the expected pattern, or if the provided objectid does not exist in fdf_key or has no contents attribute available.
+
+
+        """
+        proceed=False
+        objectid=self.toobjectid(objectid)      #reroute "\d+ \d+ R" spelling towards "\d+ \d+ obj" values present in fdf_dict
+        if objectid in self.fdf_dict:
+            proceed=True
+        if proceed==True:
+            proceed=self.hascontent(objectid)
+        if proceed==True:        
+            textcontent=self.getcontent(objectid)
+            headerV2tagmatch=headerV2pattern.search(textcontent)
+            return True if headerV2tagmatch else False
+        else:
+            diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) was not part of the fdf_dict list or didn't have a contents attribute.")
+            return False
+        
+    def hascontent(self, objectid: str) -> bool:
+        """
+        Method that returns True if the provided objectid has a /Contents attribute.
+        It returns False if the provided objectid doesn't contain such /Contents attribute.
+        
+        Input: objectid (str): String value containing the object identifier for the annotation.
+        Output: bool: True is returned if the /Contents attribute exists.
+                      False is returned if the /Contents attribute does not exist, or the provided objectid is not included in the fdf_dict.
+        """
+        
+        objectid=self.toobjectid(objectid)      #reroute "\d+ \d+ R" spelling towards "\d+ \d+ obj" values present in fdf_dict
         if objectid in self.fdf_dict:
-            annotstring=self.fdf_dict[objectid]
-            contenttag=r"(?<!\\)/Contents\("
-            contenttagmatch=re.search(contenttag, annotstring)
-            return True if contenttagmatch else False
+            return self.getrecord(objectid).contents is not None
         else:
-            print(f"The provided object (ID= {objectid}) was not part of the fdf_dict.")
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) was not part of the fdf_dict.")
             return False
          
     def hasc(self, objectid: str) -> bool:
@@ -865,17 +2180,11 @@ class fdf_annotations:
                       False is returned if the /C attribute does not exist, or the provided objectid is not included in the fdf_dict.
         """
         
-        objecttag2=r"^(\d+ \d+ )R$"    #needed to reroute "\d+ \d+ R" objects towards "\d+ \d+ obj" values present in fdf_dict       
-        objecttag2match=re.search(objecttag2, objectid)
-        if objecttag2match:             #reroute spelling of object referenced
-            objectid=objecttag2match.group(1)+"obj"
+        objectid=self.toobjectid(objectid)      #reroute "\d+ \d+ R" spelling towards "\d+ \d+ obj" values present in fdf_dict
         if objectid in self.fdf_dict:
-            annotstring=self.fdf_dict[objectid]
-            contenttag=r"(?<!\\)/C\["
-            contenttagmatch=re.search(contenttag, annotstring)
-            return True if contenttagmatch else False
+            return self.getrecord(objectid).hasc
         else:
-            print(f"The provided object (ID= {objectid}) was not part of the fdf_dict.")
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) was not part of the fdf_dict.")
             return False 
         
     def hasca(self, objectid: str) -> bool:
@@ -888,17 +2197,11 @@ class fdf_annotations:
                       False is returned if the /CA attribute does not exist, or the provided objectid is not included in the fdf_dict.
         """
         
-        objecttag2=r"^(\d+ \d+ )R$"    #needed to reroute "\d+ \d+ R" objects towards "\d+ \d+ obj" values present in fdf_dict       
-        objecttag2match=re.search(objecttag2, objectid)
-        if objecttag2match:             #reroute spelling of object referenced
-            objectid=objecttag2match.group(1)+"obj"
+        objectid=self.toobjectid(objectid)      #reroute "\d+ \d+ R" spelling towards "\d+ \d+ obj" values present in fdf_dict
         if objectid in self.fdf_dict:
-            annotstring=self.fdf_dict[objectid]
-            catag=r"(?<!\\)/CA\s*"
-            catagmatch=re.search(catag, annotstring)
-            return True if catagmatch else False
+            return self.getrecord(objectid).hasca
         else:
-            print(f"The provided object (ID= {objectid}) was not part of the fdf_dict.")
+            diagnostics.report("missingobject", f"The provided object (ID= {objectid}) was not part of the fdf_dict.")
             return False
             
     @staticmethod
@@ -914,7 +2217,7 @@ class fdf_annotations:
         
         if fdfrcxml=="":
             return ""
-        return re.sub(r'\\[\r\n]', '', fdfrcxml)
+        return rcreturnpattern.sub('', fdfrcxml)
     
 
     @staticmethod
@@ -927,16 +2230,7 @@ class fdf_annotations:
         Input: fdfrcxml: string (containing xml or html)
         Output: string (containing xml or html), with the backslash +newline character added after each chunk of 255 chars
         """
-        toprocess: str=fdfxml
-        result: str=""
-        inbetweenlist=[]
-        while toprocess != "":                            
-            if len(toprocess)<=255:
-                inbetweenlist.append(toprocess)
-                toprocess=""
-            else:
-                inbetweenlist.append(toprocess[0:255]) 
-                toprocess=toprocess[255:]
+        inbetweenlist=[fdfxml[start:start+255] for start in range(0, len(fdfxml), 255)]      #chunks sliced from the full string, so the string is only copied once
         result="\\\n".join(inbetweenlist)
         return result
 
@@ -965,7 +2259,7 @@ class fdf_annotations:
                 key, value = pair.split(keyvalueseparator)      #split each identified pair in its associated dictionary key and value
                 style_dict[key.strip()] = value.strip()
             else:
-                print(f"Provided inputstring does not contain expected keyvalueseparator within a pair. inputstring={inputstring}, pair={pair}, keyvalueseparator={keyvalueseparator}")
+                diagnostics.report("malformedvalue", f"Provided inputstring does not contain expected keyvalueseparator within a pair. inputstring={inputstring}, pair={pair}, keyvalueseparator={keyvalueseparator}")
         return style_dict
     
     
@@ -1021,7 +2315,7 @@ class fdf_annotations:
                 else:
                     space_dict[key.strip()] = "nospace"
             else:
-                print(f"Provided inputstring does not contain expected keyvalueseparator within a pair. inputstring={inputstring}, pair={pair}, keyvalueseparator={keyvalueseparator}")
+                diagnostics.report("malformedvalue", f"Provided inputstring does not contain expected keyvalueseparator within a pair. inputstring={inputstring}, pair={pair}, keyvalueseparator={keyvalueseparator}")
         return space_dict
         
     @staticmethod
@@ -1043,19 +2337,19 @@ class fdf_annotations:
                     Otherwise it'll contain the xml/html content provided between previous style attribute value listed on previous outer list element and the current one listed in this element of the outer list.
                 The second element contains the value of the style attribute as occurring inside the xml or html string provided.
                     In case no style attribute is remaining inside the input xml/html to be processed, then the value of the second element will be an empty string.                
+                The third element contains the style attribute as dictionary (a new dictionary per occurrence, which can be modified).
             In case the provided input fdfrcxml string provided is empty the method will return a list containing an empty inner list [[]]
         """
 
         if fdfrcxml=="":
             return [[]]
-        styletag=r"(\bstyle\s*=\s*\")([^\"]*?)\""
         toprocess=fdfrcxml  #string to decompose until fully processed (i.e. empty)
         outputlist=[]
         while toprocess !="":
-            styletagmatch=re.search(styletag, toprocess)
+            styletagmatch=rcstylepattern.search(toprocess)
             if styletagmatch:
                 stylevalue=toprocess[styletagmatch.start(2):styletagmatch.end(2)]
-                outputlist.append([toprocess[0:styletagmatch.start(2)], stylevalue, fdf_annotations.string_to_dict(stylevalue, ':',';')])
+                outputlist.append([toprocess[0:styletagmatch.start(2)], stylevalue, dict(stylemapping(stylevalue))])
                 toprocess=toprocess[styletagmatch.end(2):]                
             else:
                 outputlist.append([toprocess, "", dict()])
@@ -1103,15 +2397,13 @@ class fdf_annotations:
 
         toprocess="Y"
         processed=fdfrcxml
-        spanopentag=r"(\<\s*?span\s+?.*?\>)"
-        spanclosetag=r"(\<\s*?/span\>)"
         while toprocess=="Y":
             toprocess="N"
-            spanopentagmatch=re.search(spanopentag, processed)
+            spanopentagmatch=spanopentagpattern.search(processed)
             if spanopentagmatch:
                 processed=processed[0:spanopentagmatch.start(1)] + processed[spanopentagmatch.end(1):]
                 toprocess="Y"
-            spanclosetagmatch=re.search(spanclosetag, processed)
+            spanclosetagmatch=spanclosetagpattern.search(processed)
             if spanclosetagmatch:
                 processed=processed[0:spanclosetagmatch.start(1)] + processed[spanclosetagmatch.end(1):]
                 toprocess="Y"
@@ -1137,10 +2429,8 @@ class fdf_annotations:
             In case the closing tag would appear prior to the opening tag the provided input fdfrcxml string is returned.
         """
         
-        popentag=r"(\<\s*p\s+?.*?\>)"
-        pclosetag=r"(\</p\>)"
-        popentagmatch=re.search(popentag, fdfrcxml)
-        pclosetagmatch=re.search(pclosetag, fdfrcxml)
+        popentagmatch=popentagpattern.search(fdfrcxml)
+        pclosetagmatch=pclosetagpattern.search(fdfrcxml)
         if popentagmatch and pclosetagmatch:
             if popentagmatch.end(1) < pclosetagmatch.end(1):
                 prestring=fdfrcxml[:popentagmatch.end(1)]+openingspantag
@@ -1149,10 +2439,10 @@ class fdf_annotations:
                 return prestring+midstring+endstring
             
             else:
-                print(f'Input fdfrcxml string is compromised: The </p> closing tag appears prior to the <p ...> opening tag: {fdfrcxml}')
+                diagnostics.report("malformedvalue", f'Input fdfrcxml string is compromised: The </p> closing tag appears prior to the <p ...> opening tag: {fdfrcxml}')
                 return fdfrcxml
         else:
-            print(f'No <p ...> opening and </p> closing tag found in provided input fdfrcxml string: {fdfrcxml}')
+            diagnostics.report("malformedvalue", f'No <p ...> opening and </p> closing tag found in provided input fdfrcxml string: {fdfrcxml}')
             return fdfrcxml
 
     @staticmethod
@@ -1175,6 +2465,87 @@ class fdf_annotations:
             return_rc_string=return_rc_string+row[0]+updatedrowstylestring
                    
         return return_rc_string
+
+    @staticmethod
+    def normalizerc(fdfrcxml: str, rcstylesdict: dict, openingspantag: str =None, closingspantag: str =None, rcstylesstring: str =None) -> str:
+        """
+        Method that normalises a /RC value in a single pass over the xml: the span tags are dropped, the master style (first style attribute) is set to the provided rcstylesdict
+        and the other style attributes are rewritten, after which the optional opening and closing span tag are inserted.
+        The result is identical to calling removercreturns, rc_dropspans, getrcstyles, rcstyles_setmasterstyle, rcstyles_to_rccontentstring and rc_insertspan (if span tags are provided) in sequence,
+        but the xml is scanned once instead of rescanned and copied by each method (rc_dropspans and getrcstyles copying the remainder of the string for each tag).
+        For the rare values where dropping a span tag changes how the surrounding text is read (e.g. a span tag within a style attribute), the method sequence above is applied instead.
+
+        Input:
+            fdfrcxml (str): /RC value as obtained by getrccontent.
+            rcstylesdict (dict): dictionary defining the master style (see method rcstyles_setmasterstyle).
+            openingspantag (str): optional opening span tag to be inserted after the <p...> tag, e.g. '<span style="font-weight:bold">' (see method rc_insertspan).
+            closingspantag (str): closing span tag to be inserted before the </p> tag, e.g. '</span>'.
+            rcstylesstring (str): optional string representation of rcstylesdict (see method dict_to_string), so it's not converted for each value normalised.
+        Output: (str) normalised /RC value, without the line splits (see method addrcreturns to add them again).
+            In case the provided fdfrcxml is empty an empty string is returned.
+        """
+
+        if fdfrcxml=="":
+            return ""
+        rcstring=rcreturnpattern.sub('', fdfrcxml)
+        pieces=[]
+        styles=[]               #(position within pieces, text up to the style value, style value) per style attribute
+        position=0
+        sequential=False
+        droppedend=None         #end of the last span tag dropped
+        #span tags and style attributes are located by 2 separate scans (each skipping directly to its occurrences) and processed in order of appearance
+        tokenmatches=list(spantagpattern.finditer(rcstring)) if "span" in rcstring else []
+        if tokenmatches:
+            tokenmatches.extend(rcstylepattern.finditer(rcstring))
+            tokenmatches.sort(key=re.Match.start)
+        else:
+            tokenmatches=rcstylepattern.finditer(rcstring)
+        for tokenmatch in tokenmatches:
+            if tokenmatch.start()<position:
+                if tokenmatch.end()<=position and position==droppedend:
+                    continue            #style attribute of a dropped span tag
+                sequential=True         #span tag and style attribute overlapping otherwise: read after dropping the span tags, the style attribute could start or end elsewhere
+                break
+            if tokenmatch.start()>position:
+                pieces.append(rcstring[position:tokenmatch.start()])
+            position=tokenmatch.end()
+            if tokenmatch.re is spantagpattern:         #span tag: dropped
+                droppedend=position
+                continue
+            stylevalue=tokenmatch.group(2)
+            if tokenmatch.start()==droppedend or "<" in stylevalue:
+                sequential=True         #style attribute touching or containing a span tag
+                break
+            styles.append((len(pieces), tokenmatch.group(1), stylevalue))
+            pieces.append(tokenmatch.group())         #style attribute, rewritten below
+        if not sequential:
+            pieces.append(rcstring[position:])
+            if droppedend is not None:      #dropping span tags can join text into a new span tag or style attribute, which the method sequence would process as well
+                droppedstring="".join(pieces)
+                offsets=[0]
+                for piece in pieces:
+                    offsets.append(offsets[-1]+len(piece))
+                #the style attributes found after dropping the span tags must be the ones located above, at the same position within the dropped string
+                sequential=(spantagpattern.search(droppedstring) is not None 
+                            or [(stylematch.start(), stylematch.group()) for stylematch in rcstylepattern.finditer(droppedstring)]!=[(offsets[pieceposition], pieces[pieceposition]) for pieceposition, styleprefix, stylevalue in styles])
+        if not sequential:
+            for index, (pieceposition, styleprefix, stylevalue) in enumerate(styles):
+                styledict=stylemapping(stylevalue)
+                if index==0:        #master style
+                    if styledict and rcstylesstring is None:
+                        rcstylesstring=fdf_annotations.dict_to_string(rcstylesdict, ':', ';')
+                    pieces[pieceposition]=styleprefix+(rcstylesstring if styledict else "")+'"'
+                else:
+                    pieces[pieceposition]=styleprefix+(fdf_annotations.dict_to_string(styledict, ':', ';') if stylevalue !='' else "")+'"'
+            rcstring="".join(pieces)
+        else:
+            rcstring=fdf_annotations.rc_dropspans(rcreturnpattern.sub('', fdfrcxml))
+            rcstyles=fdf_annotations.getrcstyles(rcstring)
+            rcstyles=fdf_annotations.rcstyles_setmasterstyle(rcstyles, rcstylesdict)
+            rcstring=fdf_annotations.rcstyles_to_rccontentstring(rcstyles)
+        if openingspantag is not None:
+            rcstring=fdf_annotations.rc_insertspan(rcstring, openingspantag, closingspantag)
+        return rcstring
     
 
     @staticmethod
@@ -1211,8 +2582,7 @@ class fdf_annotations:
 
         if rgbintcolorstring=="":
             return ""
-        intrgbtag=r"^\[?\s*(\d{1,3})\s+(\d{1,3})\s+(\d{1,3})\s*\]?$"      #optional square brackets followed by optional space(s), each rgb component can max consist of 3 digits, separated by at least 1 space.
-        intrgbstrmatch=re.search(intrgbtag, rgbintcolorstring)
+        intrgbstrmatch=intrgbpattern.search(rgbintcolorstring)
         if intrgbstrmatch:
             return "#" + format(int(intrgbstrmatch.group(1)), "02X") + format(int(intrgbstrmatch.group(2)), "02X") + format(int(intrgbstrmatch.group(3)), "02X")      #zero-padding to 2 digits for each rgb component
         return ""    #input does not match expected structure 
@@ -1230,8 +2600,7 @@ class fdf_annotations:
 
         if rgbhexcolorstring=="":
             return ""
-        hexrgbtag=r"^#([0-9A-F]{2})([0-9A-F]{2})([0-9A-F]{2})$"      # hashtag followed by 6 hexadecimal chars
-        hexrgbstrmatch=re.search(hexrgbtag, rgbhexcolorstring)
+        hexrgbstrmatch=hexrgbpattern.search(rgbhexcolorstring)
         if hexrgbstrmatch:
             return str(int(hexrgbstrmatch.group(1), 16)) + " " + str(int(hexrgbstrmatch.group(2), 16)) + " " + str(int(hexrgbstrmatch.group(3), 16))
         return ""    #input does not match expected structure     
@@ -1249,8 +2618,7 @@ class fdf_annotations:
 
         if rgbfraccolorstring=="":
             return ""
-        fracrgbtag=r"^\[([01](\.\d{1,6}){0,1})\s+([01](\.\d{1,6}){0,1})\s+([01](\.\d{1,6}){0,1})\]$"      # 0 or 1 followed by decimal separator (.) and followed by at least one and up to 6 decimals for each component
-        fracrgbstrmatch=re.search(fracrgbtag, rgbfraccolorstring)
+        fracrgbstrmatch=fracrgbpattern.search(rgbfraccolorstring)
         if fracrgbstrmatch:
             return str(int(round(float(fracrgbstrmatch.group(1))*255))) + " " + str(int(round(float(fracrgbstrmatch.group(3))*255))) + " " + str(int(round(float(fracrgbstrmatch.group(5))*255)))
         return ""    #input does not match expected structure
@@ -1270,8 +2638,7 @@ class fdf_annotations:
 
         if rgbintcolorstring=="":
             return ""
-        intrgbtag=r"^\[?\s*(\d{1,3})\s+(\d{1,3})\s+(\d{1,3})\s*\]?$"      #optional square brackets followed by optional space(s), each rgb component can max consist of 3 digits, separated by at least 1 space.
-        intrgbstrmatch=re.search(intrgbtag, rgbintcolorstring)
+        intrgbstrmatch=intrgbpattern.search(rgbintcolorstring)
         if intrgbstrmatch:
             r=("{:f}".format(int(intrgbstrmatch.group(1))/255)).rstrip("0") 
             g=("{:f}".format(int(intrgbstrmatch.group(2))/255)).rstrip("0") 
@@ -1300,8 +2667,7 @@ class fdf_annotations:
 
         if rgbintcolorstring=="":
             return ""
-        intrgbtag=r"^\[?\s*(\d{1,3})\s+(\d{1,3})\s+(\d{1,3})\s*\]?$"      #optional square brackets followed by optional space(s), each rgb component can max consist of 3 digits, separated by at least 1 space.
-        intrgbstrmatch=re.search(intrgbtag, rgbintcolorstring)
+        intrgbstrmatch=intrgbpattern.search(rgbintcolorstring)
         if intrgbstrmatch:
             r=("{:.4f}".format(int(intrgbstrmatch.group(1))/255)).rstrip("0").rstrip(".") 
             g=("{:.4f}".format(int(intrgbstrmatch.group(2))/255)).rstrip("0").rstrip(".") 
@@ -1332,33 +2698,20 @@ class fdf_annotations:
         if fdf_annotations.rc_hashtml(toreturn)==False:
             return toreturn
         #replace htmlbody opening tag by harcdoded xml body tag
-        htmlbodytag=r"<html:body .*?>"
-        htmlbodytagmatch=re.search(htmlbodytag, toreturn)
+        htmlbodytagmatch=htmlbodytagpattern.search(toreturn)
         if htmlbodytagmatch:            
             #replace body tag with xml body tag
             toreturn=toreturn[0:htmlbodytagmatch.start()]+bodystring+toreturn[htmlbodytagmatch.end():]
             #insert xml header
             toreturn='<?xml version="1.0"?>'+toreturn
         else:
-            print("No html body tag replaced in provided rchtmlstring.")
-        #remove html: from <html: ...> tags
-        htmltag=r"<html:"
-        toprocess=True
-        while toprocess:
-            htmltagmatch=re.search(htmltag, toreturn)
-            if htmltagmatch:
-                toreturn=toreturn[0:htmltagmatch.start()]+"<"+toreturn[htmltagmatch.end():]
-            else:
-                toprocess=False
+            diagnostics.report("malformedvalue", "No html body tag replaced in provided rchtmlstring.")
+        #remove html: from <html: ...> tags (repeated as long as removing it forms a new tag)
+        while "<html:" in toreturn:
+            toreturn=toreturn.replace("<html:", "<")
         #remove html: from </html: ...> tags
-        htmlclosetag=r"<\/html:"
-        toprocess=True
-        while toprocess:
-            htmlclosetagmatch=re.search(htmlclosetag, toreturn)
-            if htmlclosetagmatch:
-                toreturn=toreturn[0:htmlclosetagmatch.start()]+"</"+toreturn[htmlclosetagmatch.end():]
-            else:
-                toprocess=False
+        while "</html:" in toreturn:
+            toreturn=toreturn.replace("</html:", "</")
         return toreturn
 
     @staticmethod
@@ -1375,14 +2728,1743 @@ class fdf_annotations:
             False is returned otherwise.
         """
 
-        htmltag=r"</?html:"
-        htmltagmatch=re.search(htmltag, rchtmlstring)
+        htmltagmatch=htmltagpattern.search(rchtmlstring)
         if htmltagmatch:            
             return True
         return False
          
 
+    @staticmethod
+    def loadstyleprofile(profilepath: str) -> dict:
+        """
+        Method that loads a style profile (see msgv2styleprofile for the expected keys) from the provided json or toml file (extension .toml).
+
+        Input: profilepath (str): path of the json or toml file containing the style profile.
+        Return: (dict) style profile.
+        """
+
+        if profilepath.lower().endswith(".toml"):
+            with open(profilepath, "rb") as file:
+                return tomllib.load(file)
+        with open(profilepath, "r", encoding='utf-8') as file:
+            return json.load(file)
+
+    def stylecolormap(self, styleprofile: dict =msgv2styleprofile) -> dict:
+        """
+        Method that determines the background color replacements of the provided style profile: per page, the background colors (/C) of the annotations containing a /Contents attribute
+        are mapped to the backgroundcolororder of the profile, in the order they're encountered on the page.
+
+        Input: styleprofile (dict): style profile to be applied. Default is msgv2styleprofile.
+        Return: (dict) {page: {current integer rgb color: integer rgb color of the profile}}.
+        """
+
+        color_dict=defaultdict(dict)    #will be used to translate background colors to expected background color
+        annots=self.select(contents=True)
+        with self.phase("colormap"):
+            for annot in annots:
+                color_dict[self.indexentry_dict[annot]["page"]][self.rgb_fractoint(self.getc(annot))]=""
+
+            #translate color_dict to expected color sequence: populate the color_dict with replacement values
+            for page, value in color_dict.items():
+                for i, intcolor in enumerate(value):
+                    color_dict[page][intcolor]=styleprofile["backgroundcolororder"][i]
+        return dict(color_dict)
+
+    def styleannotation(self, objectid: str, styleprofile: dict, color_dict: dict =None) -> None:
+        """
+        Method that formats a single annotation containing a /Contents attribute according to the provided style profile (see method applystyleprofile), by calling the individual getters and setters.
+        Class fdf_styleengine provides the same formatting in a single parse and serialisation of the annotation.
+
+        Input:
+            objectid (str): String value containing the object identifier for the annotation.
+            styleprofile (dict): style profile to be applied.
+            color_dict (dict): background color replacements as returned by method stylecolormap. If not provided the background color is left unchanged.
+        Return: None.
+        """
+
+        qualifyasheader=self.qualifyasheaderMSGV1 if styleprofile["headerrule"]=="MSGV1" else self.qualifyasheaderMSGV2
+        rcstring=self.getrccontent(objectid)
+        rcstring=self.removercreturns(rcstring)
+        rcstring=self.rc_dropspans(rcstring)
+        rcstyles=self.getrcstyles(rcstring)
+        rcstyles=self.rcstyles_setmasterstyle(rcstyles, styleprofile["rcstyle"])
+        rcstring=self.rcstyles_to_rccontentstring(rcstyles)
+        style=styleprofile["header"] if qualifyasheader(objectid) else styleprofile["variable"]
+        if style["rcspan"]:
+            rcstring=self.rc_insertspan(rcstring, style["rcspan"][0], style["rcspan"][1])
+        self.updaterccontent(objectid, rcstring)
+        self.updatedacontent(objectid, style["da"])
+        self.updatedscontent(objectid, style["ds"])
+        if styleprofile.get("opacity", "keep")=="drop" and self.getrecord(objectid).catag is not None:
+            self.dropca(objectid)
+        elif styleprofile.get("opacity", "keep")!="keep" and self.getrecord(objectid).ca is not None:
+            record=self.getrecord(objectid)
+            record.setvalue("ca", styleprofile["opacity"])
+            self.setannotation(objectid, record.text)
+        if color_dict is None:
+            return
+        keycolor=self.rgb_fractoint(self.getc(objectid))
+        self.setc(objectid, self.rgb_c_inttofrac(color_dict[self.getpagenum(objectid)][keycolor]))
+
+    def applystyleprofile(self, styleprofile: dict =msgv2styleprofile, shards: int =1, workers: int =None) -> None:
+        """
+        Method that formats all annotations containing a /Contents attribute according to the provided style profile, as done by Example_use.py:
+        * the /RC spans are dropped and the master style is set to the rcstyle of the profile, 
+        * annotations qualifying as domain header (according to the headerrule of the profile) get the rcspan, /DS and /DA of the header entry of the profile, other annotations those of the variable entry,
+        * the background colors (/C) used on each page are replaced by the backgroundcolororder of the profile, in the order they're encountered on the page,
+        * the opacity (/CA) is kept, dropped or set according to the opacity policy of the profile.
+        Formatting is done by class fdf_styleengine, i.e. the profile is compiled once and each annotation is parsed and serialised once.
+        
+        For very large files shards > 1 can be provided: the annotations are then split into contiguous shards that are formatted in separate worker processes (see function styleshard). 
+        Only the encoded annotation values are sent to and returned from the workers. The result is identical to formatting all annotations within the current process.
+
+        Input: 
+            styleprofile (dict): style profile to be applied. Default is msgv2styleprofile.
+            shards (int): number of shards the annotations are split into. Default is 1 (no worker processes used).
+            workers (int): number of worker processes used when shards > 1. Default (None) is the number of processors.
+        Return: None.
+        """
+
+        with self.phase("transform"):
+            if shards<=1:
+                fdf_styleengine(styleprofile).apply(self)
+                return
+
+            #split all objects into contiguous shards, each sent as a single bytes payload (raw file content for unmodified memory-mapped objects)
+            shardsize=-(-len(self.ordered_fdf_key)//shards)
+            shardkeys=[self.ordered_fdf_key[i:i+shardsize] for i in range(0, len(self.ordered_fdf_key), shardsize)]
+            payloads=[]
+            spanlists=[]
+            for keys in shardkeys:
+                pieces=[]
+                spans=[]
+                offset=0
+                for key in keys:
+                    rawvalue=self.getrawannotation(key)
+                    if isinstance(rawvalue, tuple):
+                        piece=self.source_buffer[rawvalue[0]:rawvalue[1]]
+                    else:
+                        piece=rawvalue.encode('windows-1252')
+                    pieces.append(piece)
+                    spans.append((key, offset, offset+len(piece), "Y" if isinstance(rawvalue, tuple) else "N"))
+                    offset+=len(piece)
+                payloads.append(b"".join(pieces))
+                spanlists.append(spans)
+
+            #workers format /RC, /DS and /DA and return the background color and its location per formatted annotation
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results=list(executor.map(styleshard, payloads, spanlists, [styleprofile]*len(payloads), [diagnostics.quiet]*len(payloads)))
+            for payload, formatted, counts in results:
+                diagnostics.merge(counts)
+
+            #determine background color replacements in ordered_fdf_key order (as done by method stylecolormap)
+            color_dict=defaultdict(dict)
+            with self.phase("colormap"):
+                for payload, formatted, counts in results:
+                    for key, length, page, intcolor, cspan in formatted:
+                        if cspan is not None:
+                            color_dict[page][intcolor]=""
+                for page, value in color_dict.items():
+                    for i, intcolor in enumerate(value):
+                        color_dict[page][intcolor]=styleprofile["backgroundcolororder"][i]
+
+            #reassemble formatted values, replacing the background color at the returned location
+            for payload, formatted, counts in results:
+                offset=0
+                for key, length, page, intcolor, cspan in formatted:
+                    annotstring=str(payload[offset:offset+length], 'windows-1252')
+                    if cspan is not None:
+                        annotstring=annotstring[:cspan[0]]+self.rgb_c_inttofrac(color_dict[page][intcolor])+annotstring[cspan[1]:]
+                    self.setannotation(key, annotstring)
+                    offset+=length
+
+    def applystyleprofileincremental(self, manifest_dict: dict, previousfdfpath: str, styleprofile: dict =msgv2styleprofile) -> dict:
+        """
+        Method that applies the provided style profile (see method applystyleprofile) to the annotations that are new or changed since the previous run only, 
+        and carries the formatted values of the previous run (i.e. the previously exported fdf file) forward for all other annotations. The result is identical to formatting all annotations.
+
+        The manifest of the previous run contains per annotation name (/NM, "" for annotations without /NM) a list with per annotation the SHA-256 hash of the annotation value before formatting, its modification date (/M), page and /C value, 
+        the background color assigned and the object identifier and hash of the formatted value within the previous fdf file. 
+        An annotation is carried forward if its value is unchanged (same hash, so the same /NM and /M), the formatted value is found unaltered within the previous fdf file and the background color 
+        assigned on its page remains the same (colors depend on the order the /C values are encountered on the page, see class fdf_styleengine). Unchanged annotations are therefore not parsed.
+        All other annotations are formatted. A list is kept per /NM as copied annotations share the /NM of the original. The manifest is ignored if it was created for another style profile.
+
+        Input:
+            manifest_dict (dict): manifest returned by the previous run, or an empty dictionary for the first run.
+            previousfdfpath (str): path of the fdf file exported by the previous run. Only read if an unchanged annotation is encountered.
+            styleprofile (dict): style profile to be applied. Default is msgv2styleprofile.
+        Return: (dict) {"manifest": manifest of this run (to be provided to the next run, e.g. saved as json), "new": number of formatted annotations with an /NM not included in the manifest, 
+                        "changed": number of other formatted annotations, "carried": number of annotations carried forward}.
+        """
+
+        profilehash=hashlib.sha256(json.dumps(styleprofile, sort_keys=True).encode('utf-8')).hexdigest()
+        previous_dict=manifest_dict.get("annotations", {}) if (manifest_dict.get("version"), manifest_dict.get("profile"))==(manifestversion, profilehash) else {}
+        previoushash_dict={entry["hash"]: entry for entries in previous_dict.values() for entry in entries}      #manifest entry per hash of the annotation values of the previous run
+        previous=None           #fdf_annotations of the previous fdf file, loaded upon the first unchanged annotation
+        engine=fdf_styleengine(styleprofile)
+        annotation_dict={}
+        result={"manifest": {"version": manifestversion, "profile": profilehash, "annotations": annotation_dict}, "new": 0, "changed": 0, "carried": 0}
+
+        with self.phase("transform"):
+            for objectid in self.ordered_fdf_key[2:]:
+                if objectid not in self.fdf_dict or not objectid.endswith(" obj"):
+                    continue
+                annotstring=self.fdf_dict[objectid]
+                annothash=hashlib.sha256(annotstring.encode('utf-8')).hexdigest()
+                previousentry=previoushash_dict.get(annothash)
+                formattedstring=None
+                if previousentry is not None:      #unchanged annotation value: carried forward if the previous formatted value is still valid
+                    nm=previousentry["nm"]
+                    entry=dict(previousentry, objectid=objectid)
+                    if engine.pagecolor(entry["page"], entry["c"])==entry["color"]:
+                        if previous is None and os.path.exists(previousfdfpath):
+                            previous=fdf_annotations(previousfdfpath)
+                        formattedstring=previous.fdf_dict.get(previousentry["objectid"]) if previous is not None else None
+                        if formattedstring is not None and hashlib.sha256(formattedstring.encode('utf-8')).hexdigest()!=entry["output"]:
+                            formattedstring=None
+                    if formattedstring is not None:
+                        self.record_dict.pop(objectid, None)
+                        self.setannotation(objectid, formattedstring)
+                        result["carried"]+=1
+
+                if formattedstring is None:
+                    if isinstance(self.getrawannotation(objectid), tuple) and objectid not in self.record_dict:     #unmodified memory-mapped object: only parse the decoded value
+                        record=fdf_annotationrecord(annotstring)
+                    else:
+                        record=self.getrecord(objectid)
+                    if record.contents is None:
+                        continue
+                    formattedstring=engine.transformrecord(record, objectid)
+                    self.record_dict.pop(objectid, None)
+                    self.setannotation(objectid, formattedstring)
+                    nm=record.getattributevalue(nmstartpattern) or ""
+                    result["changed" if nm in previous_dict else "new"]+=1
+                    entry={"nm": nm, "hash": annothash, "m": record.getattributevalue(mstartpattern), "page": int(record.getvalue("page")) if record.page is not None else None, "c": record.getvalue("c"), "objectid": objectid}
+                    entry["color"]=engine.pagecolor(entry["page"], entry["c"])
+                    entry["output"]=hashlib.sha256(formattedstring.encode('utf-8')).hexdigest()
+
+                annotation_dict.setdefault(nm, []).append(entry)
+
+        if previous is not None:
+            previous.release()
+        return result
+
+    def totable(self, objectids: list =None):
+        """
+        Method that exports the geometry and color attributes of the provided annotations into a columnar table (see class fdf_annotationtable), 
+        so shifting, scaling or recoloring annotations can be done with array operations instead of calling getrect/setrect/setc per annotation.
+        Changes made to the table are written back by method writetable. Requires NumPy.
+
+        Input: objectids (list): optional object identifiers of the annotations to be included. Default: all objects except header, root catalog, interobject text and trailer, in ordered_fdf_key order.
+        Return: fdf_annotationtable object. None is returned if NumPy is not available.
+        """
+
+        if numpy is None:
+            diagnostics.report("missingdependency", "NumPy is required to create an annotation table (pip install numpy).")
+            return None
+        if objectids is None:
+            objectids=[objectid for objectid in self.ordered_fdf_key[2:] if objectid.endswith(" obj") and objectid in self.fdf_dict]
+        else:
+            objectids=[self.toobjectid(objectid) for objectid in objectids]
+        table=fdf_annotationtable(objectids)
+        for row, objectid in enumerate(objectids):
+            record=self.getrecord(objectid)
+            if record is None:
+                diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
+                continue
+            table.page[row]=int(record.getvalue("page")) if record.page is not None else -1
+            table.rect[row]=fdf_annotationtable.parsenumbers(record.getvalue("rect"), 4)
+            table.c[row]=fdf_annotationtable.parsenumbers(record.getvalue("c"), 3)
+            table.ca[row]=fdf_annotationtable.parsenumbers(record.getvalue("ca"), 1)[0]
+            contents=record.getvalue("contents")
+            table.contentlength[row]=len(contents) if contents is not None else -1
+        table.snapshot()
+        return table
+
+    def writetable(self, table, columns: tuple =("rect", "c", "page")) -> int:
+        """
+        Method that writes the values of the provided columns of an annotation table (see method totable) back into /Rect, /C and /Page.
+        Only the rows whose values were changed since the table was created (or last written) are updated, each annotation being serialised once for all its changed columns.
+        Values written to annotations that don't have the corresponding attribute are reported and skipped, as done by setrect, setc and setpagenum.
+
+        Input:
+            table (fdf_annotationtable): table returned by method totable.
+            columns (tuple): columns to be written back, any of "rect", "c" and "page". Default is all three.
+        Return: (int) number of annotations updated.
+        """
+
+        changed_dict={column: set(table.changedrows(column).tolist()) for column in columns}
+        updated=0
+        for row in sorted(set().union(*changed_dict.values())):
+            objectid=table.objectids[row]
+            if objectid not in self.fdf_dict:
+                diagnostics.report("missingobject", f"The provided object (ID= {objectid}) could not be found within the fdf.")
+                continue
+            record=self.getrecord(objectid)
+            modified=False
+            for column in columns:
+                if row not in changed_dict[column]:
+                    continue
+                if getattr(record, column) is None:
+                    diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no /{column.capitalize() if column!='c' else 'C'} attribute to set.")
+                    continue
+                record.setvalue(column, table.formatvalue(column, row))
+                modified=True
+            if modified:
+                self.setannotation(objectid, record.text)
+                updated+=1
+        table.snapshot()
+        return updated
+
+
+
+
+#additional methods to be added here
+
+
+class fdf_annotationrecord:
+    """
+    Class that holds the value of a single annotation object (as stored in fdf_dict) together with the location (span) of the values of its main attributes:
+    /Contents, /RC, /DS, /DA, /C, /CA, /Rect and /Page.
+
+    The attribute values are located once when the record is created. Getters slice the value directly from the stored span, 
+    while setters replace a single span and shift the spans located after it, without scanning the annotation value again.
+    Each span is a tuple (start, end) with the value being text[start:end]. 
+    For the attributes enclosed in parentheses (contents, rc, ds, da) the end is None when no closing parenthesis was found.
+    A span is None when the attribute is not present within the annotation.
+
+    For unmodified objects of a file loaded with use_mmap="Y" the record refers to the memory-mapped file instead: text then contains the (start, end) byte offsets 
+    of the object within buffer, the spans are byte offsets within buffer as well, and values are only decoded by getvalue. 
+    The first call to setvalue decodes the object into a string.
+    """
+    __slots__=("text", "buffer", "contents", "rc", "ds", "da", "c", "ca", "catag", "rect", "page", "hasc", "hasca")
+    spanattributes=("contents", "rc", "ds", "da", "c", "ca", "catag", "rect", "page")
+
+    def __init__(self, text, buffer=None) -> None:
+        """
+        Method that creates the record for the provided annotation value.
+
+        Input: 
+            text (str or tuple): String containing the annotation value as stored in fdf_dict, or tuple (start, end) of byte offsets within the provided buffer.
+            buffer (mmap): optional memory-mapped file content the provided (start, end) offsets refer to.
+        Return: None.
+        """
+        self.text=text
+        self.buffer=buffer
+        self.parse()
+
+    def search(self, pattern: re.Pattern, position: int =None):
+        """
+        Method that searches the provided compiled pattern within the annotation value, from the provided position onwards (default: start of the value).
+        For records referring to a memory-mapped file the bytes equivalent of the pattern is searched within the object's byte range.
+
+        Input: 
+            pattern (re.Pattern): compiled str pattern.
+            position (int): optional offset to start searching from.
+        Return: re.Match object or None.
+        """
+        if self.buffer is None:
+            return pattern.search(self.text, 0 if position is None else position)
+        return bytespattern(pattern).search(self.buffer, self.text[0] if position is None else position, self.text[1])
+
+    def parenthesisspan(self, startpattern: re.Pattern, startmatch: re.Match =None) -> tuple:
+        """
+        Method that returns the span of the value enclosed in parentheses following the attribute matched by the provided startpattern.
+        The value ends at the first closing parenthesis that is not escaped by a backslash.
+
+        Input: 
+            startpattern (re.Pattern): compiled pattern matching the attribute name including the opening parenthesis, e.g. "/RC(".
+            startmatch (re.Match): optional match of startpattern already found, used instead of searching startpattern.
+        Return: tuple (start, end), with end set to None if no closing parenthesis is found. None is returned if the attribute is not found.
+        """
+        if startmatch is None:
+            startmatch=self.search(startpattern)
+        if startmatch is None:
+            return None
+        endmatch=self.search(parenthesisendpattern, startmatch.end())
+        if endmatch is None:
+            return (startmatch.end(), None)
+        return (startmatch.end(), endmatch.start())
+
+    def parse(self) -> None:
+        """
+        Method that (re)locates all attribute values within the text of the record.
+
+        Input: None.
+        Return: None.
+        """
+        self.contents=self.parenthesisspan(contentstartpattern)
+        self.rc=self.parenthesisspan(rcstartpattern)
+        self.ds=self.parenthesisspan(dsstartpattern)
+        self.da=self.parenthesisspan(dastartpattern)
+        cmatch=self.search(cpattern)
+        self.c=cmatch.span(1) if cmatch else None
+        self.hasc=True if cmatch else self.search(hascpattern) is not None
+        camatch=self.search(capattern)
+        self.ca=camatch.span(2) if camatch else None
+        self.catag=camatch.span(1) if camatch else None        #full /CA tag and value (as removed by dropca)
+        self.hasca=True if camatch else self.search(hascapattern) is not None
+        rectmatch=self.search(rectpattern)
+        self.rect=rectmatch.span(1) if rectmatch else None
+        pagematch=self.search(pagepattern)
+        self.page=pagematch.span(1) if pagematch else None
+
+    def searchattribute(self, pattern: re.Pattern):
+        """
+        Method that searches the provided compiled pattern within the annotation value, skipping matches located within the values of /Contents, /RC, /DS and /DA.
+        Used for attributes not located upon parsing (e.g. /Subtype), which could otherwise be matched within the text of the annotation.
+
+        Input: pattern (re.Pattern): compiled str pattern.
+        Return: re.Match object or None.
+        """
+        position=None
+        while True:
+            match=self.search(pattern, position)
+            if match is None:
+                return None
+            for span in (self.contents, self.rc, self.ds, self.da):
+                if span is not None and span[0]<=match.start() and (span[1] is None or match.start()<span[1]):
+                    if span[1] is None:     #value not closed: remainder of the annotation is part of it
+                        return None
+                    position=span[1]
+                    break
+            else:
+                return match
+
+    def getmatchvalue(self, match: re.Match, group: int =0) -> str:
+        """
+        Method that returns the (decoded) value of the provided group of a match returned by method search or searchattribute.
+
+        Input:
+            match (re.Match): match within the annotation value.
+            group (int): group number. Default is set to 0 (full match).
+        Return: (str) value of the group.
+        """
+        if self.buffer is not None:
+            return fdf_annotations.decodesource(self.buffer, match.start(group), match.end(group))
+        return match.group(group)
+
+    def getattributevalue(self, startpattern: re.Pattern) -> str:
+        """
+        Method that returns the value enclosed in parentheses of an attribute not located upon parsing (e.g. /T or /NM), see methods searchattribute and parenthesisspan.
+
+        Input: startpattern (re.Pattern): compiled pattern matching the attribute name including the opening parenthesis, e.g. "/T(".
+        Return: (str) value of the attribute. None is returned if the attribute is not present or not properly closed.
+        """
+        startmatch=self.searchattribute(startpattern)
+        if startmatch is None:
+            return None
+        span=self.parenthesisspan(startpattern, startmatch)
+        if span[1] is None:
+            return None
+        if self.buffer is not None:
+            return fdf_annotations.decodesource(self.buffer, span[0], span[1])
+        return self.text[span[0]:span[1]]
+
+    def getvalue(self, attribute: str) -> str:
+        """
+        Method that returns the value of the provided attribute (one of spanattributes) by slicing the text with the stored span.
+
+        Input: attribute (str): name of the attribute, e.g. "rc".
+        Return: (str) value of the attribute. None is returned if the attribute is not present or not properly closed.
+        """
+        span=getattr(self, attribute)
+        if span is None or span[1] is None:
+            return None
+        if self.buffer is not None:
+            return fdf_annotations.decodesource(self.buffer, span[0], span[1])
+        return self.text[span[0]:span[1]]
+
+    def setvalue(self, attribute: str, value: str) -> None:
+        """
+        Method that replaces the value of the provided attribute (one of spanattributes) and shifts the spans of the attributes located after it.
+        In case the replaced value overlaps with the span of another attribute (e.g. /CA removed by dropca), all spans are located again.
+
+        Input:
+            attribute (str): name of the attribute, e.g. "rc".
+            value (str): new value of the attribute.
+        Return: None.
+        """
+        if self.buffer is not None:         #decode the memory-mapped object into a string before modifying it
+            self.text=fdf_annotations.decodesource(self.buffer, self.text[0], self.text[1])
+            self.buffer=None
+            self.parse()
+        start, end=getattr(self, attribute)
+        self.text=self.text[:start]+value+self.text[end:]
+        delta=len(value)-(end-start)
+        for name in fdf_annotationrecord.spanattributes:
+            span=getattr(self, name)
+            if span is None:
+                continue
+            if span[0]==start and span[1]==end:
+                setattr(self, name, (start, end+delta))
+            elif span[1] is not None and span[1]<=start:
+                continue
+            elif span[0]>=end:
+                setattr(self, name, (span[0]+delta, None if span[1] is None else span[1]+delta))
+            else:
+                self.parse()
+                return
 
 
+class fdf_annotationtable:
+    """
+    Class that holds the geometry and color attributes of a list of annotations as NumPy arrays, one row per annotation (see methods totable and writetable of class fdf_annotations):
+
+    * objectids: list of the object identifiers, in row order.
+    * page: (n,) int32 array containing the zero-based page number (/Page), -1 if absent.
+    * rect: (n,4) float64 array containing the /Rect values (x1, y1, x2, y2), NaN if absent.
+    * c: (n,3) float64 array containing the fractional /C values (r, g, b), NaN if absent.
+    * ca: (n,) float64 array containing the /CA value, NaN if absent.
+    * contentlength: (n,) int32 array containing the length of the /Contents value, -1 if absent.
+
+    The arrays can be modified in place, e.g. table.rect[table.page==12]+=[0, -20, 0, -20] or table.c[:]=[1.0, 1.0, 0.0].
+    The values as loaded (or last written) are kept in loaded_dict to determine the changed rows upon write-back.
+    """
+
+    def __init__(self, objectids: list) -> None:
+        """
+        Method that creates an empty table (missing values) for the provided object identifiers.
+
+        Input: objectids (list): object identifiers, one per row.
+        Return: None.
+        """
+        rows=len(objectids)
+        self.objectids=list(objectids)
+        self.row_dict={objectid: row for row, objectid in enumerate(self.objectids)}
+        self.page=numpy.full(rows, -1, dtype=numpy.int32)
+        self.rect=numpy.full((rows, 4), numpy.nan, dtype=numpy.float64)
+        self.c=numpy.full((rows, 3), numpy.nan, dtype=numpy.float64)
+        self.ca=numpy.full(rows, numpy.nan, dtype=numpy.float64)
+        self.contentlength=numpy.full(rows, -1, dtype=numpy.int32)
+        self.loaded_dict={}
+
+    def __len__(self) -> int:
+        """
+        Method that returns the number of rows (annotations) of the table.
+        """
+        return len(self.objectids)
+
+    def rowof(self, objectid: str) -> int:
+        """
+        Method that returns the row of the provided object identifier, or None if not included in the table.
+        """
+        return self.row_dict.get(fdf_annotations.toobjectid(objectid))
+
+    def snapshot(self) -> None:
+        """
+        Method that stores a copy of the writable columns (rect, c, page), used by method changedrows.
+
+        Input: None.
+        Return: None.
+        """
+        self.loaded_dict={column: getattr(self, column).copy() for column in ("rect", "c", "page")}
+
+    def changedrows(self, column: str):
+        """
+        Method that returns the rows of which the values of the provided column differ from the values stored by method snapshot (missing values compared as equal).
+
+        Input: column (str): "rect", "c" or "page".
+        Return: (numpy.ndarray) row numbers in ascending order.
+        """
+        values=getattr(self, column)
+        loaded=self.loaded_dict[column]
+        if values.dtype.kind=="f":
+            unchanged=(values==loaded) | (numpy.isnan(values) & numpy.isnan(loaded))
+        else:
+            unchanged=values==loaded
+        if unchanged.ndim>1:
+            unchanged=unchanged.all(axis=1)
+        return numpy.flatnonzero(~unchanged)
+
+    def formatvalue(self, column: str, row: int) -> str:
+        """
+        Method that returns the value of the provided column and row formatted as written in the annotation: "[x1 y1 x2 y2]" for rect, "[r g b]" for c and the page number for page.
+
+        Input:
+            column (str): "rect", "c" or "page".
+            row (int): row number.
+        Return: (str) formatted value.
+        """
+        if column=="page":
+            return str(int(self.page[row]))
+        return "[" + " ".join(fdf_annotationtable.formatnumber(value) for value in getattr(self, column)[row]) + "]"
+
+    @staticmethod
+    def formatnumber(value: float) -> str:
+        """
+        Method that formats a number with up to 6 decimals and at least 1 decimal, as done by method rgb_c_inttofrac (e.g. 1.0, 0.121569, 704.029).
+
+        Input: value (float): number to be formatted.
+        Return: (str) formatted number.
+        """
+        numberstring=("{:f}".format(float(value))).rstrip("0")
+        if numberstring[-1]==".":
+            numberstring=numberstring+"0"
+        return "0.0" if numberstring=="-0.0" else numberstring
+
+    @staticmethod
+    def parsenumbers(valuestring: str, count: int) -> list:
+        """
+        Method that parses a value such as "[80.2907 704.029 251.345 732.393]" into a list of floats.
+
+        Input:
+            valuestring (str): value, optionally enclosed in square brackets.
+            count (int): expected number of values.
+        Return: (list) count floats. NaN values are returned if the value is None or does not contain count numbers.
+        """
+        if valuestring is not None:
+            try:
+                numbers=[float(number) for number in valuestring.strip().strip("[]").split()]
+            except ValueError:
+                numbers=[]
+            if len(numbers)==count:
+                return numbers
+        return [numpy.nan]*count
+
+
+class fdf_spatialindex:
+    """
+    Class that holds a per-page uniform grid index of annotation boxes (/Rect values), used to find overlapping annotations (see method find_overlaps of class fdf_annotations).
+
+    Each box is registered in all grid cells of cellsize x cellsize points it covers. Two boxes can only overlap when they share a cell, so only boxes sharing a cell are compared,
+    and each overlapping pair is reported once: from the cell containing the lower left corner of the intersection of both boxes.
+    With cells about the size of an annotation each box covers a few cells only, and the duration grows with the number of boxes and overlaps instead of the square of the number of boxes.
+
+    * cellsize: size of the grid cells in points.
+    * cell_dict: {page: {(column, row): list of object identifiers}}.
+    * box_dict: {object identifier: (page, (x1, y1, x2, y2))}, with x1<=x2 and y1<=y2.
+    """
+
+    def __init__(self, cellsize: float =64.0) -> None:
+        """
+        Method that creates an empty spatial index.
+
+        Input: cellsize (float): size of the grid cells in points. Default is 64.0.
+        Return: None.
+        """
+        self.cellsize=float(cellsize)
+        self.cell_dict={}
+        self.box_dict={}
+
+    def __len__(self) -> int:
+        """
+        Method that returns the number of boxes included in the spatial index.
+        """
+        return len(self.box_dict)
+
+    @staticmethod
+    def parserect(rectstring: str) -> tuple:
+        """
+        Method that parses a /Rect value such as "[80.2907 704.029 251.345 732.393]" into a tuple (x1, y1, x2, y2) with x1<=x2 and y1<=y2.
+
+        Input: rectstring (str): /Rect value enclosed in square brackets.
+        Return: (tuple) 4 floats. None is returned if the value is None or does not contain 4 numbers.
+        """
+        if rectstring is None:
+            return None
+        try:
+            x1, y1, x2, y2=(float(number) for number in rectstring.strip().strip("[]").split())
+        except ValueError:
+            return None
+        return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+    @staticmethod
+    def defaultcellsize(rects: list) -> float:
+        """
+        Method that determines a cell size from the provided boxes: the median of the larger side of the boxes, with a minimum of 8 points.
+        Cells much smaller than the boxes register each box in many cells, cells much larger compare boxes that are far apart.
+
+        Input: rects (list): tuples (x1, y1, x2, y2).
+        Return: (float) cell size. 64.0 is returned if no boxes are provided.
+        """
+        if not rects:
+            return 64.0
+        sides=sorted(max(x2-x1, y2-y1) for x1, y1, x2, y2 in rects)
+        return max(8.0, sides[len(sides)//2])
+
+    def cells(self, rect: tuple, margin: float =0.0):
+        """
+        Method that returns the (column, row) of the grid cells covered by the provided box, enlarged by margin.
+
+        Input:
+            rect (tuple): (x1, y1, x2, y2).
+            margin (float): distance added on each side of the box.
+        Return: (generator) (column, row) tuples.
+        """
+        x1, y1, x2, y2=rect
+        cellsize=self.cellsize
+        firstcolumn, lastcolumn=int((x1-margin)//cellsize), int((x2+margin)//cellsize)
+        firstrow, lastrow=int((y1-margin)//cellsize), int((y2+margin)//cellsize)
+        return ((column, row) for column in range(firstcolumn, lastcolumn+1) for row in range(firstrow, lastrow+1))
+
+    def insert(self, objectid: str, page: int, rect: tuple) -> None:
+        """
+        Method that adds (or moves) the box of the provided object identifier to the spatial index.
+
+        Input:
+            objectid (str): object identifier.
+            page (int): zero-based page number.
+            rect (tuple): (x1, y1, x2, y2) with x1<=x2 and y1<=y2.
+        Return: None.
+        """
+        if objectid in self.box_dict:
+            self.remove(objectid)
+        self.box_dict[objectid]=(page, rect)
+        pagecells=self.cell_dict.setdefault(page, {})
+        for cell in self.cells(rect):
+            pagecells.setdefault(cell, []).append(objectid)
+
+    def remove(self, objectid: str) -> None:
+        """
+        Method that removes the box of the provided object identifier from the spatial index (if included).
+
+        Input: objectid (str): object identifier.
+        Return: None.
+        """
+        box=self.box_dict.pop(objectid, None)
+        if box is None:
+            return
+        page, rect=box
+        pagecells=self.cell_dict[page]
+        for cell in self.cells(rect):
+            pagecells[cell].remove(objectid)
+            if not pagecells[cell]:
+                del pagecells[cell]
+        if not pagecells:
+            del self.cell_dict[page]
+
+    def query(self, page: int, rect: tuple, margin: float =0.0) -> list:
+        """
+        Method that returns the object identifiers of the boxes overlapping the provided box on the provided page.
+
+        Input:
+            page (int): zero-based page number.
+            rect (tuple): (x1, y1, x2, y2) with x1<=x2 and y1<=y2.
+            margin (float): boxes closer to the provided box than margin are returned as well. Default is 0.0.
+        Return: (list) object identifiers.
+        """
+        x1, y1, x2, y2=rect
+        pagecells=self.cell_dict.get(page, {})
+        found=set()
+        for cell in self.cells(rect, margin):
+            for objectid in pagecells.get(cell, ()):
+                if objectid in found:
+                    continue
+                bx1, by1, bx2, by2=self.box_dict[objectid][1]
+                if bx1<x2+margin and x1<bx2+margin and by1<y2+margin and y1<by2+margin:
+                    found.add(objectid)
+        return list(found)
+
+    def find_overlaps(self, page: int =None, margin: float =0.0) -> list:
+        """
+        Method that returns all pairs of overlapping boxes (boxes closer to each other than margin, if provided), per page.
+
+        Input:
+            page (int): optional zero-based page number. Default: all pages.
+            margin (float): minimal distance required between boxes. Default is 0.0 (touching boxes do not overlap).
+        Return: (list) tuples (page, objectid1, objectid2), each pair being reported once.
+        """
+        if margin>0:        #boxes closer than margin are the boxes overlapping once enlarged by half the margin on each side
+            enlargedindex=fdf_spatialindex(self.cellsize)
+            for objectid, (boxpage, (x1, y1, x2, y2)) in self.box_dict.items():
+                if page is None or boxpage==page:
+                    enlargedindex.insert(objectid, boxpage, (x1-margin/2, y1-margin/2, x2+margin/2, y2+margin/2))
+            return enlargedindex.find_overlaps(page)
+        cellsize=self.cellsize
+        box_dict=self.box_dict
+        overlaps=[]
+        pages=[page] if page is not None else sorted(self.cell_dict)
+        for overlappage in pages:
+            for (column, row), objectids in self.cell_dict.get(overlappage, {}).items():
+                if len(objectids)<2:
+                    continue
+                boxes=[(objectid, box_dict[objectid][1]) for objectid in objectids]
+                for i, (objectid1, (ax1, ay1, ax2, ay2)) in enumerate(boxes):
+                    for objectid2, (bx1, by1, bx2, by2) in boxes[i+1:]:
+                        if bx1<ax2 and ax1<bx2 and by1<ay2 and ay1<by2:
+                            #report the pair only from the cell containing the lower left corner of the intersection, as both boxes share all cells covering the intersection
+                            if int(max(ax1, bx1)//cellsize)==column and int(max(ay1, by1)//cellsize)==row:
+                                overlaps.append((overlappage, objectid1, objectid2))
+        return overlaps
+
+
+class fdf_objectkey:
+    r"""
+    Class that holds both spellings of an object key: the object identifier ("\d+ \d+ obj", as used within ordered_fdf_key and fdf_dict) 
+    and the reference ("\d+ \d+ R", as used within root_key and the subobject dictionaries).
+    Keys are parsed by method parse using string operations instead of a pattern, and the parsed keys are cached, 
+    so converting a key between both spellings (see methods fdf_annotations.toobjectid and fdf_annotations.toreference) is a single cache lookup once it was parsed.
+    """
+    __slots__=("objectid", "reference")
+
+    def __init__(self, objectnumber: str) -> None:
+        r"""
+        Method that creates the object key for the provided object and generation number.
+
+        Input: objectnumber (str): object and generation number followed by a space, e.g. "16 0 ".
+        Return: None.
+        """
+        self.objectid=objectnumber+"obj"
+        self.reference=objectnumber+"R"
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def parse(key: str):
+        r"""
+        Method that parses the provided object identifier or reference, i.e. the equivalent of matching objectkeypattern ("^(\d+ \d+ )(R|obj)$").
+
+        Input: key (str): object identifier or reference, e.g. "16 0 R" or "16 0 obj".
+        Return: (fdf_objectkey) parsed object key, None if the provided key is spelled otherwise (e.g. "header", "trailer").
+        """
+        if key.endswith("\n"):        #$ also matches before a new line ending the string
+            key=key[:-1]
+        if key.endswith(" R"):
+            objectnumber=key[:-1]
+        elif key.endswith(" obj"):
+            objectnumber=key[:-3]
+        else:
+            return None
+        numbers=objectnumber.split(" ")
+        if len(numbers)!=3 or not numbers[0].isdecimal() or not numbers[1].isdecimal():
+            return None
+        return fdf_objectkey(objectnumber)
+
+
+class fdf_rootkey(list):
+    r"""
+    List used as root_key: the object references ("\d+ \d+ R") included in the root catalog object, in order.
+    Besides the list itself, the number of occurrences of each reference is kept, so membership tests (in, count) take constant time.
+    Bulk methods (insertmany, removemany, reorder, replace) process any number of references in a single pass over the list.
+    Each modification increments version, which allows updaterootvalue to skip serialising an unmodified root catalog object.
+    The class is a list subclass, so root_key can still be used as a list (comparison, concatenation, sort, json serialisation, ...): all methods modifying the list are overridden to keep the counts.
+    """
+
+    def __init__(self, references=()) -> None:
+        """
+        Method that creates the list containing the provided references.
+
+        Input: references (iterable): object references.
+        Return: None.
+        """
+        super().__init__(references)
+        self.count_dict=Counter(self)
+        self.version=0
+
+    def __setitem__(self, index, value) -> None:
+        """
+        Method that replaces the reference at the provided position (or the references of a slice by the provided references).
+        """
+        if isinstance(index, slice):
+            value=list(value)
+            self.count_dict.subtract(super().__getitem__(index))
+            self.count_dict.update(value)
+        else:
+            self.count_dict[super().__getitem__(index)]-=1
+            self.count_dict[value]+=1
+        super().__setitem__(index, value)
+        self.version+=1
+
+    def __delitem__(self, index) -> None:
+        """
+        Method that removes the reference at the provided position (or the references of a slice).
+        """
+        self.count_dict.subtract(super().__getitem__(index) if isinstance(index, slice) else [super().__getitem__(index)])
+        super().__delitem__(index)
+        self.version+=1
+
+    def __iadd__(self, references):
+        """
+        Method that adds the provided references as last elements (+= operator).
+        """
+        self.extend(references)
+        return self
+
+    def __imul__(self, factor: int):
+        """
+        Method that repeats the references the provided number of times (*= operator).
+        """
+        self.replace(list(self)*factor)
+        return self
+
+    def __contains__(self, reference) -> bool:
+        """
+        Method that returns True if the provided reference is included, in constant time.
+        """
+        return self.count_dict.get(reference, 0) > 0
+
+    def __repr__(self) -> str:
+        return f"fdf_rootkey({list(self)!r})"
+
+    def __reduce__(self):
+        """
+        Method that allows to pickle (and copy) the list: the counts are rebuilt from the references instead of being restored.
+        """
+        return (fdf_rootkey, (list(self),), {"version": self.version})
+
+    def insert(self, index: int, reference: str) -> None:
+        """
+        Method that inserts the provided reference at the provided position.
+        """
+        super().insert(index, reference)
+        self.count_dict[reference]+=1
+        self.version+=1
+
+    def append(self, reference: str) -> None:
+        """
+        Method that adds the provided reference as last element.
+        """
+        super().append(reference)
+        self.count_dict[reference]+=1
+        self.version+=1
+
+    def extend(self, references) -> None:
+        """
+        Method that adds the provided references as last elements.
+        """
+        references=list(references)
+        super().extend(references)
+        self.count_dict.update(references)
+        self.version+=1
+
+    def pop(self, index: int =-1) -> str:
+        """
+        Method that removes and returns the reference at the provided position (default: the last one).
+        """
+        reference=super().pop(index)
+        self.count_dict[reference]-=1
+        self.version+=1
+        return reference
+
+    def clear(self) -> None:
+        """
+        Method that removes all references.
+        """
+        super().clear()
+        self.count_dict.clear()
+        self.version+=1
+
+    def count(self, reference: str) -> int:
+        """
+        Method that returns the number of occurrences of the provided reference, in constant time.
+        """
+        return max(self.count_dict.get(reference, 0), 0)
+
+    def index(self, reference: str, start: int =0, stop: int =None) -> int:
+        """
+        Method that returns the first position of the provided reference. A ValueError is raised immediately if the reference is not included.
+        """
+        if reference not in self:
+            raise ValueError(f"{reference} is not in root_key")
+        return super().index(reference, start, len(self) if stop is None else stop)
+
+    def remove(self, reference: str) -> None:
+        """
+        Method that removes the first occurrence of the provided reference. A ValueError is raised if the reference is not included.
+        """
+        del self[self.index(reference)]
+
+    def sort(self, *, key=None, reverse: bool =False) -> None:
+        """
+        Method that sorts the references as list.sort does (see method reorder to sort by object number).
+        """
+        super().sort(key=key, reverse=reverse)
+        self.version+=1
+
+    def reverse(self) -> None:
+        """
+        Method that reverses the order of the references.
+        """
+        super().reverse()
+        self.version+=1
+
+    def insertmany(self, index: int, references) -> None:
+        """
+        Method that inserts the provided references at the provided position (-1: after the last element), keeping their order.
+
+        Input:
+            index (int): position of the first inserted reference.
+            references (iterable): references to be inserted.
+        Return: None.
+        """
+        if index==-1:
+            index=len(self)
+        self[index:index]=references
+
+    def removemany(self, references) -> int:
+        """
+        Method that removes all occurrences of the provided references. Only a few occurrences are located by searching, otherwise the list is rebuilt in a single pass.
+
+        Input: references (iterable): references to be removed.
+        Return: (int) number of references removed.
+        """
+        toremove={reference for reference in references if reference in self}
+        occurrences=sum(self.count_dict[reference] for reference in toremove)
+        if occurrences==0:
+            return 0
+        if occurrences <= 8:
+            for reference in toremove:
+                while self.count_dict[reference] > 0:
+                    del self[super().index(reference)]
+        else:
+            super().__setitem__(slice(None), [reference for reference in self if reference not in toremove])
+            for reference in toremove:
+                del self.count_dict[reference]
+            self.version+=1
+        return occurrences
+
+    def reorder(self, key=None, reverse: bool =False) -> None:
+        """
+        Method that sorts the references using the provided key function (stable sort, e.g. to order the annotations by page).
+        If no key is provided the references are sorted by object number.
+
+        Input:
+            key (function): function returning the sort key of a reference. Default is the object number.
+            reverse (bool): sort in descending order. Default is False.
+        Return: None.
+        """
+        self.sort(key=key if key is not None else lambda reference: int(reference.split(" ", 1)[0]), reverse=reverse)
+
+    def replace(self, references) -> None:
+        """
+        Method that replaces all references by the provided references.
+
+        Input: references (iterable): new references, in order.
+        Return: None.
+        """
+        super().__setitem__(slice(None), list(references))
+        self.count_dict=Counter(self)
+        self.version+=1
+
+
+class fdf_mappeddict(MutableMapping):
+    """
+    Dictionary used as fdf_dict when an FDF file is loaded with use_mmap="Y".
+    For unmodified objects it only stores a tuple (start, end) of byte offsets within the memory-mapped file, which is decoded into a string each time the value is requested.
+    Values that are assigned (i.e. modified objects) are stored as strings, as in a regular dictionary.
+    """
+
+    def __init__(self, buffer) -> None:
+        """
+        Method that creates an empty dictionary referring to the provided memory-mapped file content.
+
+        Input: buffer (mmap): memory-mapped file content.
+        Return: None.
+        """
+        self.buffer=buffer
+        self.rawdict={}
+
+    def getraw(self, key: str, default=None):
+        """
+        Method that returns the stored value for the provided key without decoding it: a tuple (start, end) for unmodified objects or the string value otherwise.
+        """
+        return self.rawdict.get(key, default)
+
+    def setraw(self, key: str, value) -> None:
+        """
+        Method that stores the provided value for the provided key as such, e.g. a tuple (start, end) of byte offsets within the memory-mapped file content.
+        """
+        self.rawdict[key]=value
+
+    def __getitem__(self, key: str) -> str:
+        value=self.rawdict[key]
+        if isinstance(value, tuple):
+            return fdf_annotations.decodesource(self.buffer, value[0], value[1])
+        return value
+
+    def __setitem__(self, key: str, value: str) -> None:
+        self.rawdict[key]=value
+
+    def __delitem__(self, key: str) -> None:
+        del self.rawdict[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.rawdict
+
+    def __iter__(self):
+        return iter(self.rawdict)
+
+    def __len__(self) -> int:
+        return len(self.rawdict)
+
+    def clear(self) -> None:
+        """
+        Method that removes all keys without decoding their values (the MutableMapping implementation pops each value through __getitem__).
+        """
+        self.rawdict.clear()
+
+    def pop(self, key: str, *default):
+        """
+        Method that removes the provided key and returns its (decoded) value, or the provided default if the key is not present.
+        """
+        if key not in self.rawdict:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value=self[key]
+        del self.rawdict[key]
+        return value
+
+    def popitem(self) -> tuple:
+        """
+        Method that removes the last inserted key and returns it together with its (decoded) value.
+        """
+        key=next(reversed(self.rawdict))
+        return key, self.pop(key)
+
+
+class fdf_session:
+    """
+    Class that holds multiple fdf_annotations objects loaded within the same process, e.g. to reformat all aCRFs of a submission package in a single (long-running) process.
+    
+    Each loaded FDF is stored under a key (by default the path of the FDF file) and can be released individually using the release method, or all at once using close (or by leaving a with block).
+    Releasing a document empties all its lists and dictionaries, so its memory is returned immediately and does not accumulate over the documents processed.
+    The optional maxdocuments argument limits the number of documents held at once: when loading a new document beyond that limit, the document that was loaded first is released.
+    """
+
+    def __init__(self, maxdocuments: int =0) -> None:
+        """
+        Method to create an empty session.
+
+        Input: maxdocuments (int): maximum number of documents to be held at once. A value of 0 (default) means no limit is applied.
+        Return: None.
+        """
+        self.maxdocuments=maxdocuments
+        self.documents={}        #key -> fdf_annotations object, in the order the documents were loaded
+
+    def load(self, inputfdfpath: str, key: str =None, use_mmap: str ="N") -> fdf_annotations:
+        """
+        Method that loads the provided FDF file into a new fdf_annotations object that is held by the session.
+        If a document was already loaded under the same key, that document is released first.
+
+        Input:
+            inputfdfpath (str): string containing the path to an fdf file that is to be loaded.
+            key (str): optional key under which the document is to be stored. Default is the provided inputfdfpath.
+            use_mmap = "Y"|"N": optional parameter to memory-map the file instead of reading it into memory (see fdf_annotations.__init__). Default is set to "N".
+        Return: fdf_annotations object containing the provided FDF file contents.
+        """
+        if key is None:
+            key=inputfdfpath
+        if key in self.documents:
+            self.release(key)
+        if self.maxdocuments > 0:
+            while len(self.documents) >= self.maxdocuments:
+                self.release(next(iter(self.documents)))
+        self.documents[key]=fdf_annotations(inputfdfpath, use_mmap)
+        return self.documents[key]
+
+    def release(self, key: str) -> None:
+        """
+        Method that releases the document stored under the provided key: its contents are emptied and it's no longer held by the session.
+
+        Input: key (str): key of the document to be released.
+        Return: None.
+        """
+        if key in self.documents:
+            self.documents.pop(key).release()
+        else:
+            diagnostics.report("missingobject", f"No document loaded within the session for the provided key {key}.")
+
+    def close(self) -> None:
+        """
+        Method that releases all documents held by the session.
+
+        Input: None.
+        Return: None.
+        """
+        for key in list(self.documents):
+            self.release(key)
+
+    def __enter__(self):
+        """
+        Method that allows to use the session as context manager: all documents are released when leaving the with block.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Method that calls the close method when leaving the with block.
+        """
+        self.close()
+
+    def __getitem__(self, key: str) -> fdf_annotations:
+        """
+        Method that returns the document stored under the provided key.
+        """
+        return self.documents[key]
+
+    def __contains__(self, key: str) -> bool:
+        """
+        Method that returns True if a document is stored under the provided key.
+        """
+        return key in self.documents
+
+    def __iter__(self):
+        """
+        Iterate over the keys of the documents held by the session, in the order they were loaded.
+        """
+        return iter(self.documents)
+
+    def __len__(self) -> int:
+        """
+        Method that returns the number of documents held by the session.
+        """
+        return len(self.documents)
+
+
+class fdf_styleengine:
+    """
+    Class that compiles a style profile (see msgv2styleprofile) into a single transform per annotation: the profile is processed once when the engine is created,
+    after which each annotation containing a /Contents attribute is parsed once, all its formatted attribute values (/RC, /DS, /DA, /C, /CA) are determined 
+    and the annotation value is rebuilt once. The result is identical to formatting the annotation via the individual getters and setters (see method fdf_annotations.styleannotation).
+    The background colors are assigned per page in the order they're encountered, so the engine can also be used as transform for method fdf_annotations.streamfdf.
+
+    Most /RC values of a CRF only differ by their text, so the /RC values are normalised as template: the text between the tags is replaced by a placeholder, 
+    the template is normalised (see method fdf_annotations.normalizerc) and the text is inserted again. Normalised templates are kept in a bounded LRU cache, 
+    so the xml of a repeated /RC template is only processed once (see method cacheinfo for the number of hits and misses).
+    Messages reported while normalising a template are kept with the cached template and reported again each time the template is used.
+    The /DS and /DA values written are constant per qualification as domain header, and the /C values are converted once per distinct value.
+    """
+
+    def __init__(self, styleprofile: dict =msgv2styleprofile, cachesize: int =4096) -> None:
+        """
+        Method that compiles the provided style profile.
+
+        Input: 
+            styleprofile (dict): style profile to be applied (e.g. as loaded by fdf_annotations.loadstyleprofile). Default is msgv2styleprofile.
+            cachesize (int): maximal number of normalised /RC templates kept. Default is 4096. 0 disables the cache.
+        Return: None.
+        """
+        self.styleprofile=styleprofile
+        self.headerpattern=headerV1pattern if styleprofile["headerrule"]=="MSGV1" else headerV2pattern
+        self.masterstyle=dict(styleprofile["rcstyle"])
+        self.masterstylestring=fdf_annotations.dict_to_string(self.masterstyle, ':', ';')
+        self.styles={}      #(rcspan, ds, da) per qualification as domain header (True) or not (False)
+        for isheader, style in ((True, styleprofile["header"]), (False, styleprofile["variable"])):
+            self.styles[isheader]=(tuple(style["rcspan"]) if style["rcspan"] else None, style["ds"], style["da"])
+        self.backgroundcolororder=list(styleprofile["backgroundcolororder"])
+        self.opacity=styleprofile.get("opacity", "keep")
+        self.color_dict=defaultdict(dict)   #background color replacements per page, populated in the order encountered
+        self.fraccolor_dict={}              #/C value of the profile (fraction notation) per /C value encountered
+        self.intcolor_dict={}               #integer rgb notation per /C value encountered (see method fdf_annotations.rgb_fractoint)
+        self.rctemplatecache=functools.lru_cache(maxsize=cachesize)(lambda rctemplate, isheader: diagnostics.capture(self.splitrctemplate, rctemplate, isheader))     #(normalised /RC template parts, events reported) per (/RC template, isheader)
+        self.deferredcolor=None             #(page, integer rgb /C value, span of the /C value) of the last annotation transformed with defercolor="Y"
+
+    def reset(self) -> None:
+        """
+        Method that forgets the background colors encountered so far, so the engine can be applied to another document.
+
+        Input: None.
+        Return: None.
+        """
+        self.color_dict=defaultdict(dict)
+
+    def stylerc(self, rcstring: str, isheader: bool) -> str:
+        """
+        Method that returns the formatted /RC value for the provided /RC value, as obtained by methods removercreturns, rc_dropspans, getrcstyles, rcstyles_setmasterstyle,
+        rcstyles_to_rccontentstring, rc_insertspan (domain headers only) and addrcreturns.
+        The text between the tags is replaced by a placeholder, so that the normalised template is computed once per distinct markup (see method splitrctemplate).
+
+        Input: 
+            rcstring (str): /RC value of the annotation.
+            isheader (bool): True if the annotation qualifies as domain header.
+        Return: (str) formatted /RC value.
+        """
+        rcparts=rctextpattern.split(rcstring)        #alternately template parts (without the > and < surrounding the text) and text
+        texts=[rcreturnpattern.sub('', text) for text in rcparts[1::2]]        #line splits in the template parts are removed by method normalizerc
+        if rctextunsafepattern.search("".join(texts)) is None:
+            normalizedparts, events=self.rctemplatecache(">\x00<".join(rcparts[0::2]), isheader)
+            if normalizedparts is not None and len(normalizedparts)==len(texts)+1:
+                diagnostics.replay(events)
+                pieces=[normalizedparts[0]]
+                for text, normalizedpart in zip(texts, normalizedparts[1:]):
+                    pieces.append(text)
+                    pieces.append(normalizedpart)
+                return fdf_annotations.addrcreturns("".join(pieces))
+        return fdf_annotations.addrcreturns(self.normalizerctemplate(rcstring, isheader))
+
+    def normalizerctemplate(self, rctemplate: str, isheader: bool) -> str:
+        """
+        Method that normalises the provided /RC value or template (see method fdf_annotations.normalizerc) using the rcstyle and rcspan of the profile.
+
+        Input: 
+            rctemplate (str): /RC value or template, without line splits.
+            isheader (bool): True if the annotation qualifies as domain header.
+        Return: (str) normalised /RC value or template.
+        """
+        rcspan=self.styles[isheader][0]
+        return fdf_annotations.normalizerc(rctemplate, self.masterstyle, *(rcspan if rcspan else (None, None)), self.masterstylestring)
+
+    def splitrctemplate(self, rctemplate: str, isheader: bool) -> tuple:
+        """
+        Method that returns the parts of the normalised /RC template found between the text placeholders (see method stylerc).
+        None is returned if the template can not be normalised apart from its text.
+
+        Input: 
+            rctemplate (str): /RC template, with text placeholders.
+            isheader (bool): True if the annotation qualifies as domain header.
+        Return: (tuple) normalised template parts, or None.
+        """
+        if rctemplateunsafepattern.search(rctemplate):
+            return None
+        return tuple(self.normalizerctemplate(rctemplate, isheader).split("\x00"))
+
+    def cacheinfo(self):
+        """
+        Method that returns the statistics of the /RC template cache: named tuple (hits, misses, maxsize, currsize) as returned by functools.lru_cache.
+
+        Input: None.
+        Return: functools._CacheInfo named tuple.
+        """
+        return self.rctemplatecache.cache_info()
+
+    def transform(self, annotstring: str, objectid: str ="") -> str:
+        """
+        Method that returns the formatted annotation value for the provided annotation value. None is returned if the annotation has no /Contents attribute.
+
+        Input: 
+            annotstring (str): annotation value as stored in fdf_dict.
+            objectid (str): optional object identifier of the annotation, only used within printed messages.
+        Return: (str) formatted annotation value, or None.
+        """
+        return self.transformrecord(fdf_annotationrecord(annotstring), objectid)
+
+    def transformrecord(self, record, objectid: str ="", defercolor: str ="N") -> str:
+        """
+        Method that returns the formatted annotation value for the provided fdf_annotationrecord (see method transform).
+        With defercolor="Y" the /C value is kept as is, as its replacement depends on the colors used on the page within other shards (see function styleshard): 
+        deferredcolor is then set to (page, integer rgb /C value, span of the /C value within the formatted value), or None if the annotation has no page attribute or no /C attribute.
+
+        Input: 
+            record (fdf_annotationrecord): parsed annotation value.
+            objectid (str): optional object identifier of the annotation, only used within printed messages.
+            defercolor = "Y"|"N": optional parameter to keep the /C value instead of replacing it by the background color of the page. Default is set to "N".
+        Return: (str) formatted annotation value, or None.
+        """
+        if record.contents is None:
+            return None
+        if record.buffer is not None:       #spans of memory-mapped records are byte offsets: locate the attribute values within the decoded value instead
+            record=fdf_annotationrecord(fdf_annotations.decodesource(record.buffer, record.text[0], record.text[1]))
+        contents=record.getvalue("contents")
+        isheader=contents is not None and self.headerpattern.search(contents) is not None
+        rcspan, ds, da=self.styles[isheader]
+        replacements=[]         #(span, value) of all attribute values to be replaced
+        for attribute, value in (("rc", None), ("da", da), ("ds", ds)):
+            span=getattr(record, attribute)
+            if span is None:
+                diagnostics.report("missingattribute", f"No /{attribute.upper()} opening tag found in provided object {objectid}.")
+            elif span[1] is None:
+                diagnostics.report("malformedvalue", f"No /{attribute.upper()} closing parenthesis found for provided object {objectid}.")
+            else:
+                replacements.append((span, self.stylerc(record.getvalue("rc"), isheader) if value is None else value))
+        if self.opacity=="drop" and record.catag is not None:
+            replacements.append((record.catag, ""))
+        elif self.opacity!="keep" and record.ca is not None:
+            replacements.append((record.ca, self.opacity))
+        self.deferredcolor=None
+        page=int(record.getvalue("page")) if record.page is not None else None
+        if defercolor=="Y":
+            if page is None or record.c is None:
+                diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no page attribute or no /C attribute.")
+            else:
+                fraccolor=record.getvalue("c")
+                self.deferredcolor=(page, self.intcolor_dict.get(fraccolor) or self.intcolor_dict.setdefault(fraccolor, fdf_annotations.rgb_fractoint(fraccolor)), None)
+                replacements.append((record.c, fraccolor))      #kept as is, only to locate the /C value within the formatted value
+        else:
+            pagecolor=self.pagecolor(page, record.getvalue("c"))
+            if pagecolor is None:
+                diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) has no page attribute or no /C attribute.")
+            else:
+                replacements.append((record.c, self.fraccolor_dict.get(pagecolor) or self.fraccolor_dict.setdefault(pagecolor, fdf_annotations.rgb_c_inttofrac(pagecolor))))
+
+        #rebuild the annotation value once, replacing all spans in order of appearance
+        text=record.text
+        replacements.sort()
+        pieces=[]
+        position=0
+        length=0
+        for (start, end), value in replacements:
+            if start < position:        #overlapping attribute values: fall back to replacing the values one by one
+                text=self.transformsequential(text, replacements)
+                if self.deferredcolor is not None:
+                    self.deferredcolor=self.deferredcolor[:2]+(fdf_annotationrecord(text).c,)
+                return text
+            pieces.append(text[position:start])
+            length+=start-position
+            if self.deferredcolor is not None and (start, end)==record.c:
+                self.deferredcolor=self.deferredcolor[:2]+((length, length+len(value)),)
+            pieces.append(value)
+            length+=len(value)
+            position=end
+        pieces.append(text[position:])
+        return "".join(pieces)
+
+    def pagecolor(self, page: int, fraccolor: str) -> str:
+        """
+        Method that returns the background color of the profile replacing the provided /C value on the provided page, i.e. according to the order the /C values are encountered on the page.
+        The /C value is registered as encountered on the page, so calling this method for an annotation that is not transformed (see fdf_annotations.applystyleprofileincremental) keeps the colors of the next annotations identical.
+
+        Input: 
+            page (int): page of the annotation (/Page value).
+            fraccolor (str): /C value of the annotation.
+        Return: (str) background color in integer rgb notation, or None if no page or /C value is provided.
+        """
+        if page is None or fraccolor is None:
+            return None
+        intcolor=self.intcolor_dict.get(fraccolor) or self.intcolor_dict.setdefault(fraccolor, fdf_annotations.rgb_fractoint(fraccolor))
+        pagecolors=self.color_dict[page]
+        if intcolor not in pagecolors:
+            pagecolors[intcolor]=self.backgroundcolororder[len(pagecolors)]
+        return pagecolors[intcolor]
+
+    @staticmethod
+    def transformsequential(text: str, replacements: list) -> str:
+        """
+        Method that applies the provided replacements one by one on a new record of the provided annotation value, as done by the individual setters.
+        Only used in case attribute values overlap (see method transformrecord).
+
+        Input:
+            text (str): annotation value.
+            replacements (list): (span, value) of the attribute values to be replaced.
+        Return: (str) formatted annotation value.
+        """
+        record=fdf_annotationrecord(text)
+        for span, value in replacements:
+            for attribute in fdf_annotationrecord.spanattributes:
+                if getattr(record, attribute)==span:
+                    record.setvalue(attribute, value)
+                    break
+        return record.text
+
+    def apply(self, annots: fdf_annotations) -> int:
+        """
+        Method that formats all annotations containing a /Contents attribute within the provided document. The background colors encountered so far are forgotten first (see method reset).
+
+        Input: annots (fdf_annotations): document to be formatted.
+        Return: (int) number of formatted annotations.
+        """
+        self.reset()
+        count=0
+        for objectid in annots:
+            if self(annots, objectid):
+                count+=1
+        return count
+
+    def __call__(self, annots: fdf_annotations, objectid: str) -> bool:
+        """
+        Method that formats the provided annotation within the provided document, so the engine can be used as transform within method fdf_annotations.streamfdf.
+        Returns True if the annotation was formatted, False if it has no /Contents attribute.
+        """
+        if objectid not in annots.fdf_dict:
+            return False
+        if isinstance(annots.getrawannotation(objectid), tuple) and objectid not in annots.record_dict:      #unmodified memory-mapped object: only parse the decoded value
+            annotstring=self.transform(annots.fdf_dict[objectid], objectid)
+        else:
+            annotstring=self.transformrecord(annots.getrecord(objectid), objectid)
+        if annotstring is None:
+            return False
+        annots.record_dict.pop(objectid, None)
+        annots.setannotation(objectid, annotstring)
+        return True
+
+
+class fdf_layoutengine:
+    """
+    Class that moves overlapping annotation boxes to the nearest free position on their page (see method fdf_annotations.resolveoverlaps).
+
+    Per page, the annotations that don't need to move (i.e. all annotations except the last one in ordered_fdf_key of each overlapping pair) are added to a spatial index (see class fdf_spatialindex) first.
+    The annotations to be moved are then placed one by one (in ordered_fdf_key order) and added to the spatial index once placed, so later annotations avoid them as well.
+    Free positions are searched best-first by distance from the original position: when a position collides, new positions are derived from the edges of the colliding boxes
+    (left of, right of, below and above each of them, at gap points distance), so the box ends up next to the boxes it collided with rather than at a fixed step.
+    Positions outside the page bounds or further than maxdistance from the original position are not considered.
+    """
+
+    def __init__(self, pagebox: tuple =(0.0, 0.0, 612.0, 792.0), gap: float =2.0, maxdistance: float =300.0, maxtries: int =500) -> None:
+        """
+        Method that creates the layout engine.
+
+        Input:
+            pagebox (tuple): (x1, y1, x2, y2) page bounds in points. Default is a US letter page.
+            gap (float): minimal distance in points between a moved box and the other boxes. Default is 2.0.
+            maxdistance (float): maximal distance in points a box is moved. Default is 300.0.
+            maxtries (int): maximal number of positions tried per box. Default is 500.
+        Return: None.
+        """
+        self.pagebox=tuple(float(value) for value in pagebox)
+        self.gap=float(gap)
+        self.maxdistance=float(maxdistance)
+        self.maxtries=maxtries
+
+    def inbounds(self, rect: tuple) -> bool:
+        """
+        Method that returns True if the provided box (x1, y1, x2, y2) lies within the page bounds.
+        """
+        return rect[0]>=self.pagebox[0] and rect[1]>=self.pagebox[1] and rect[2]<=self.pagebox[2] and rect[3]<=self.pagebox[3]
+
+    def place(self, spatialindex, page: int, rect: tuple) -> tuple:
+        """
+        Method that returns the free position nearest to the provided box on the provided page, i.e. a box of the same size not within gap points of any box of the spatial index.
+
+        Input:
+            spatialindex (fdf_spatialindex): boxes already placed.
+            page (int): zero-based page number.
+            rect (tuple): (x1, y1, x2, y2) original box.
+        Return: (tuple) (x1, y1, x2, y2) free box. None is returned if no free position was found.
+        """
+        x1, y1, x2, y2=rect
+        width, height=x2-x1, y2-y1
+        candidates=[(0.0, 0, x1, y1)]       #(distance from original position, order of creation, x1, y1)
+        visited={(round(x1, 3), round(y1, 3))}
+        tries=0
+        while candidates and tries<self.maxtries:
+            distance, order, cx, cy=heapq.heappop(candidates)
+            candidate=(cx, cy, cx+width, cy+height)
+            tries+=1
+            colliding=spatialindex.query(page, candidate, self.gap)
+            if not colliding:
+                if self.inbounds(candidate):
+                    return candidate
+                continue
+            for objectid in colliding:
+                ox1, oy1, ox2, oy2=spatialindex.box_dict[objectid][1]
+                for nx, ny in ((ox1-self.gap-width, cy), (ox2+self.gap, cy), (cx, oy1-self.gap-height), (cx, oy2+self.gap)):
+                    key=(round(nx, 3), round(ny, 3))
+                    if key in visited:
+                        continue
+                    visited.add(key)
+                    ndistance=((nx-x1)**2+(ny-y1)**2)**0.5
+                    if ndistance<=self.maxdistance and self.inbounds((nx, ny, nx+width, ny+height)):
+                        heapq.heappush(candidates, (ndistance, len(visited), nx, ny))
+        return None
+
+    def apply(self, annots: fdf_annotations, page: int =None, subtype: str ="FreeText") -> dict:
+        """
+        Method that moves the overlapping annotations of the provided fdf_annotations object (see method fdf_annotations.resolveoverlaps).
+
+        Input:
+            annots (fdf_annotations): object containing the annotations.
+            page (int): optional zero-based page number to be processed. Default: all pages.
+            subtype (str): annotation subtype to be processed, or None for all annotations.
+        Return: (dict) {"moved": object identifiers moved, "unresolved": object identifiers for which no free position was found}.
+        """
+        overlaps=annots.find_overlaps(page, subtype)
+        movers_dict={}      #page -> object identifiers to be moved, in ordered_fdf_key order
+        for overlappage, objectid1, objectid2 in overlaps:
+            movers_dict.setdefault(overlappage, {})[objectid2]=None
+        spatialindex=annots.getspatialindex()
+        included=set(annots.select(subtype=subtype)) if subtype is not None else None
+        lastposition=len(annots.ordered_fdf_key)
+        result={"moved": [], "unresolved": []}
+        for overlappage, movers in movers_dict.items():
+            placed=fdf_spatialindex(spatialindex.cellsize)
+            for (column, row), objectids in spatialindex.cell_dict.get(overlappage, {}).items():
+                for objectid in objectids:
+                    if objectid not in movers and (included is None or objectid in included) and objectid not in placed.box_dict:
+                        placed.insert(objectid, overlappage, spatialindex.box_dict[objectid][1])
+            for objectid in sorted(movers, key=lambda objectid: annots.position_dict.get(objectid, lastposition)):
+                rect=spatialindex.box_dict[objectid][1]
+                newrect=self.place(placed, overlappage, rect)
+                if newrect is None:
+                    result["unresolved"].append(objectid)
+                    placed.insert(objectid, overlappage, rect)
+                    continue
+                placed.insert(objectid, overlappage, newrect)
+                if newrect!=rect:
+                    annots.setrect(objectid, "[" + " ".join(fdf_annotationtable.formatnumber(value) for value in newrect) + "]")
+                    result["moved"].append(objectid)
+        return result
+
+
+def styleshard(payload: bytes, spans: list, styleprofile: dict, quiet: str ="N") -> tuple:
+    """
+    Function that formats /RC, /DS and /DA of the annotations containing a /Contents attribute within a shard, according to the provided style profile (see fdf_annotations.applystyleprofile). 
+    This function is run within worker processes. The annotations are formatted by class fdf_styleengine, as done within the current process when no shards are used, except for the background color: 
+    it's returned instead of replaced, as its replacement depends on the colors used on the page within the other shards (see method fdf_styleengine.transformrecord, parameter defercolor).
+
+    Input:
+        payload (bytes): windows-1252 encoded object values of the shard.
+        spans (list): (object identifier, start, end, raw) per object within payload, where raw="Y" indicates undecoded file content (new line sequences still to be translated).
+        styleprofile (dict): style profile to be applied.
+        quiet = "Y"|"N": quiet mode of the diagnostics within the worker process (see class fdf_diagnostics). Default is set to "N".
+    Return: (tuple) windows-1252 encoded formatted annotation values, 
+            list of (object identifier, length of the value within the encoded values, page, integer rgb background color, span of the /C value) per formatted annotation 
+            (page, color and span are None if the annotation has no page attribute or no /C attribute),
+            number of diagnostic events per event type reported while formatting the shard.
+    """
+
+    diagnostics.quiet=quiet
+    countsbefore=diagnostics.counts()
+    engine=fdf_styleengine(styleprofile)
+    pieces=[]
+    formatted=[]
+    for key, start, end, raw in spans:
+        annotstring=fdf_annotations.decodesource(payload, start, end) if raw=="Y" else str(payload[start:end], 'windows-1252')
+        annotstring=engine.transformrecord(fdf_annotationrecord(annotstring), key, defercolor="Y")
+        if annotstring is None:
+            continue
+        piece=annotstring.encode('windows-1252')
+        pieces.append(piece)
+        formatted.append((key, len(piece))+(engine.deferredcolor or (None, None, None)))
+    return b"".join(pieces), formatted, dict(diagnostics.counts()-countsbefore)
+
+
+def formatfdffile(inputfdfpath: str, outputfdfpath: str, styleprofile: dict, use_mmap: str ="N", shards: int =1, workers: int =None, quiet: str =None, timing: str ="N", memory: str ="N", manifestpath: str =None) -> dict:
+    """
+    Function that loads the provided FDF file, applies the provided style profile (see fdf_annotations.applystyleprofile) and exports it to the provided output path.
+    This function is run within the worker processes of batchformat. Errors are not raised but returned within the result.
+
+    Input:
+        inputfdfpath (str): path of the fdf file to be formatted.
+        outputfdfpath (str): path of the fdf file to be created. Missing directories are created.
+        styleprofile (dict): style profile to be applied.
+        use_mmap = "Y"|"N": optional parameter to memory-map the input file (see fdf_annotations.__init__). Default is set to "N".
+        shards (int), workers (int): optional parameters to format the annotations of the file in worker processes (see fdf_annotations.applystyleprofile). Default is 1 shard (no worker processes used).
+        quiet = "Y"|"N": optional parameter setting the quiet mode of the diagnostics (see class fdf_diagnostics). Default (None) keeps the current mode.
+        timing = "Y"|"N": optional parameter to record the time and calls per phase (see class fdf_profiler). Default is set to "N".
+        memory = "Y"|"N": optional parameter to record the peak memory per phase as well (tracemalloc, which slows down the run). Default is set to "N".
+        manifestpath (str): optional path of the json manifest of the previous run: only new or changed annotations are formatted, the others are carried forward from the 
+            existing output fdf file (see fdf_annotations.applystyleprofileincremental, shards are not used). The manifest is (re)written upon success.
+    Return: (dict) containing inputfdfpath, outputfdfpath, objects (number of objects), bytes (input file size), seconds, error (None if successful),
+            diagnostics (number of diagnostic events per event type reported for the file), if timing="Y" phases (measurement per phase) and, if a manifestpath is provided, 
+            new, changed and carried (number of annotations per outcome).
+    """
+
+    result={"inputfdfpath": inputfdfpath, "outputfdfpath": outputfdfpath, "objects": 0, "bytes": os.path.getsize(inputfdfpath), "seconds": 0.0, "error": None, "diagnostics": {}}
+    if quiet is not None:
+        diagnostics.quiet=quiet
+    countsbefore=diagnostics.counts()
+    profiler=fdf_profiler(memory, methods="N") if "Y" in (timing, memory) else None
+    starttime=time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(outputfdfpath) or ".", exist_ok=True)
+        with fdf_annotations(inputfdfpath, use_mmap, profiler) as annots:
+            if manifestpath is None:
+                annots.applystyleprofile(styleprofile, shards, workers)
+            else:
+                manifest_dict={}
+                if os.path.exists(manifestpath) and os.path.exists(outputfdfpath):
+                    with open(manifestpath, "r", encoding='utf-8') as file:
+                        manifest_dict=json.load(file)
+                incremental=annots.applystyleprofileincremental(manifest_dict, outputfdfpath, styleprofile)
+                result.update({key: incremental[key] for key in ("new", "changed", "carried")})
+            annots.exportfdf(outputfdfpath)
+            result["objects"]=len(annots.ordered_fdf_key)
+            if manifestpath is not None:
+                with open(manifestpath+".tmp", "w", encoding='utf-8') as file:
+                    file.write(json.dumps(incremental["manifest"]))      #encoded at once, which is considerably faster than json.dump for large manifests
+                os.replace(manifestpath+".tmp", manifestpath)
+    except Exception as error:
+        result["error"]=f"{type(error).__name__}: {error}"
+    result["seconds"]=time.perf_counter()-starttime
+    result["diagnostics"]=dict(diagnostics.counts()-countsbefore)
+    if profiler is not None:
+        profiler.close()
+        result["phases"]=profiler.report()["phases"]
+    return result
+
+
+def batchformat(inputdir: str, outputdir: str, styleprofile: dict =msgv2styleprofile, workers: int =None, use_mmap: str ="N", quiet: str ="N", timing: str ="N", memory: str ="N", incremental: str ="N") -> list:
+    """
+    Function that formats all fdf files found within the provided input directory (including subdirectories) in parallel worker processes.
+    Each formatted file is written to the same relative location within the provided output directory.
+
+    Input:
+        inputdir (str): directory to be searched for fdf files (extension .fdf, case insensitive).
+        outputdir (str): directory where the formatted fdf files are to be written.
+        styleprofile (dict): style profile to be applied. Default is msgv2styleprofile.
+        workers (int): number of worker processes. Default (None) is the number of processors.
+        use_mmap = "Y"|"N": optional parameter to memory-map the input files (see fdf_annotations.__init__). Default is set to "N".
+        quiet = "Y"|"N": optional parameter to only count the diagnostic messages within the worker processes instead of printing them (see class fdf_diagnostics). Default is set to "N".
+        timing = "Y"|"N", memory = "Y"|"N": optional parameters to record the time, calls and peak memory per phase of each file (see formatfdffile). Default is set to "N".
+        incremental = "Y"|"N": optional parameter to only format the annotations that are new or changed since the previous run, using the manifest written next to each 
+            output file (output path followed by .manifest.json, see formatfdffile). Default is set to "N".
+    Return: (list) result dictionary per file as returned by formatfdffile, in the order the files were found.
+    """
+
+    inputfdfpaths=[]
+    for dirpath, dirnames, filenames in os.walk(inputdir):
+        dirnames.sort()
+        inputfdfpaths.extend(os.path.join(dirpath, filename) for filename in sorted(filenames) if filename.lower().endswith(".fdf"))
+    outputfdfpaths=[os.path.join(outputdir, os.path.relpath(path, inputdir)) for path in inputfdfpaths]
+    if not inputfdfpaths:
+        return []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(formatfdffile, inputfdfpaths, outputfdfpaths, [styleprofile]*len(inputfdfpaths), [use_mmap]*len(inputfdfpaths),
+                                 [1]*len(inputfdfpaths), [None]*len(inputfdfpaths), [quiet]*len(inputfdfpaths), [timing]*len(inputfdfpaths), [memory]*len(inputfdfpaths),
+                                 [path+".manifest.json" if incremental=="Y" else None for path in outputfdfpaths]))
+
+
+def main(argv: list =None) -> int:
+    """
+    Command line entry point:
+        python -m fdf_annotations batch INPUTDIR OUTPUTDIR [--profile PROFILE] [--workers N] [--mmap] [--quiet] [--timing] [--memory] [--incremental] [--report REPORT]
+            formats all fdf files within INPUTDIR (see batchformat), one file per worker process.
+        python -m fdf_annotations format INPUTFDF OUTPUTFDF [--profile PROFILE] [--shards N] [--workers N] [--mmap] [--quiet] [--timing] [--memory] [--incremental] [--report REPORT]
+            formats a single (large) fdf file, splitting its annotations into shards formatted in worker processes (see fdf_annotations.applystyleprofile).
+    A summary is printed per file. With --quiet the diagnostic messages are counted instead of printed, and a diagnostics summary is printed at the end.
+    With --timing the time and calls per phase (load, index, transform, colormap, rebuild, write) are printed per file and written to the report, with --memory the peak memory per phase as well.
+    With --incremental only the annotations that are new or changed since the previous run are formatted, using the manifest written next to each output file (OUTPUTFDF.manifest.json).
+    The return code is 1 if any file failed.
+    """
+
+    commonparser=argparse.ArgumentParser(add_help=False)
+    commonparser.add_argument("--profile", help="json or toml file containing the style profile to apply (default: SDTM-MSG V2.0 profile)")
+    commonparser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of processors)")
+    commonparser.add_argument("--mmap", action="store_true", help="memory-map the input files")
+    commonparser.add_argument("--quiet", action="store_true", help="count the diagnostic messages instead of printing them, and print a summary at the end")
+    commonparser.add_argument("--timing", action="store_true", help="record the time and calls per phase of each file (see class fdf_profiler)")
+    commonparser.add_argument("--memory", action="store_true", help="record the peak memory per phase of each file as well (slows down the run)")
+    commonparser.add_argument("--incremental", action="store_true", help="only format the annotations new or changed since the previous run (manifest written next to each output file)")
+    commonparser.add_argument("--report", help="json file the per-file summary is written to")
+    parser=argparse.ArgumentParser(prog="python -m fdf_annotations", description="Format fdf annotation files exported from an SDTM acrf.pdf.")
+    subparsers=parser.add_subparsers(dest="command", required=True)
+    batchparser=subparsers.add_parser("batch", parents=[commonparser], help="format all fdf files found within a directory")
+    batchparser.add_argument("inputdir", help="directory to be searched for fdf files (including subdirectories)")
+    batchparser.add_argument("outputdir", help="directory where the formatted fdf files are written, mirroring the input directory")
+    formatparser=subparsers.add_parser("format", parents=[commonparser], help="format a single fdf file")
+    formatparser.add_argument("inputfdf", help="fdf file to be formatted")
+    formatparser.add_argument("outputfdf", help="formatted fdf file to be written")
+    formatparser.add_argument("--shards", type=int, default=1, help="number of shards the annotations are split into (default: 1, no worker processes)")
+    arguments=parser.parse_args(argv)
+
+    styleprofile=fdf_annotations.loadstyleprofile(arguments.profile) if arguments.profile else msgv2styleprofile
+    use_mmap="Y" if arguments.mmap else "N"
+    quiet="Y" if arguments.quiet else "N"
+    timing="Y" if arguments.timing else "N"
+    memory="Y" if arguments.memory else "N"
+    incremental="Y" if arguments.incremental else "N"
+    diagnostics.quiet=quiet
+    starttime=time.perf_counter()
+    if arguments.command=="batch":
+        results=batchformat(arguments.inputdir, arguments.outputdir, styleprofile, arguments.workers, use_mmap, quiet, timing, memory, incremental)
+        for result in results:          #events reported within the worker processes
+            diagnostics.merge(result["diagnostics"])
+    else:
+        results=[formatfdffile(arguments.inputfdf, arguments.outputfdf, styleprofile, use_mmap, arguments.shards, arguments.workers, timing=timing, memory=memory,
+                               manifestpath=arguments.outputfdf+".manifest.json" if incremental=="Y" else None)]
+    elapsed=time.perf_counter()-starttime
+
+    for result in results:
+        if result["error"]:
+            print(f"FAILED  {result['inputfdfpath']}: {result['error']}")
+        else:
+            seconds=max(result["seconds"], 1e-9)
+            print(f"OK      {result['inputfdfpath']}: {result['objects']} objects, {result['bytes']/1048576:.2f} MB in {result['seconds']:.3f} s "
+                  f"({result['objects']/seconds:.0f} objects/s, {result['bytes']/1048576/seconds:.2f} MB/s)")
+            if "carried" in result:
+                print(f"        {result['new']} new, {result['changed']} changed, {result['carried']} carried forward")
+            for phase, measurement in result.get("phases", {}).items():
+                print(f"        {phase:<10} {measurement['calls']:>4} calls {measurement['seconds']:.3f} s" + (f", peak {measurement['peakbytes']/1048576:.2f} MB" if memory=="Y" else ""))
+    failed=sum(1 for result in results if result["error"])
+    totalbytes=sum(result["bytes"] for result in results)
+    print(f"{len(results)} files processed ({failed} failed), {totalbytes/1048576:.2f} MB in {elapsed:.3f} s")
+    if arguments.quiet:
+        print(diagnostics.summary())
+    if arguments.report:
+        with open(arguments.report, "w", encoding='utf-8') as file:
+            json.dump({"seconds": elapsed, "files": results}, file, indent=2)
+    return 1 if failed else 0
+
 
-#additional methods to be added here
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
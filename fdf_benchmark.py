@@ -0,0 +1,499 @@
+# Synthetic FDF generator and benchmark harness for the fdf_annotations.py class
+#
+# Generate a synthetic fdf file:
+#   python fdf_benchmark.py generate OUTPUTFDF --annotations 100000 [--seed 1] [--html 0.1]
+# Run the benchmark (files are generated in a temporary directory) and compare with the baseline:
+#   python fdf_benchmark.py run [--sizes 1000 10000] [--html 0.1] [--baseline benchmark_baseline.json] [--threshold 1.5] [--update-baseline]
+# The run fails (return code 1) if a phase is slower than threshold x its baseline timing, also when measured again. The baseline records the interpreter and machine it was measured on (see environment):
+# regenerate it (--update-baseline) on the machine running the comparison, and whenever a change affects a measured phase.
+# Report the memory held after loading, formatting and indexing (tracemalloc), with the source lines holding most memory:
+#   python fdf_benchmark.py memory [--sizes 200000] [--top 10] [--workdir DIR]
+# Report the time per call of the accessors (object identifier conversion, has*/get* methods, color conversion), next to the regex reference implementation where one exists:
+#   python fdf_benchmark.py accessors [--annotations 1000] [--calls 100000]
+
+
+import re
+import os
+import io
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+import fdf_annotations as fdfa
+
+#domains used for the domain header annotations (XX (Label)) and their variables
+domains={
+    "DM": ("Demographics", ["SUBJID", "SITEID", "BRTHDTC", "AGE", "SEX", "RACE", "ETHNIC"]),
+    "DS": ("Disposition", ["DSSTDTC", "DSDECOD", "DSTERM=INFORMED CONSENT OBTAINED", "DSCAT=PROTOCOL MILESTONE"]),
+    "MH": ("Medical History", ["MHTERM", "MHSTDTC", "MHENDTC", "MHONGO", "MHCAT=GENERAL MEDICAL HISTORY"]),
+    "AE": ("Adverse Events", ["AETERM", "AESTDTC", "AEENDTC", "AESER", "AESEV", "AEREL", "AEOUT"]),
+    "CM": ("Concomitant Medications", ["CMTRT", "CMDOSE", "CMDOSU", "CMROUTE", "CMSTDTC", "CMENDTC"]),
+    "VS": ("Vital Signs", ["VSORRES when VSTESTCD=SYSBP", "VSORRES when VSTESTCD=DIABP", "VSORRESU", "VSDTC", "VSPOS"]),
+    "LB": ("Laboratory Test Results", ["LBORRES", "LBORRESU", "LBDTC", "LBSTAT", "LBREASND"]),
+    "EX": ("Exposure", ["EXTRT", "EXDOSE", "EXSTDTC", "EXENDTC"]),
+}
+backgroundcolors=["[0.75 0.666656 1.0]", "[1.0 0.75 0.0]", "[0.5 1.0 0.5]", "[1.0 1.0 0.0]", "[0.666656 1.0 1.0]"]
+fonts=[("Helv", "Helvetica", "18.0pt", "18"), ("Arial", "Arial", "12.0pt", "12"), ("HeBo", "Helvetica", "10.0pt", "10")]
+annotationsperpage=20
+xmlbodystring='<body xmlns="http://www.w3.org/1999/xhtml" xmlns:xfa="http://www.xfa.org/schema/xfa-data/1.0/" xfa:APIVersion="Acrobat:25.1.0" xfa:spec="2.0.2" style="font-size:12.0pt">'       #xml body tag replacing the html body tag of html /RC values (see fdf_annotations.rc_html_to_xml)
+
+
+def rcstring(text: str, fontfamily: str, fontsize: str, rnd: random.Random, html: float =0.1) -> str:
+    """
+    Function that returns a /RC value (xml or html, with or without span) for the provided annotation text, split in chunks of 255 characters as exported by Adobe.
+
+    Input:
+        text (str): text of the annotation (escaped as within the /Contents value).
+        fontfamily (str), fontsize (str): font family and size of the master style.
+        rnd (random.Random): random generator.
+        html (float): fraction of /RC values using the html: namespace prefix (converted to xml by the format phase, see formatexampleuse). Default is 0.1.
+    Return: (str) /RC value.
+    """
+    prefix="html:" if rnd.random() < html else ""       #html /RC values use the html: namespace prefix on all tags (the random draw is always made, so only the /RC values depend on html)
+    body=(f'<{prefix}body xmlns="http://www.w3.org/1999/xhtml" xmlns:xfa="http://www.xfa.org/schema/xfa-data/1.0/" xfa:APIVersion="Acrobat:25.1.0" xfa:spec="2.0.2"  '
+          f'style="font-size:{fontsize};text-align:left;color:#{rnd.choice(["F86464", "058A1B", "000000"])};font-weight:{rnd.choice(["normal", "bold"])};'
+          f'font-style:normal;font-family:{fontfamily},sans-serif;font-stretch:normal">')
+    if rnd.random() < 0.6:
+        paragraph=f'<{prefix}span style="color:#05891C;font-family:{fontfamily}">{text}</{prefix}span>'
+    else:
+        paragraph=text
+    xmldeclaration="" if prefix else '<?xml version="1.0"?>'
+    rc=f'{xmldeclaration}{body}<{prefix}p dir="ltr">{paragraph}</{prefix}p></{prefix}body>'
+    return fdfa.fdf_annotations.addrcreturns(rc)
+
+
+def annotationstring(number: int, text: str, page: int, rnd: random.Random, bsref: str ="", popupref: str ="", html: float =0.1) -> str:
+    """
+    Function that returns the value of a FreeText annotation object with the provided text, as exported by Adobe.
+
+    Input:
+        number (int): object number of the annotation, used to derive its /NM value.
+        text (str): text of the annotation.
+        page (int): zero-based page number of the annotation.
+        rnd (random.Random): random generator.
+        bsref (str), popupref (str): optional reference (e.g. "12 0 R") to a border style and popup subobject.
+        html (float): fraction of /RC values using the html: namespace prefix. Default is 0.1.
+    Return: (str) annotation value.
+    """
+    fontkey, fontfamily, fontsize, fontpt=rnd.choice(fonts)
+    x=round(rnd.uniform(40, 400), 4)
+    y=round(rnd.uniform(40, 740), 3)
+    ca=f"/CA {rnd.choice(['0.5', '0.75'])}" if rnd.random() < 0.02 else ""
+    minute=rnd.randint(10, 59)
+    return (f"<<{'/BS '+bsref if bsref else ''}/C{rnd.choice(backgroundcolors)}{ca}/Contents({text})/CreationDate(D:20251118221{minute}+01'00')"
+            f"/DA(0.9725 0.3922 0.3922 rg /{fontkey} {fontpt} Tf)/DS(font: {fontfamily},sans-serif {fontsize}; text-align:left; color:#F86464 )/F 4"
+            f"/M(D:20251118222{minute}+01'00')/NM({rnd.getrandbits(128):032x}-{number:08d})/Page {page}{'/Popup '+popupref if popupref else ''}"
+            f"/RC({rcstring(text, fontfamily, fontsize, rnd, html)})/Rect[{x} {y} {round(x+rnd.uniform(60, 300), 4)} {round(y+22.0098, 3)}]"
+            f"/Subj(Text Box)/Subtype/FreeText/T(dbaele)/Type/Annot>>\n")
+
+
+def generatefdf(outputfdfpath: str, annotations: int =1000, seed: int =1, html: float =0.1) -> int:
+    """
+    Function that writes a synthetic fdf file containing the provided number of FreeText annotations, mixing domain header and variable annotations,
+    xml and html /RC values, /BS subobjects (not referenced from the root catalog), /Popup subobjects (referenced from the root catalog and referring back via /Parent)
+    and text in between objects (interobj). The file is written while being generated, so large files do not need to be held in memory.
+
+    Input:
+        outputfdfpath (str): path of the fdf file to be created.
+        annotations (int): number of FreeText annotations. Default is 1000.
+        seed (int): seed of the random generator, the same seed always results in the same file. Default is 1.
+        html (float): fraction of /RC values using the html: namespace prefix, converted to xml by the format phase (see formatexampleuse). Default is 0.1.
+    Return: (int) number of objects written (excluding header and trailer).
+    """
+    rnd=random.Random(seed)
+    #plan object numbers: annotations and their popups are referenced from the root catalog, border styles are written after them
+    plan=[]
+    number=2
+    for i in range(annotations):
+        popup=number+1 if rnd.random() < 0.05 else None
+        plan.append((number, popup, rnd.random() < 0.08))
+        number=number+2 if popup else number+1
+    bsnumber=number
+    rootrefs=" ".join(f"{number} 0 R" + (f" {popup} 0 R" if popup else "") for number, popup, hasbs in plan)
+
+    objects=1
+    with open(outputfdfpath, "w", encoding="windows-1252", newline="\r") as file:
+        file.write("%FDF-1.2\n%\xe2\xe3\xcf\xd3\n")
+        file.write(f"1 0 obj\n<</FDF<</Annots[{rootrefs}]/F(/C/Users/dbaele/Downloads/synthetic_acrf.pdf)>>/Type/Catalog>>\nendobj\n")
+        domaincodes=list(domains)
+        domain=domaincodes[0]
+        bsrefs=[]
+        for i, (number, popup, hasbs) in enumerate(plan):
+            if i % 8 == 0:
+                domain=rnd.choice(domaincodes)
+                text=f"{domain} \\({domains[domain][0]}\\)"
+            else:
+                text=rnd.choice(domains[domain][1])
+            bsref=""
+            if hasbs:
+                bsref=f"{bsnumber+len(bsrefs)} 0 R"
+                bsrefs.append(bsref)
+            page=i // annotationsperpage
+            file.write(f"{number} 0 obj\n")
+            file.write(annotationstring(number, text, page, rnd, bsref, f"{popup} 0 R" if popup else "", html))
+            file.write("endobj\n")
+            objects+=1
+            if popup:
+                file.write(f"{popup} 0 obj\n<</F 28/Open false/Page {page}/Parent {number} 0 R/Rect[595.0 645.0 799.0 765.0]/Subtype/Popup/Type/Annot>>\nendobj\n")
+                objects+=1
+            if i % 500 == 250:
+                file.write("%interobject text\n")
+        for bsref in bsrefs:
+            file.write(f"{bsref[:-2]} obj\n<</D[2.0 2.0]/S/D>>\nendobj\n")
+            objects+=1
+        file.write("trailer\n<</Root 1 0 R>>\n%%EOF\n")
+    return objects
+
+
+def timephase(function, repeat: int) -> tuple:
+    """
+    Function that calls the provided function the provided number of times and returns the best timing together with the result of the last call.
+
+    Input:
+        function: function without arguments to be timed.
+        repeat (int): number of calls.
+    Return: (tuple) best timing in seconds, result of the last call.
+    """
+    best=None
+    for i in range(repeat):
+        starttime=time.perf_counter()
+        result=function()
+        seconds=time.perf_counter()-starttime
+        best=seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def formatexampleuse(annots) -> None:
+    """
+    Function that applies the formatting of Example_use.py on the provided fdf_annotations object, calling the getters and setters one by one.
+    Html /RC values are converted to xml first (rc_hashtml, rc_html_to_xml), as the /RC methods only process xml.
+
+    Input: annots (fdf_annotations): document to be formatted.
+    Return: None.
+    """
+    color_dict=annots.stylecolormap(fdfa.msgv2styleprofile)
+    for annot in annots:
+        if annots.hascontent(annot):
+            rcstring=annots.removercreturns(annots.getrccontent(annot))
+            if annots.rc_hashtml(rcstring):
+                annots.updaterccontent(annot, annots.rc_html_to_xml(rcstring, xmlbodystring))
+            annots.styleannotation(annot, fdfa.msgv2styleprofile, color_dict)
+
+
+def benchmarkfile(inputfdfpath: str, outputfdfpath: str, repeat: int =3, removals: int =100) -> dict:
+    """
+    Function that times the phases of processing the provided fdf file:
+    load (fdf_annotations.__init__), format (Example_use.py pipeline), remove (removeannotation of the provided number of annotations) and export (exportfdf).
+    Each phase is run on a freshly loaded document and the best timing of the provided number of repeats is kept.
+    The diagnostics are in quiet mode while timing, so printing the messages (e.g. subobjects removed together with an annotation) is not part of the timings.
+
+    Input:
+        inputfdfpath (str): path of the fdf file to be processed.
+        outputfdfpath (str): path the exported fdf file is written to.
+        repeat (int): number of repeats per phase. Default is 3.
+        removals (int): number of annotations removed within the remove phase. Default is 100.
+    Return: (dict) timing in seconds per phase.
+    """
+    timings={}
+    quiet=fdfa.diagnostics.quiet
+    fdfa.diagnostics.quiet="Y"
+    try:
+        timings["load"], annots=timephase(lambda: fdfa.fdf_annotations(inputfdfpath), repeat)
+
+        def formatphase():
+            annots=fdfa.fdf_annotations(inputfdfpath)
+            starttime=time.perf_counter()
+            formatexampleuse(annots)
+            return time.perf_counter()-starttime
+        timings["format"]=min(formatphase() for i in range(repeat))
+
+        def removephase():
+            annots=fdfa.fdf_annotations(inputfdfpath)
+            step=max(1, len(annots.root_key) // removals)
+            toremove=[objectid for objectid in annots.root_key[::step][:removals] if objectid.replace(" R", " obj") in annots.fdf_dict]
+            starttime=time.perf_counter()
+            for objectid in toremove:
+                annots.removeannotation(objectid)
+            return time.perf_counter()-starttime
+        timings["remove"]=min(removephase() for i in range(repeat))
+
+        formatexampleuse(annots)
+        timings["export"], result=timephase(lambda: annots.exportfdf(outputfdfpath), repeat)
+    finally:
+        fdfa.diagnostics.quiet=quiet
+    return timings
+
+
+def memoryfile(inputfdfpath: str, top: int =10) -> dict:
+    """
+    Function that measures with tracemalloc the memory held by the fdf_annotations object of the provided fdf file after each phase:
+    load (fdf_annotations.__init__), format (Example_use.py pipeline) and index (buildindexes, including the spatial index).
+
+    Input:
+        inputfdfpath (str): path of the fdf file to be processed.
+        top (int): number of source lines to be reported (the ones holding most memory after the last phase). Default is 10.
+    Return: (dict) memory in MB per phase, peak memory in MB (peak) and the top source lines as strings (top).
+    """
+    memory={}
+    tracemalloc.start()
+    try:
+        annots=fdfa.fdf_annotations(inputfdfpath)
+        memory["load"]=tracemalloc.get_traced_memory()[0]/1e6
+        formatexampleuse(annots)
+        memory["format"]=tracemalloc.get_traced_memory()[0]/1e6
+        annots.buildindexes()
+        annots.getspatialindex()
+        memory["index"], memory["peak"]=(value/1e6 for value in tracemalloc.get_traced_memory())
+        snapshot=tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        memory["top"]=[str(statistic) for statistic in snapshot.statistics("lineno")[:top]]
+    finally:
+        tracemalloc.stop()
+    return memory
+
+
+def referenceaccessors(annots) -> dict:
+    """
+    Function that returns the reference implementation of the accessors on the provided fdf_annotations object, as they were before the object keys were parsed by class fdf_objectkey
+    and the color patterns compiled at module level: the "\\d+ \\d+ R" spelling is rerouted by re.search with the inline objecttag2 pattern, toobjectid and toreference match objectkeypattern
+    and rgb_fractoint searches its inline pattern. Only used to time the accessors against (see accessorfile).
+
+    Input: annots (fdf_annotations): document the accessors are applied on.
+    Return: (dict) reference function per accessor name.
+    """
+    def reroute(objectid):
+        objecttag2match=re.search(r"^(\d+ \d+ )R$", objectid)
+        return objecttag2match.group(1)+"obj" if objecttag2match else objectid
+
+    def toobjectid(objectid):
+        objectkeymatch=fdfa.objectkeypattern.match(objectid)
+        return objectkeymatch.group(1)+"obj" if objectkeymatch else objectid
+
+    def toreference(objectid):
+        objectkeymatch=fdfa.objectkeypattern.match(objectid)
+        return objectkeymatch.group(1)+"R" if objectkeymatch else objectid
+
+    def hasattribute(objectid, attribute):
+        objectid=reroute(objectid)
+        if objectid in annots.fdf_dict:
+            return attribute(annots.getrecord(objectid))
+        fdfa.diagnostics.report("missingobject", f"The provided object (ID= {objectid}) was not part of the fdf_dict.")
+        return False
+
+    def hascontent(objectid):
+        return hasattribute(objectid, lambda record: record.contents is not None)
+
+    def hasc(objectid):
+        return hasattribute(objectid, lambda record: record.hasc)
+
+    def hasca(objectid):
+        return hasattribute(objectid, lambda record: record.hasca)
+
+    def qualifyasheaderMSGV2(objectid):
+        objectid=reroute(objectid)
+        if objectid in annots.fdf_dict and hascontent(objectid):
+            return fdfa.headerV2pattern.search(annots.getcontent(objectid)) is not None
+        fdfa.diagnostics.report("missingattribute", f"The provided object (ID= {objectid}) was not part of the fdf_dict list or didn't have a contents attribute.")
+        return False
+
+    def rgb_fractoint(rgbfraccolorstring):
+        fracrgbstrmatch=re.search(r"^\[([01](\.\d{1,6}){0,1})\s+([01](\.\d{1,6}){0,1})\s+([01](\.\d{1,6}){0,1})\]$", rgbfraccolorstring)
+        if fracrgbstrmatch:
+            return " ".join(str(int(round(float(fracrgbstrmatch.group(group))*255))) for group in (1, 3, 5))
+        return ""
+
+    return {"toobjectid": toobjectid, "toreference": toreference, "hascontent": hascontent, "hasc": hasc, "hasca": hasca, 
+            "qualifyasheaderMSGV2": qualifyasheaderMSGV2, "rgb_fractoint": rgb_fractoint}
+
+
+def accessorfile(inputfdfpath: str, calls: int =100000) -> dict:
+    """
+    Function that times the accessors of the fdf_annotations class on the annotations of the provided fdf file, each accessor being called the provided number of times
+    (cycling over the annotations, using the reference spelling "\\d+ \\d+ R" where the accessor accepts it). Messages printed by the accessors are discarded.
+    Accessors having a reference implementation (see referenceaccessors) are timed with the reference implementation as well, on the same arguments.
+
+    Input:
+        inputfdfpath (str): path of the fdf file to be processed.
+        calls (int): number of calls per accessor. Default is 100000.
+    Return: (dict) (time per call in microseconds, time per call of the reference implementation in microseconds or None) per accessor.
+    """
+    annots=fdfa.fdf_annotations(inputfdfpath)
+    objectids=[objectid for objectid in annots.ordered_fdf_key if objectid.endswith(" obj") and annots.getrecord(objectid).c is not None]
+    references=[annots.toreference(objectid) for objectid in objectids]
+    colors=[annots.getc(objectid) for objectid in objectids]
+    accessors={
+        "toobjectid": (annots.toobjectid, references),
+        "toreference": (annots.toreference, objectids),
+        "hascontent": (annots.hascontent, references),
+        "hasc": (annots.hasc, references),
+        "hasca": (annots.hasca, references),
+        "qualifyasheaderMSGV2": (annots.qualifyasheaderMSGV2, references),
+        "getc": (annots.getc, objectids),
+        "getpagenum": (annots.getpagenum, objectids),
+        "rgb_fractoint": (annots.rgb_fractoint, colors),
+    }
+    reference_dict=referenceaccessors(annots)
+
+    def timecalls(accessor, arguments):
+        starttime=time.perf_counter()
+        for argument in arguments:
+            accessor(argument)
+        return (time.perf_counter()-starttime)/calls*1e6
+
+    timings={}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, (accessor, arguments) in accessors.items():
+            arguments=(arguments*(calls//len(arguments)+1))[:calls]
+            timings[name]=(timecalls(accessor, arguments), timecalls(reference_dict[name], arguments) if name in reference_dict else None)
+    return timings
+
+
+def environment(html: float =0.1) -> dict:
+    """
+    Function that returns the interpreter, machine and synthetic file settings the benchmark is run with, as recorded within the baseline file.
+
+    Input: html (float): fraction of html /RC values within the synthetic files (see generatefdf). Default is 0.1.
+    Return: (dict) python implementation and version, platform, machine, number of cpus and html fraction.
+    """
+    return {"python": f"{platform.python_implementation()} {platform.python_version()}", "platform": platform.platform(), "machine": platform.machine(), 
+            "cpus": os.cpu_count(), "html": html}
+
+
+def compare(results: dict, baseline: dict, threshold: float, minimum: float =0.005) -> list:
+    """
+    Function that compares the provided benchmark results with the provided baseline and returns the regressions,
+    i.e. the phases that are slower than threshold x the baseline timing (timings below the provided minimum are not considered, as they're dominated by noise).
+
+    Input:
+        results (dict), baseline (dict): timing in seconds per phase per file size, as returned by runbenchmark.
+        threshold (float): allowed slowdown factor.
+        minimum (float): minimum timing in seconds to be considered. Default is 0.005.
+    Return: (list) message per regression.
+    """
+    regressions=[]
+    for size, timings in results.items():
+        for phase, seconds in timings.items():
+            baselineseconds=baseline.get(size, {}).get(phase)
+            if baselineseconds is None or seconds < minimum:
+                continue
+            if seconds > baselineseconds*threshold:
+                regressions.append(f"{size} annotations, {phase}: {seconds:.4f} s > {threshold} x baseline {baselineseconds:.4f} s")
+    return regressions
+
+
+def runbenchmark(sizes: list, repeat: int =3, workdir: str =None, html: float =0.1) -> dict:
+    """
+    Function that generates a synthetic fdf file per provided size (number of annotations) and benchmarks it (see benchmarkfile).
+
+    Input:
+        sizes (list): numbers of annotations.
+        repeat (int): number of repeats per phase. Default is 3.
+        workdir (str): directory where the synthetic files are written. Default is a temporary directory that is removed afterwards.
+        html (float): fraction of html /RC values within the synthetic files (see generatefdf). Default is 0.1.
+    Return: (dict) timing in seconds per phase per size (as string).
+    """
+    results={}
+    with tempfile.TemporaryDirectory() as tempdir:
+        workdir=workdir or tempdir
+        for size in sizes:
+            inputfdfpath=os.path.join(workdir, f"synthetic_{size}_html{html:g}.fdf")
+            if not os.path.exists(inputfdfpath):
+                generatefdf(inputfdfpath, size, html=html)
+            results[str(size)]=benchmarkfile(inputfdfpath, os.path.join(workdir, f"synthetic_{size}_formatted.fdf"), repeat)
+    return results
+
+
+def main(argv: list =None) -> int:
+    """
+    Command line entry point (see the top of this file).
+    """
+    parser=argparse.ArgumentParser(prog="python fdf_benchmark.py", description="Synthetic fdf generator and benchmark harness for fdf_annotations.py.")
+    subparsers=parser.add_subparsers(dest="command", required=True)
+    generateparser=subparsers.add_parser("generate", help="write a synthetic fdf file")
+    generateparser.add_argument("outputfdf", help="fdf file to be written")
+    generateparser.add_argument("--annotations", type=int, default=1000, help="number of FreeText annotations (default: 1000)")
+    generateparser.add_argument("--seed", type=int, default=1, help="seed of the random generator (default: 1)")
+    generateparser.add_argument("--html", type=float, default=0.1, help="fraction of /RC values using the html: namespace prefix (default: 0.1)")
+    runparser=subparsers.add_parser("run", help="benchmark synthetic fdf files and compare with the baseline")
+    runparser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="numbers of annotations to benchmark (default: 1000 10000)")
+    runparser.add_argument("--html", type=float, default=0.1, help="fraction of html /RC values within the synthetic files, converted to xml by the format phase (default: 0.1)")
+    runparser.add_argument("--repeat", type=int, default=3, help="number of repeats per phase, the best timing is kept (default: 3)")
+    runparser.add_argument("--baseline", default="benchmark_baseline.json", help="json baseline file (default: benchmark_baseline.json)")
+    runparser.add_argument("--threshold", type=float, default=1.5, help="allowed slowdown factor compared to the baseline (default: 1.5)")
+    runparser.add_argument("--update-baseline", action="store_true", help="write the results to the baseline file instead of comparing")
+    runparser.add_argument("--workdir", help="directory where the synthetic files are kept (default: temporary directory)")
+    accessorparser=subparsers.add_parser("accessors", help="report the time per call of the accessors on a synthetic fdf file, next to their regex reference implementation")
+    accessorparser.add_argument("--annotations", type=int, default=1000, help="number of FreeText annotations of the synthetic file (default: 1000)")
+    accessorparser.add_argument("--calls", type=int, default=100000, help="number of calls per accessor (default: 100000)")
+    memoryparser=subparsers.add_parser("memory", help="report the memory held after loading, formatting and indexing synthetic fdf files")
+    memoryparser.add_argument("--sizes", type=int, nargs="+", default=[200000], help="numbers of annotations to measure (default: 200000)")
+    memoryparser.add_argument("--top", type=int, default=10, help="number of source lines holding most memory to be reported (default: 10)")
+    memoryparser.add_argument("--workdir", help="directory where the synthetic files are kept (default: temporary directory)")
+    arguments=parser.parse_args(argv)
+
+    if arguments.command=="generate":
+        objects=generatefdf(arguments.outputfdf, arguments.annotations, arguments.seed, arguments.html)
+        print(f"{arguments.outputfdf}: {objects} objects written.")
+        return 0
+
+    if arguments.command=="accessors":
+        with tempfile.TemporaryDirectory() as tempdir:
+            inputfdfpath=os.path.join(tempdir, f"synthetic_{arguments.annotations}.fdf")
+            generatefdf(inputfdfpath, arguments.annotations)
+            for name, (microseconds, referencemicroseconds) in accessorfile(inputfdfpath, arguments.calls).items():
+                reference=f"   reference {referencemicroseconds:8.3f} us/call ({referencemicroseconds/microseconds:.1f} x)" if referencemicroseconds is not None else ""
+                print(f"{name:<22} {microseconds:8.3f} us/call{reference}")
+        return 0
+
+    if arguments.command=="memory":
+        with tempfile.TemporaryDirectory() as tempdir:
+            workdir=arguments.workdir or tempdir
+            for size in arguments.sizes:
+                inputfdfpath=os.path.join(workdir, f"synthetic_{size}.fdf")
+                if not os.path.exists(inputfdfpath):
+                    generatefdf(inputfdfpath, size)
+                memory=memoryfile(inputfdfpath, arguments.top)
+                print(f"{size:>8} annotations ({os.path.getsize(inputfdfpath)/1e6:.1f} MB file): " + ", ".join(f"{phase} {memory[phase]:.1f} MB" for phase in ("load", "format", "index", "peak")))
+                for line in memory["top"]:
+                    print(f"    {line}")
+        return 0
+
+    results=runbenchmark(arguments.sizes, arguments.repeat, arguments.workdir, arguments.html)
+    for size, timings in results.items():
+        print(f"{size:>8} annotations: " + ", ".join(f"{phase} {seconds*1000:.1f} ms" for phase, seconds in timings.items()))
+    runenvironment=environment(arguments.html)
+    if arguments.update_baseline or not os.path.exists(arguments.baseline):
+        baseline={}
+        if os.path.exists(arguments.baseline):
+            with open(arguments.baseline, "r", encoding="utf-8") as file:
+                baseline=json.load(file)
+        if baseline.get("environment")!=runenvironment:      #timings of another interpreter or machine are not kept
+            baseline={}
+        baseline["environment"]=runenvironment
+        baseline.update(results)
+        with open(arguments.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2)
+        print(f"Baseline written to {arguments.baseline}.")
+        return 0
+    with open(arguments.baseline, "r", encoding="utf-8") as file:
+        baseline=json.load(file)
+    if baseline.get("environment")!=runenvironment:
+        print(f"Note: the baseline was recorded with {baseline.get('environment', 'an unknown environment')}, this run uses {runenvironment}.")
+    #sizes with a regression are measured once more, keeping the best timing per phase, so a single noisy measurement does not fail the run
+    regressedsizes=[int(size) for size in results if compare({size: results[size]}, baseline, arguments.threshold)]
+    if regressedsizes:
+        for size, timings in runbenchmark(regressedsizes, arguments.repeat, arguments.workdir, arguments.html).items():
+            results[size]={phase: min(seconds, timings[phase]) for phase, seconds in results[size].items()}
+    regressions=compare(results, baseline, arguments.threshold)
+    for regression in regressions:
+        print(f"REGRESSION  {regression}")
+    print(f"{len(regressions)} regressions (threshold {arguments.threshold} x baseline).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
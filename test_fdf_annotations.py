@@ -0,0 +1,183 @@
+import os
+import re
+
+import pytest
+
+import fdf_annotations as fdf
+import fdf_benchmark
+
+
+dummyfdfpath=os.path.join(os.path.dirname(os.path.abspath(__file__)), "DUMMY_aCRF_PHUSE_EU_CONNECT_2025_unformatted.fdf")
+
+
+def writeincompletefdf(outputfdfpath):
+    """
+    Function that writes a copy of the dummy fdf file in which one annotation has no /C attribute and another one no /RC attribute.
+    """
+    annots=fdf.fdf_annotations(dummyfdfpath)
+    objectids=[objectid for objectid in annots.ordered_fdf_key[2:] if objectid.endswith(" obj") and annots.hascontent(objectid)]
+    annots.setannotation(objectids[1], re.sub(r"/C\[[^\]]*\]", "", annots.fdf_dict[objectids[1]], count=1))
+    record=fdf.fdf_annotationrecord(annots.fdf_dict[objectids[3]])
+    annots.setannotation(objectids[3], record.text[:record.rc[0]-len("/RC(")]+record.text[record.rc[1]+1:])
+    annots.exportfdf(outputfdfpath)
+    return objectids[1], objectids[3]
+
+
+def test_applystyleprofile_shards_missing_c_and_rc(tmp_path):
+    inputfdfpath=str(tmp_path/"incomplete.fdf")
+    noc, norc=writeincompletefdf(inputfdfpath)
+    fdf.diagnostics.quiet="Y"
+    assert fdf.fdf_annotations(inputfdfpath).getrecord(noc).c is None
+    assert fdf.fdf_annotations(inputfdfpath).getrecord(norc).rc is None
+
+    outputs=[]
+    for shards in (1, 2, 3):
+        annots=fdf.fdf_annotations(inputfdfpath)
+        annots.applystyleprofile(shards=shards, workers=2)
+        outputfdfpath=str(tmp_path/f"formatted_{shards}.fdf")
+        annots.exportfdf(outputfdfpath)
+        with open(outputfdfpath, "rb") as file:
+            outputs.append(file.read())
+    assert outputs[1]==outputs[0]
+    assert outputs[2]==outputs[0]
+
+
+def writemalformedstylefdf(outputfdfpath):
+    """
+    Function that writes a copy of the dummy fdf file in which the first style attribute of every /RC value contains a pair without key-value separator.
+    """
+    annots=fdf.fdf_annotations(dummyfdfpath)
+    objectids=[objectid for objectid in annots.ordered_fdf_key[2:] if objectid.endswith(" obj") and annots.hascontent(objectid)]
+    for objectid in objectids:
+        annots.setannotation(objectid, annots.fdf_dict[objectid].replace('style="', 'style="bogus;', 1))
+    annots.exportfdf(outputfdfpath)
+    return len(objectids)
+
+
+def test_diagnostics_count_every_annotation_whatever_the_shards(tmp_path):
+    inputfdfpath=str(tmp_path/"malformed.fdf")
+    annotations=writemalformedstylefdf(inputfdfpath)
+    counts=[]
+    for shards in (1, 4, 1):
+        result=fdf.formatfdffile(inputfdfpath, str(tmp_path/f"formatted_{shards}.fdf"), fdf.msgv2styleprofile, shards=shards, workers=2, quiet="Y")
+        assert result["error"] is None
+        counts.append(result["diagnostics"])
+    assert counts[0]["malformedvalue"]>=annotations
+    assert counts[1]==counts[0]
+    assert counts[2]==counts[0]
+
+
+def rcchain(rcstring, rcstylesdict, openingspantag=None, closingspantag=None):
+    """
+    Function that normalises the provided /RC value with the individual /RC methods, as replaced by method normalizerc.
+    """
+    rcstring=fdf.fdf_annotations.rc_dropspans(fdf.fdf_annotations.removercreturns(rcstring))
+    rcstyles=fdf.fdf_annotations.rcstyles_setmasterstyle(fdf.fdf_annotations.getrcstyles(rcstring), rcstylesdict)
+    rcstring=fdf.fdf_annotations.rcstyles_to_rccontentstring(rcstyles)
+    if openingspantag is not None:
+        rcstring=fdf.fdf_annotations.rc_insertspan(rcstring, openingspantag, closingspantag)
+    return rcstring
+
+
+def test_normalizerc_equals_method_chain():
+    fdf.diagnostics.quiet="Y"
+    rcstylesdict={'font-size':'12.0pt', 'color':'#000000'}
+    annots=fdf.fdf_annotations(dummyfdfpath)
+    rcstrings=[annots.getrccontent(objectid) for objectid in annots.ordered_fdf_key[2:] if objectid.endswith(" obj") and annots.hascontent(objectid)]
+    rcstrings+=['</body>style< span  x>="style="" <span style="color:#000"></span>:style="a:b;c:d"</p>= "',       #style attributes joined by dropping span tags
+                'style< span  x>="<style="a:b;c:d""',
+                '</ span>="style<span style="color:#000">="</p>style<body style="font-size:9pt;color:red">xstyle<_<sp<span>\\\n',
+                '<p dir="ltr"><span style="color:#05891C">AE</span></p>']
+    for rcstring in rcstrings:
+        for spantags in ((None, None), ('<span style="font-weight:bold">', '</span>')):
+            assert fdf.fdf_annotations.normalizerc(rcstring, rcstylesdict, *spantags)==rcchain(rcstring, rcstylesdict, *spantags)
+
+
+def documentstate(annots):
+    """
+    Function that returns the object table of the provided fdf_annotations object as comparable values.
+    """
+    return (list(annots.ordered_fdf_key), {objectid: annots.fdf_dict[objectid] for objectid in annots.ordered_fdf_key}, list(annots.root_key),
+            annots.bs_subobject_dict, annots.popup_subobject_dict, annots.parent_subobject_dict, annots.referencedby_dict)
+
+
+def test_remove_many_equals_repeated_removeannotation(tmp_path):
+    inputfdfpath=str(tmp_path/"synthetic.fdf")
+    fdf_benchmark.generatefdf(inputfdfpath, 400, seed=3)
+    fdf.diagnostics.quiet="Y"
+    repeated=fdf.fdf_annotations(inputfdfpath)
+    bulk=fdf.fdf_annotations(inputfdfpath)
+    objectids=[objectid for objectid in repeated.ordered_fdf_key[2:] if objectid.endswith(" obj")][::7]
+    objectids=[repeated.toreference(objectid) if i % 2 else objectid for i, objectid in enumerate(objectids)]      #both spellings
+    assert any(repeated.toobjectid(objectid) in repeated.popup_subobject_dict for objectid in objectids)
+    assert any(repeated.toobjectid(objectid) in repeated.bs_subobject_dict for objectid in objectids)
+    for objectid in objectids:
+        repeated.removeannotation(objectid)
+    bulk.remove_many(objectids)
+    assert documentstate(bulk)==documentstate(repeated)
+    repeated.exportfdf(str(tmp_path/"repeated.fdf"))
+    bulk.exportfdf(str(tmp_path/"bulk.fdf"))
+    assert (tmp_path/"bulk.fdf").read_bytes()==(tmp_path/"repeated.fdf").read_bytes()
+
+
+def test_snapshot_round_trip_equals_fresh_parse(tmp_path, monkeypatch):
+    inputfdfpath=str(tmp_path/"synthetic.fdf")
+    fdf_benchmark.generatefdf(inputfdfpath, 300, seed=4)
+    for use_mmap in ("N", "Y"):
+        snapshotpath=str(tmp_path/f"synthetic_{use_mmap}.snapshot")
+        fresh=fdf.fdf_annotations(inputfdfpath, use_mmap)
+        fdf.fdf_annotations(inputfdfpath, use_mmap, snapshotpath=snapshotpath).release()        #snapshot written after parsing
+        with monkeypatch.context() as patch:
+            patch.setattr(fdf.fdf_annotations, "tokenizefdf", None)     #restoring the snapshot must not split the file again
+            restored=fdf.fdf_annotations(inputfdfpath, use_mmap, snapshotpath=snapshotpath)
+        assert documentstate(restored)==documentstate(fresh)
+        fresh.applystyleprofile()
+        restored.applystyleprofile()
+        fresh.exportfdf(str(tmp_path/"fresh.fdf"))
+        restored.exportfdf(str(tmp_path/"restored.fdf"))
+        assert (tmp_path/"restored.fdf").read_bytes()==(tmp_path/"fresh.fdf").read_bytes()
+        fresh.release()
+        restored.release()
+
+
+def test_incremental_output_equals_full_run_after_edits(tmp_path):
+    inputfdfpath=str(tmp_path/"input.fdf")
+    outputfdfpath=str(tmp_path/"output.fdf")
+    manifestpath=outputfdfpath+".manifest.json"
+    fdf_benchmark.generatefdf(inputfdfpath, 300, seed=5)
+    fdf.diagnostics.quiet="Y"
+    assert fdf.formatfdffile(inputfdfpath, outputfdfpath, fdf.msgv2styleprofile, manifestpath=manifestpath)["error"] is None
+
+    annots=fdf.fdf_annotations(inputfdfpath)
+    objectids=[objectid for objectid in annots.ordered_fdf_key[2:] if objectid.endswith(" obj") and annots.hascontent(objectid)]
+    annots.setc(objectids[3], "[0.5 1.0 0.5]")
+    record=fdf.fdf_annotationrecord(annots.fdf_dict[objectids[10]])
+    annots.setannotation(objectids[10], record.text[:record.contents[0]]+"EDITED"+record.text[record.contents[1]:])
+    annots.setpagenum(objectids[20], 0)
+    annots.removeannotation(objectids[30])
+    annots.exportfdf(inputfdfpath)
+
+    incremental=fdf.formatfdffile(inputfdfpath, outputfdfpath, fdf.msgv2styleprofile, manifestpath=manifestpath)
+    full=fdf.formatfdffile(inputfdfpath, str(tmp_path/"full.fdf"), fdf.msgv2styleprofile)
+    assert incremental["error"] is None and full["error"] is None
+    assert incremental["carried"]>0 and incremental["changed"]>0
+    assert (tmp_path/"output.fdf").read_bytes()==(tmp_path/"full.fdf").read_bytes()
+
+
+def test_fitrects_measures_bold_suffix_only():
+    annots=fdf.fdf_annotations(dummyfdfpath)
+    objectid=[objectid for objectid in annots.ordered_fdf_key[2:] if objectid.endswith(" obj") and annots.hascontent(objectid)][0]
+    widths={}
+    for fontname in ("Arial", "Bodoni", "Bookman-Light", "Arial,Bold", "Arial-BoldMT", "HeBo"):
+        annots.fitrects([objectid], fontname=fontname, fontsize=12)
+        x1, y1, x2, y2=(float(value) for value in annots.getrect(objectid).strip("[]").split())
+        widths[fontname]=round(x2-x1, 3)
+    assert widths["Bodoni"]==widths["Bookman-Light"]==widths["Arial"]
+    assert widths["Arial,Bold"]==widths["Arial-BoldMT"]==widths["HeBo"]>widths["Arial"]
+
+
+def test_select_rejects_unknown_headerrule():
+    annots=fdf.fdf_annotations(dummyfdfpath)
+    assert annots.select(header=True, headerrule="MSGV2")
+    with pytest.raises(ValueError, match="MSGV1, MSGV2"):
+        annots.select(header=True, headerrule="MSGV3")